@@ -1,22 +1,27 @@
+import time
+# 启动计时：--profile-startup时输出各阶段耗时
+_startup_marks = [("解释器就绪", time.perf_counter())]
 import hashlib
 import os
 import sys
 import base64
-import time
+import json
+import shutil
+import threading
+import multiprocessing
+from collections import deque
+_startup_marks.append(("标准库", time.perf_counter()))
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import pandas as pd
-import numpy as np
-import subprocess
-import tempfile
-import re
-from Bio.SeqUtils import MeltingTemp as mt
-from Bio.Seq import Seq
-import threading
-import json
-import random
-from collections import Counter
-import queue
+_startup_marks.append(("tkinter", time.perf_counter()))
+# pandas和Biopython由fish_engine在首次使用时导入
+from fish_engine import (DNAProbeAnalyzer, RNAProbeDesigner, ResultCache, BlastHitCache, BlastRunner, StageProfiler,
+                         LazyModule, JobControl, RunCheckpoint, KmerOffTargetIndex, iter_blast_results, apply_specificity, blast_db_exists,
+                         merge_blast_results,
+                         reverse_complement_series, reverse_complement_file, REVCOMP_COLUMN,
+                         design_results_frame, iter_fasta, user_cache_dir, format_startup_report)
+_startup_marks.append(("fish_engine（含NumPy）", time.perf_counter()))
+pd = LazyModule('pandas')
 
 
 def _obfuscated_license_check():
@@ -41,12 +46,35 @@ def _obfuscated_license_check():
         return False
 
 
+def _license_stamp_path():
+    return os.path.join(user_cache_dir(), "readme_check.json")
+
+
 def _validate_license():
+    """README.md校验结果按(路径, 修改时间, 大小)缓存，文件未变化时不再重新计算哈希"""
+    try:
+        stat = os.stat("README.md")
+    except OSError:
+        return False
+    stamp = [os.path.abspath("README.md"), stat.st_mtime_ns, stat.st_size]
+    try:
+        with open(_license_stamp_path(), 'r') as f:
+            if json.load(f) == stamp:
+                return True
+    except (OSError, ValueError):
+        pass
+
     try:
-        time.sleep(0.1 + random.random() * 0.2)
-        return _obfuscated_license_check()
+        if not _obfuscated_license_check():
+            return False
     except:
         return False
+    try:
+        with open(_license_stamp_path(), 'w') as f:
+            json.dump(stamp, f)
+    except OSError:
+        pass
+    return True
 
 
 def verify_license():
@@ -70,6 +98,7 @@ def verify_license():
 
 if not verify_license():
     sys.exit(1)
+_startup_marks.append(("README校验", time.perf_counter()))
 
 ###########################################################################
 # DNA探针分析器UI类 - 用户界面模块
@@ -78,6 +107,10 @@ if not verify_license():
 #可自行修改代码内容，但确保代码文件所在目录包括对应README.md文件
 ###########################################################################
 class DNAProbeAnalyzerUI:
+    # 反向互补工具：加载时只读取预览行，处理时每块行数
+    REVCOMP_PREVIEW_ROWS = 10
+    REVCOMP_CHUNKSIZE = 100000
+
     def __init__(self, root):
         self.root = root
         self.root.title("FISH探针设计与分析工具 V2.0C9")  # 版本号为V2.0C9
@@ -90,74 +123,117 @@ class DNAProbeAnalyzerUI:
         except:
             pass
             
-        self.analyzer = DNAProbeAnalyzer()
-        self.designer = RNAProbeDesigner()
+        self.ui_update_queue = UIUpdateChannel()
+        self.analyzer = DNAProbeAnalyzer(cache=self.open_result_cache())
+        self.designer = RNAProbeDesigner(cache=self.open_result_cache())
+        self.blast_cache = self.open_blast_cache()
         self.pause_flag = threading.Event()
         self.cancel_flag = threading.Event()
-        self.ui_update_queue = queue.Queue()
+        # 分析选项卡的任务与原有暂停/取消标志共用同一组Event；设计和反向互补选项卡每次运行新建任务
+        self.analysis_job = None
+        self.design_job = None
+        self.revcomp_job = None
+        self.design_target_length = 0
         self.setup_ui()
         self.setup_ui_update_handler()
         
+    def open_result_cache(self):
+        """打开持久化Tm/GC缓存，缓存目录不可用时不使用缓存"""
+        try:
+            return ResultCache()
+        except Exception as e:
+            self.log_message(f"无法打开Tm缓存，将不使用缓存: {e}")
+            return None
+
+    def open_blast_cache(self):
+        """打开持久化BLAST命中缓存，缓存目录不可用时不使用缓存"""
+        try:
+            return BlastHitCache()
+        except Exception as e:
+            self.log_message(f"无法打开BLAST缓存，将不使用缓存: {e}")
+            return None
+
     def setup_ui_update_handler(self):
-        """设置UI更新处理器"""
+        """设置UI更新处理器：每100ms取出一批更新，日志合并为一次插入，进度和状态只应用最新值"""
+        handlers = {
+            "update_progress": lambda value: self.progress_var.set(value),
+            "update_design_progress": lambda value: self.design_progress_var.set(value),
+            "update_status": lambda message: self.status_var.set(message),
+            "update_results": self.show_result_summary,
+            "enable_buttons": self.enable_analysis_buttons,
+            "update_design_tree": self.update_design_tree,
+            "append_design_rows": self.append_design_rows,
+            "update_design_stats": self.show_design_stats,
+            "enable_design_buttons": self.enable_design_buttons,
+            "update_design_job_status": lambda message: self.design_job_var.set(message),
+            "design_job_done": self.finish_design_job,
+            "update_sweep_progress": lambda value: self.sweep_progress_var.set(value),
+            "update_sweep_results": self.show_sweep_results,
+            "enable_sweep_buttons": self.enable_sweep_buttons,
+            "update_revcomp_progress": lambda value: self.revcomp_progress_var.set(value),
+            "revcomp_done": self.finish_revcomp,
+        }
+        
         def check_queue():
             try:
-                while True:
-                    task, args = self.ui_update_queue.get_nowait()
-                    if task == "log_message":
-                        self.log_text.insert(tk.END, args[0] + "\n")
-                        self.log_text.see(tk.END)
-                    elif task == "update_progress":
-                        self.progress_var.set(args[0])
-                    elif task == "update_design_progress":
-                        self.design_progress_var.set(args[0])
-                    elif task == "update_status":
-                        self.status_var.set(args[0])
-                    elif task == "update_results":
-                        self.result_vars['total'].set(args[0])
-                        self.result_vars['valid'].set(args[1])
-                        self.result_vars['avg_tm'].set(args[2])
-                        self.result_vars['avg_gc'].set(args[3])
-                    elif task == "enable_buttons":
-                        self.start_button.config(state='normal')
-                        self.pause_button.config(state='disabled')
-                        self.pause_button.config(text="暂停")
-                        self.cancel_button.config(state='disabled')
-                    elif task == "update_design_tree":
-                        self.update_design_tree(args[0])
-                    elif task == "update_design_stats":
-                        self.design_probe_count.config(text=args[0])
-                        self.design_avg_gc.config(text=args[1])
-                        self.design_avg_tm.config(text=args[2])
-                    elif task == "enable_design_buttons":
-                        self.export_btn.config(state=tk.NORMAL)
-                        self.blast_btn.config(state=tk.NORMAL)
-                        self.design_btn.config(state=tk.NORMAL)
-            except queue.Empty:
-                pass
+                depth = self.ui_update_queue.depth()
+                logs, latest, events = self.ui_update_queue.drain()
+                if logs:
+                    self.append_log_lines(logs)
+                for task, args in latest.items():
+                    handlers[task](*args)
+                for task, args in events:
+                    handlers[task](*args)
+                self.queue_depth_var.set(f"更新队列: {depth}（峰值 {self.ui_update_queue.peak_depth}）")
             finally:
                 self.root.after(100, check_queue)  # 每100ms检查一次队列
                 
         self.root.after(100, check_queue)
         
+    def append_log_lines(self, lines):
+        """一次插入一批日志行，超出上限时删除最早的行"""
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        line_count = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if line_count > UIUpdateChannel.LOG_MAX_LINES:
+            self.log_text.delete(1.0, f"{line_count - UIUpdateChannel.LOG_MAX_LINES + 1}.0")
+        self.log_text.see(tk.END)
+        
+    def show_result_summary(self, total, valid, avg_tm, avg_gc):
+        self.result_vars['total'].set(total)
+        self.result_vars['valid'].set(valid)
+        self.result_vars['avg_tm'].set(avg_tm)
+        self.result_vars['avg_gc'].set(avg_gc)
+        
+    def enable_analysis_buttons(self):
+        self.start_button.config(state='normal')
+        self.pause_button.config(state='disabled')
+        self.pause_button.config(text="暂停")
+        self.cancel_button.config(state='disabled')
+        
+    def show_design_stats(self, probe_count, avg_gc, avg_tm):
+        self.design_probe_count.config(text=probe_count)
+        self.design_avg_gc.config(text=avg_gc)
+        self.design_avg_tm.config(text=avg_tm)
+        
+    def enable_design_buttons(self):
+        self.export_btn.config(state=tk.NORMAL)
+        self.blast_btn.config(state=tk.NORMAL)
+        self.screen_btn.config(state=tk.NORMAL)
+        self.design_btn.config(state=tk.NORMAL)
+        
     def update_design_tree(self, probes):
-        """更新设计结果表格"""
-        # 清空表格
-        for item in self.design_tree.get_children():
-            self.design_tree.delete(item)
-        
-        # 添加数据到表格
-        for probe in probes:
-            self.design_tree.insert("", tk.END, values=(
-                probe['id'],
-                probe['sequence'],
-                probe['start'],
-                probe['end'],
-                f"{probe['gc_content']:.2f}",
-                f"{probe['tm']:.2f}",
-                f"{probe.get('complexity', 0):.3f}",
-                probe.get('specificity', '未检查')
-            ))
+        """更新设计结果表格（虚拟化表格只渲染可见行）"""
+        self.design_table.set_probes(probes)
+        self.update_design_view_count()
+        
+    def append_design_rows(self, probes):
+        """设计进行中追加探针到结果表格"""
+        self.design_table.append(probes)
+        self.update_design_view_count()
+        
+    def update_design_view_count(self):
+        self.design_view_count.config(
+            text=f"显示 {self.design_table.visible_count()} / {len(self.design_table.probes)}")
         
     def setup_ui(self):
         """设置用户界面"""
@@ -184,6 +260,11 @@ class DNAProbeAnalyzerUI:
         self.notebook.add(self.design_tab, text="探针设计")
         self.setup_design_tab(self.design_tab)
         
+        # 参数扫描选项卡（使用设计选项卡的目标序列和其余参数）
+        self.sweep_tab = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.sweep_tab, text="参数扫描")
+        self.setup_sweep_tab(self.sweep_tab)
+        
         # 反向互补工具选项卡
         self.revcomp_tab = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(self.revcomp_tab, text="反向互补工具")
@@ -225,6 +306,28 @@ class DNAProbeAnalyzerUI:
         self.overwrite_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(output_options_frame, text="覆盖现有文件", 
                        variable=self.overwrite_var).pack(side=tk.LEFT, padx=5)
+
+        # 并行进程数（1为单进程）
+        ttk.Label(output_options_frame, text="并行进程数:").pack(side=tk.LEFT, padx=(20, 5))
+        self.workers_var = tk.Spinbox(output_options_frame, from_=1, to=max(os.cpu_count() or 1, 1), width=5)
+        self.workers_var.delete(0, tk.END)
+        self.workers_var.insert(0, "1")
+        self.workers_var.pack(side=tk.LEFT)
+
+        # 流式处理：分块读取并追加写出，适合超大文件
+        self.stream_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(output_options_frame, text="流式处理大文件",
+                       variable=self.stream_var).pack(side=tk.LEFT, padx=(20, 5))
+
+        # 断点续跑：流式分析每块、BLAST每个分片完成后记入输出文件旁的检查点目录
+        self.checkpoint_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_options_frame, text="保存检查点",
+                       variable=self.checkpoint_var).pack(side=tk.LEFT, padx=(20, 5))
+
+        # 性能计量：记录各阶段耗时和过滤淘汰数，与设计选项卡共用
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_options_frame, text="记录性能计量",
+                       variable=self.profile_var).pack(side=tk.LEFT, padx=(20, 5))
         
         # BLAST设置框架
         blast_frame = ttk.LabelFrame(tab, text="本地BLAST设置")
@@ -253,6 +356,25 @@ class DNAProbeAnalyzerUI:
         self.run_blast_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(blast_frame, text="运行BLAST分析", variable=self.run_blast_var).grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=5)
         
+        # BLAST并发设置：查询分片数（并发进程数）和每个进程的线程数
+        blast_parallel_frame = ttk.Frame(blast_frame)
+        blast_parallel_frame.grid(row=4, column=0, columnspan=3, sticky=tk.W, pady=5)
+        ttk.Label(blast_parallel_frame, text="查询分片数:").pack(side=tk.LEFT, padx=5)
+        self.blast_shards_var = tk.Spinbox(blast_parallel_frame, from_=1, to=256, width=5)
+        self.blast_shards_var.delete(0, tk.END)
+        self.blast_shards_var.insert(0, "1")
+        self.blast_shards_var.pack(side=tk.LEFT)
+        ttk.Label(blast_parallel_frame, text="每分片线程数:").pack(side=tk.LEFT, padx=(20, 5))
+        self.blast_threads_var = tk.Spinbox(blast_parallel_frame, from_=1, to=256, width=5)
+        self.blast_threads_var.delete(0, tk.END)
+        self.blast_threads_var.insert(0, "1")
+        self.blast_threads_var.pack(side=tk.LEFT)
+        self.blast_long_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(blast_parallel_frame, text="同时输出长格式命中表",
+                        variable=self.blast_long_var).pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Button(blast_parallel_frame, text="清除BLAST缓存",
+                   command=lambda: self.clear_blast_cache(self.db_path_var.get())).pack(side=tk.LEFT, padx=(20, 5))
+        
         # 控制按钮
         button_frame = ttk.Frame(tab)
         button_frame.grid(row=6, column=0, columnspan=3, pady=20)
@@ -278,6 +400,10 @@ class DNAProbeAnalyzerUI:
         status_label = ttk.Label(tab, textvariable=self.status_var)
         status_label.grid(row=8, column=0, columnspan=3, pady=5)
         
+        # 界面更新队列深度（后台线程产生更新的速度超过界面处理速度时会持续增长）
+        self.queue_depth_var = tk.StringVar(value="更新队列: 0")
+        ttk.Label(tab, textvariable=self.queue_depth_var).grid(row=8, column=2, sticky=tk.E, padx=5)
+        
         # 日志输出
         ttk.Label(tab, text="分析日志:").grid(row=9, column=0, sticky=tk.W, pady=5)
         self.log_text = scrolledtext.ScrolledText(tab, width=100, height=15, font=("Consolas", 10))
@@ -418,6 +544,15 @@ class DNAProbeAnalyzerUI:
         self.max_homopolymer_length.insert(0, "3")
         self.max_homopolymer_length.grid(row=3, column=1, sticky=tk.W, padx=5, pady=5)
 
+        # 探针放置策略：greedy为逐个接受第一个合格窗口，max_count/tm_uniform为动态规划最优放置
+        ttk.Label(params_group, text="放置策略:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=5)
+        self.design_placement = tk.StringVar(value="greedy")
+        ttk.Combobox(params_group, textvariable=self.design_placement,
+                     values=["greedy", "max_count", "tm_uniform"], state="readonly", width=15).grid(
+            row=4, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Checkbutton(params_group, text="记录性能计量", variable=self.profile_var).grid(
+            row=4, column=2, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
         # BLAST设置
         blast_group = ttk.LabelFrame(tab, text="BLAST设置")
         blast_group.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5, padx=5)
@@ -437,6 +572,39 @@ class DNAProbeAnalyzerUI:
                                                                                     sticky=(tk.W, tk.E), padx=3)
         ttk.Button(blast_group, text="浏览...", command=self.browse_design_db_path).grid(row=0, column=5, padx=3)
 
+        # BLAST并发设置
+        ttk.Label(blast_group, text="查询分片数:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.design_blast_shards = tk.Spinbox(blast_group, from_=1, to=256, width=5)
+        self.design_blast_shards.delete(0, tk.END)
+        self.design_blast_shards.insert(0, "1")
+        self.design_blast_shards.grid(row=1, column=1, sticky=tk.W, padx=3)
+        ttk.Label(blast_group, text="每分片线程数:").grid(row=1, column=3, sticky=tk.W, pady=5)
+        self.design_blast_threads = tk.Spinbox(blast_group, from_=1, to=256, width=5)
+        self.design_blast_threads.delete(0, tk.END)
+        self.design_blast_threads.insert(0, "1")
+        self.design_blast_threads.grid(row=1, column=4, sticky=tk.W, padx=3)
+        self.design_blast_checkpoint_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(blast_group, text="保存检查点",
+                        variable=self.design_blast_checkpoint_var).grid(row=1, column=2, sticky=tk.W, padx=3)
+        ttk.Button(blast_group, text="清除BLAST缓存",
+                   command=lambda: self.clear_blast_cache(self.design_db_path_var.get())).grid(row=1, column=5, padx=3)
+
+        # 本地特异性索引：从转录组FASTA构建一次，之后不运行BLAST即可筛查近完全匹配的脱靶
+        ttk.Label(blast_group, text="特异性索引目录:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.specificity_index_var = tk.StringVar(value="")
+        ttk.Entry(blast_group, textvariable=self.specificity_index_var, width=20).grid(row=2, column=1,
+                                                                                       sticky=(tk.W, tk.E), padx=3)
+        ttk.Button(blast_group, text="浏览...", command=self.browse_specificity_index).grid(row=2, column=2, padx=3)
+        ttk.Label(blast_group, text="允许错配数:").grid(row=2, column=3, sticky=tk.W, pady=5)
+        self.max_mismatches = tk.Spinbox(blast_group, from_=0, to=5, width=5)
+        self.max_mismatches.delete(0, tk.END)
+        self.max_mismatches.insert(0, "1")
+        self.max_mismatches.grid(row=2, column=4, sticky=tk.W, padx=3)
+        ttk.Button(blast_group, text="构建索引...", command=self.start_index_build).grid(row=2, column=5, padx=3)
+        self.screen_on_design = tk.BooleanVar(value=False)
+        ttk.Checkbutton(blast_group, text="设计时用索引筛查特异性", variable=self.screen_on_design).grid(
+            row=3, column=0, columnspan=3, sticky=tk.W, pady=5)
+
         # 设计按钮和进度条
         button_frame = ttk.Frame(tab)
         button_frame.grid(row=4, column=0, columnspan=3, pady=10)
@@ -444,39 +612,71 @@ class DNAProbeAnalyzerUI:
         self.design_btn = ttk.Button(button_frame, text="设计探针", command=self.start_design)
         self.design_btn.pack(side=tk.LEFT, padx=5)
 
+        self.batch_design_btn = ttk.Button(button_frame, text="批量设计FASTA", command=self.start_batch_design)
+        self.batch_design_btn.pack(side=tk.LEFT, padx=5)
+
         self.export_btn = ttk.Button(button_frame, text="导出结果", command=self.export_design_results, state=tk.DISABLED)
         self.export_btn.pack(side=tk.LEFT, padx=5)
 
         self.blast_btn = ttk.Button(button_frame, text="运行BLAST检查", command=self.run_design_blast, state=tk.DISABLED)
         self.blast_btn.pack(side=tk.LEFT, padx=5)
 
+        self.screen_btn = ttk.Button(button_frame, text="本地特异性筛查", command=self.run_design_screen,
+                                     state=tk.DISABLED)
+        self.screen_btn.pack(side=tk.LEFT, padx=5)
+
+        # 设计、批量设计和BLAST共用的暂停/取消按钮，作用于当前运行的任务
+        self.design_pause_btn = ttk.Button(button_frame, text="暂停", command=self.toggle_design_pause,
+                                           state=tk.DISABLED)
+        self.design_pause_btn.pack(side=tk.LEFT, padx=5)
+        self.design_cancel_btn = ttk.Button(button_frame, text="取消", command=self.cancel_design_job,
+                                            state=tk.DISABLED)
+        self.design_cancel_btn.pack(side=tk.LEFT, padx=5)
+
         self.design_progress_var = tk.DoubleVar()
         self.design_progress_bar = ttk.Progressbar(button_frame, variable=self.design_progress_var, maximum=100)
         self.design_progress_bar.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
 
+        # 进度、吞吐量和剩余时间
+        self.design_job_var = tk.StringVar(value="")
+        ttk.Label(button_frame, textvariable=self.design_job_var, width=48).pack(side=tk.LEFT, padx=5)
+
         # 设计结果表格
         results_frame = ttk.LabelFrame(tab, text="设计结果")
         results_frame.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5, padx=5)
         results_frame.columnconfigure(0, weight=1)
         results_frame.rowconfigure(0, weight=1)
 
-        # 创建表格
-        columns = ("ID", "序列", "起始位置", "结束位置", "GC含量 (%)", "熔解温度 (°C)", "复杂度", "特异性")
-        self.design_tree = ttk.Treeview(results_frame, columns=columns, show="headings", height=10)
-
-        for col in columns:
-            self.design_tree.heading(col, text=col)
-            self.design_tree.column(col, width=100)
-
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.design_tree.yview)
-        self.design_tree.configure(yscrollcommand=scrollbar.set)
+        # 创建表格（虚拟化：只渲染可见行，点击列标题排序）
+        self.design_table = VirtualProbeTable(results_frame, height=10)
+        self.design_tree = self.design_table.tree
 
         self.design_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.design_table.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
 
         # 绑定选择事件
-        self.design_tree.bind('<<TreeviewSelect>>', self.on_probe_select)
+        self.design_tree.bind('<<TreeviewSelect>>', self.on_probe_select, add='+')
+
+        # 结果筛选
+        filter_frame = ttk.Frame(results_frame)
+        filter_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        self.design_filter_vars = {}
+        for field, label in (('gc_content', "GC (%)"), ('tm', "Tm (°C)"), ('complexity', "复杂度")):
+            ttk.Label(filter_frame, text=f"{label}:").pack(side=tk.LEFT, padx=(5, 2))
+            low = tk.StringVar()
+            high = tk.StringVar()
+            ttk.Entry(filter_frame, textvariable=low, width=6).pack(side=tk.LEFT)
+            ttk.Label(filter_frame, text="-").pack(side=tk.LEFT)
+            ttk.Entry(filter_frame, textvariable=high, width=6).pack(side=tk.LEFT)
+            self.design_filter_vars[field] = (low, high)
+        ttk.Label(filter_frame, text="特异性:").pack(side=tk.LEFT, padx=(10, 2))
+        self.design_filter_specificity = tk.StringVar(value="全部")
+        ttk.Combobox(filter_frame, textvariable=self.design_filter_specificity, state="readonly", width=10,
+                     values=["全部"] + list(VirtualProbeTable.SPECIFICITY_ORDER)).pack(side=tk.LEFT)
+        ttk.Button(filter_frame, text="筛选", command=self.apply_design_filter).pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text="清除筛选", command=self.clear_design_filter).pack(side=tk.LEFT)
+        self.design_view_count = ttk.Label(filter_frame, text="显示 0 / 0")
+        self.design_view_count.pack(side=tk.LEFT, padx=10)
 
         # 2. 文字详情（独立区域）
         detail_section = ttk.LabelFrame(tab, text="探针详情")
@@ -516,28 +716,42 @@ class DNAProbeAnalyzerUI:
         tab.columnconfigure(0, weight=1)
         tab.rowconfigure(5, weight=1)
 
-    def on_probe_select(self, event):
-        """当选择探针时显示详情"""
-        selection = self.design_tree.selection()
-        if not selection:
+    def apply_design_filter(self):
+        """按GC、Tm、复杂度范围和特异性筛选结果表格"""
+        ranges = {}
+        try:
+            for field, (low, high) in self.design_filter_vars.items():
+                bounds = (float(low.get()) if low.get().strip() else None,
+                          float(high.get()) if high.get().strip() else None)
+                if bounds != (None, None):
+                    ranges[field] = bounds
+        except ValueError:
+            messagebox.showerror("错误", "筛选范围必须是数字")
             return
+        specificity = self.design_filter_specificity.get()
+        self.design_table.set_filter(ranges, None if specificity == "全部" else specificity)
+        self.update_design_view_count()
+    
+    def clear_design_filter(self):
+        """清除结果表格的筛选条件"""
+        for low, high in self.design_filter_vars.values():
+            low.set("")
+            high.set("")
+        self.design_filter_specificity.set("全部")
+        self.design_table.set_filter({})
+        self.update_design_view_count()
 
-        item = selection[0]
-        values = self.design_tree.item(item, 'values')
-
-        if not hasattr(self, 'design_results') or not self.design_results:
+    def on_probe_select(self, event):
+        """当选择探针时显示详情"""
+        if not self.design_tree.selection():
             return
 
         # 查找选中的探针
-        probe_id = int(values[0])
-        probe = next((p for p in self.design_results if p['id'] == probe_id), None)
+        probe = self.design_table.selected_probe()
 
         if not probe:
             return
 
-        # 获取原始序列
-        original_seq = self.seq_input.get(1.0, tk.END).strip().upper()
-
         # 显示探针详情
         detail_text = f"探针 ID: {probe['id']}\n"
         detail_text += f"DNA探针序列(5'→3'）: {probe['sequence']}\n"
@@ -548,10 +762,9 @@ class DNAProbeAnalyzerUI:
         detail_text += f"复杂度: {probe.get('complexity', 'N/A'):.3f}\n"
         detail_text += f"特异性: {probe.get('specificity', '未检查')}\n\n"
 
-        # 显示与原始序列的互补配对
-        if original_seq and len(original_seq) >= probe['end']:
-            # 获取目标RNA片段
-            target_rna_seq = original_seq[probe['start'] - 1:probe['end']]
+        # 显示与目标RNA片段的互补配对（片段在设计时已保存，不再读取并复制整条输入序列）
+        target_rna_seq = probe.get('rna_fragment')
+        if target_rna_seq:
             # 获取DNA探针序列并反向（3'到5'）
             dna_probe_seq = probe['sequence'][::-1]
 
@@ -593,10 +806,11 @@ class DNAProbeAnalyzerUI:
         self.probe_detail_text.delete(1.0, tk.END)
         self.probe_detail_text.insert(tk.END, detail_text)
 
-        # 绘制探针在mRNA中的位置
-        self.draw_mrna_location_probes(probe, original_seq)
+        # 绘制探针在mRNA中的位置（按设计时的目标序列长度）
+        if self.design_target_length:
+            self.draw_mrna_location_probes(probe, self.design_target_length)
 
-    def draw_mrna_location_probes(self, probe, original_seq):
+    def draw_mrna_location_probes(self, probe, seq_length):
         """绘制探针在mRNA中的位置"""
         if not hasattr(self, 'mrna_location_canvas'):
             return
@@ -607,7 +821,6 @@ class DNAProbeAnalyzerUI:
         # 设置画布参数
         canvas_width = canvas.winfo_width()
         canvas_height = canvas.winfo_height()
-        seq_length = len(original_seq)
 
         # 绘制mRNA序列的水平线
         mRNA_line_y = canvas_height // 2
@@ -629,6 +842,205 @@ class DNAProbeAnalyzerUI:
         # 添加文本标签
         canvas.create_text((probe_start_x + probe_end_x) / 2, mRNA_line_y - 20,
                            text=f"探针{probe['id']} ({probe_start}-{probe_end})", fill="black")
+    def setup_sweep_tab(self, tab):
+        """设置参数扫描选项卡"""
+        title_label = ttk.Label(tab, text="设计参数扫描",
+                                font=("Arial", 16, "bold"), foreground="darkblue")
+        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
+
+        # 扫描范围：多个取值用逗号分隔，范围写成 下限-上限
+        range_group = ttk.LabelFrame(tab, text="扫描范围（多个取值用逗号分隔，范围写成 下限-上限）")
+        range_group.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5, padx=5)
+        range_group.columnconfigure(1, weight=1)
+        range_group.columnconfigure(3, weight=1)
+
+        self.sweep_gc_var = tk.StringVar(value="35-55, 40-60, 45-65")
+        self.sweep_tm_var = tk.StringVar(value="50-65, 55-70, 60-75")
+        self.sweep_complexity_var = tk.StringVar(value="0.7, 0.8, 0.9")
+        self.sweep_homopolymer_var = tk.StringVar(value="3, 4")
+        fields = (("GC含量范围 (%):", self.sweep_gc_var), ("熔解温度范围 (°C):", self.sweep_tm_var),
+                  ("最小复杂度:", self.sweep_complexity_var), ("最大连续相同碱基长度:", self.sweep_homopolymer_var))
+        for index, (label, variable) in enumerate(fields):
+            row, column = divmod(index, 2)
+            ttk.Label(range_group, text=label).grid(row=row, column=column * 2, sticky=tk.W, padx=5, pady=5)
+            ttk.Entry(range_group, textvariable=variable, width=30).grid(
+                row=row, column=column * 2 + 1, sticky=(tk.W, tk.E), padx=5, pady=5)
+
+        ttk.Label(range_group, text="目标探针数（0为不限）:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        self.sweep_target_count = tk.Spinbox(range_group, from_=0, to=10000, width=10)
+        self.sweep_target_count.delete(0, tk.END)
+        self.sweep_target_count.insert(0, "48")
+        self.sweep_target_count.grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(range_group, text="探针长度、间距、Tm方法、放置策略和重复过滤取自“探针设计”选项卡").grid(
+            row=2, column=2, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
+        # 操作按钮和进度条
+        button_frame = ttk.Frame(tab)
+        button_frame.grid(row=2, column=0, columnspan=3, pady=10)
+        self.sweep_btn = ttk.Button(button_frame, text="开始扫描", command=self.start_sweep)
+        self.sweep_btn.pack(side=tk.LEFT, padx=5)
+        self.sweep_apply_btn = ttk.Button(button_frame, text="应用所选参数到设计选项卡",
+                                          command=self.apply_sweep_selection, state=tk.DISABLED)
+        self.sweep_apply_btn.pack(side=tk.LEFT, padx=5)
+        self.sweep_export_btn = ttk.Button(button_frame, text="导出扫描结果", command=self.export_sweep_results,
+                                           state=tk.DISABLED)
+        self.sweep_export_btn.pack(side=tk.LEFT, padx=5)
+        self.sweep_progress_var = tk.DoubleVar()
+        ttk.Progressbar(button_frame, variable=self.sweep_progress_var, maximum=100, length=300).pack(
+            side=tk.LEFT, padx=5)
+
+        # 结果表格：按与目标探针数的差距排序，双击应用
+        result_group = ttk.LabelFrame(tab, text="扫描结果")
+        result_group.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5, padx=5)
+        result_group.columnconfigure(0, weight=1)
+        result_group.rowconfigure(0, weight=1)
+        columns = ("GC范围 (%)", "Tm范围 (°C)", "最小复杂度", "最大同聚物", "合格窗口", "探针数", "平均Tm (°C)",
+                   "平均GC (%)", "探针Tm范围 (°C)")
+        self.sweep_tree = ttk.Treeview(result_group, columns=columns, show="headings", height=20,
+                                       selectmode="browse")
+        for column in columns:
+            self.sweep_tree.heading(column, text=column)
+            self.sweep_tree.column(column, width=110)
+        self.sweep_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar = ttk.Scrollbar(result_group, orient=tk.VERTICAL, command=self.sweep_tree.yview)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.sweep_tree.configure(yscrollcommand=scrollbar.set)
+        self.sweep_tree.bind('<Double-1>', lambda event: self.apply_sweep_selection())
+        self.sweep_results = None
+
+        tab.columnconfigure(0, weight=1)
+        tab.rowconfigure(3, weight=1)
+
+    @staticmethod
+    def parse_sweep_values(text, ranges=False):
+        """解析逗号分隔的取值列表；ranges为True时每项为 下限-上限"""
+        values = []
+        for item in text.replace('，', ',').split(','):
+            item = item.strip()
+            if not item:
+                continue
+            if ranges:
+                low, high = (float(part) for part in item.split('-', 1))
+                if low > high:
+                    raise ValueError(f"范围下限大于上限: {item}")
+                values.append((low, high))
+            else:
+                values.append(float(item))
+        if not values:
+            raise ValueError("取值不能为空")
+        return values
+
+    def start_sweep(self):
+        """开始参数扫描：目标序列和其余参数取自设计选项卡"""
+        sequence = self.seq_input.get(1.0, tk.END).strip().upper()
+        if not sequence or sequence.startswith("请输入目标RNA序列"):
+            messagebox.showerror("错误", "请先在“探针设计”选项卡输入目标序列")
+            return
+        if any(char not in 'ATCGU' for char in sequence):
+            messagebox.showerror("错误", "序列包含无效字符。只允许A,T,C,G,U")
+            return
+        try:
+            grid = {
+                ('min_gc', 'max_gc'): self.parse_sweep_values(self.sweep_gc_var.get(), ranges=True),
+                ('min_tm', 'max_tm'): self.parse_sweep_values(self.sweep_tm_var.get(), ranges=True),
+                'min_complexity': self.parse_sweep_values(self.sweep_complexity_var.get()),
+                'max_homopolymer_length': [int(value) for value in
+                                           self.parse_sweep_values(self.sweep_homopolymer_var.get())],
+            }
+            target_count = int(self.sweep_target_count.get())
+            parameters = self.collect_design_parameters()
+        except ValueError as e:
+            messagebox.showerror("错误", f"扫描参数无效: {e}")
+            return
+
+        self.designer.profiler = StageProfiler() if self.profile_var.get() else None
+        self.sweep_btn.config(state=tk.DISABLED)
+        self.sweep_progress_var.set(0)
+        thread = threading.Thread(target=self.run_sweep, args=(sequence, parameters, grid, target_count))
+        thread.daemon = True
+        thread.start()
+
+    def run_sweep(self, sequence, parameters, grid, target_count):
+        """运行参数扫描"""
+        try:
+            self.log_message("=== 开始设计参数扫描 ===")
+            results = self.designer.sweep_parameters(
+                sequence, parameters, grid,
+                progress_callback=lambda value: self.ui_update_queue.put(("update_sweep_progress", [value])),
+                log_callback=self.log_message
+            )
+            if target_count > 0:
+                results = results.assign(distance=(results['probes'] - target_count).abs())
+                results = results.sort_values('distance', kind='stable').drop(columns='distance')
+            else:
+                results = results.sort_values('probes', ascending=False, kind='stable')
+            self.ui_update_queue.put(("update_sweep_results", [results.reset_index(drop=True)]))
+            if self.designer.profiler is not None:
+                self.log_message(self.designer.profiler.format_report())
+        except Exception as e:
+            self.log_message(f"❌ 参数扫描过程中出错: {str(e)}")
+            messagebox.showerror("错误", f"参数扫描过程中出错: {str(e)}")
+        finally:
+            self.ui_update_queue.put(("enable_sweep_buttons", []))
+
+    def show_sweep_results(self, results):
+        """把扫描结果填入表格"""
+        self.sweep_results = results
+        self.sweep_tree.delete(*self.sweep_tree.get_children())
+
+        def number(value, digits=2):
+            return "-" if pd.isna(value) else f"{value:.{digits}f}"
+
+        for index, row in enumerate(results.itertuples(index=False)):
+            self.sweep_tree.insert("", tk.END, iid=str(index), values=(
+                f"{row.min_gc:g}-{row.max_gc:g}", f"{row.min_tm:g}-{row.max_tm:g}", f"{row.min_complexity:g}",
+                row.max_homopolymer_length, row.windows, row.probes, number(row.mean_tm), number(row.mean_gc),
+                f"{number(row.min_probe_tm)}-{number(row.max_probe_tm)}"))
+        if len(results):
+            self.sweep_tree.selection_set("0")
+            self.sweep_apply_btn.config(state=tk.NORMAL)
+            self.sweep_export_btn.config(state=tk.NORMAL)
+
+    def enable_sweep_buttons(self):
+        self.sweep_btn.config(state=tk.NORMAL)
+
+    def apply_sweep_selection(self):
+        """把表格中选中的一组参数填回设计选项卡"""
+        selection = self.sweep_tree.selection()
+        if not selection or self.sweep_results is None:
+            return
+        row = self.sweep_results.iloc[int(selection[0])]
+        for widget, value in ((self.min_gc, f"{row['min_gc']:.1f}"), (self.max_gc, f"{row['max_gc']:.1f}"),
+                              (self.min_tm, f"{row['min_tm']:.1f}"), (self.max_tm, f"{row['max_tm']:.1f}"),
+                              (self.min_complexity, f"{row['min_complexity']:.2f}"),
+                              (self.max_homopolymer_length, str(int(row['max_homopolymer_length'])))):
+            widget.delete(0, tk.END)
+            widget.insert(0, value)
+        self.notebook.select(self.design_tab)
+        self.log_message(f"已应用扫描参数: GC {row['min_gc']:g}-{row['max_gc']:g}%，"
+                         f"Tm {row['min_tm']:g}-{row['max_tm']:g}°C，复杂度 {row['min_complexity']:g}，"
+                         f"同聚物 {int(row['max_homopolymer_length'])}（预计 {row['probes']} 个探针）")
+
+    def export_sweep_results(self):
+        """导出扫描结果表"""
+        if self.sweep_results is None:
+            return
+        filepath = filedialog.asksaveasfilename(
+            title="保存扫描结果",
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("Excel文件", "*.xlsx")]
+        )
+        if not filepath:
+            return
+        try:
+            if filepath.lower().endswith('.xlsx'):
+                self.sweep_results.to_excel(filepath, index=False)
+            else:
+                self.sweep_results.to_csv(filepath, index=False, encoding='utf-8-sig')
+            messagebox.showinfo("成功", f"扫描结果已导出到: {filepath}")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出扫描结果时出错: {str(e)}")
+
     def setup_revcomp_tab(self, tab):
         """设置反向互补工具选项卡"""
         # 标题
@@ -673,6 +1085,13 @@ class DNAProbeAnalyzerUI:
         self.revcomp_process_btn = ttk.Button(button_frame, text="处理并保存", command=self.process_revcomp, state=tk.DISABLED)
         self.revcomp_process_btn.pack(side=tk.LEFT, padx=5)
         
+        self.revcomp_cancel_btn = ttk.Button(button_frame, text="取消", command=self.cancel_revcomp, state=tk.DISABLED)
+        self.revcomp_cancel_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.revcomp_rna_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="输出RNA互补序列（A配对为U）",
+                        variable=self.revcomp_rna_var).pack(side=tk.LEFT, padx=5)
+        
         # 进度条
         self.revcomp_progress_var = tk.DoubleVar()
         self.revcomp_progress_bar = ttk.Progressbar(process_group, variable=self.revcomp_progress_var, maximum=100)
@@ -725,8 +1144,10 @@ class DNAProbeAnalyzerUI:
             return
             
         try:
-            self.revcomp_df = pd.read_csv(file_path)
+            # 只读取预览所需的前几行，完整文件在处理时流式读取
+            self.revcomp_df = pd.read_csv(file_path, nrows=self.REVCOMP_PREVIEW_ROWS)
             self.revcomp_current_file = file_path
+            row_count = DNAProbeAnalyzer.count_data_rows(file_path)
             
             # 更新列选择框
             self.revcomp_column_combo.config(state="normal")
@@ -742,7 +1163,7 @@ class DNAProbeAnalyzerUI:
             # 显示原始数据预览
             self.show_revcomp_data_preview()
             
-            self.log_message(f'成功加载文件: {os.path.basename(file_path)}，共 {len(self.revcomp_df)} 行')
+            self.log_message(f'成功加载文件: {os.path.basename(file_path)}，共 {row_count} 行')
             
         except Exception as e:
             messagebox.showerror("错误", f'加载文件时出错:\n{str(e)}')
@@ -756,15 +1177,6 @@ class DNAProbeAnalyzerUI:
             self.original_text.delete(1.0, tk.END)
             self.original_text.insert(tk.END, preview_text)
             
-    def get_reverse_complement(self, dna_sequence):
-        """计算反向互补序列"""
-        if pd.isna(dna_sequence) or not isinstance(dna_sequence, str):
-            return dna_sequence
-        try:
-            return str(Seq(dna_sequence).reverse_complement())
-        except Exception as e:
-            return f"错误: {str(e)}"
-
     def preview_revcomp(self):
         """预览反向互补结果"""
         if not hasattr(self, 'revcomp_df') or self.revcomp_df is None:
@@ -774,7 +1186,8 @@ class DNAProbeAnalyzerUI:
 
         # 创建副本进行处理预览
         preview_df = self.revcomp_df.head(10).copy()
-        preview_df['反向互补序列'] = preview_df[selected_column].apply(self.get_reverse_complement)
+        preview_df[REVCOMP_COLUMN] = reverse_complement_series(preview_df[selected_column],
+                                                              rna=self.revcomp_rna_var.get())
 
         # 显示结果
         preview_text = preview_df.to_string(index=False)
@@ -785,7 +1198,7 @@ class DNAProbeAnalyzerUI:
 
         
     def process_revcomp(self):
-        """处理并保存反向互补结果"""
+        """处理并保存反向互补结果（后台线程中按块流式处理整个文件）"""
         if not hasattr(self, 'revcomp_df') or self.revcomp_df is None:
             return
             
@@ -803,29 +1216,47 @@ class DNAProbeAnalyzerUI:
             
         # 显示进度条
         self.revcomp_progress_bar.grid()
-        self.revcomp_progress_bar['value'] = 0
-        self.revcomp_progress_bar['maximum'] = len(self.revcomp_df)
-        
+        self.revcomp_progress_var.set(0)
+        self.revcomp_process_btn.config(state=tk.DISABLED)
+        self.revcomp_cancel_btn.config(state=tk.NORMAL)
+        self.revcomp_job = JobControl(
+            "反向互补", '行',
+            progress_callback=lambda value: self.ui_update_queue.put(("update_revcomp_progress", [value])))
+        
+        thread = threading.Thread(target=self.run_revcomp, args=(
+            self.revcomp_current_file, save_path, selected_column, self.revcomp_rna_var.get(), self.revcomp_job))
+        thread.daemon = True
+        thread.start()
+    
+    def run_revcomp(self, input_file, save_path, column, rna, job):
+        """在后台线程中运行反向互补处理"""
         try:
-            # 处理数据
-            result_df = self.revcomp_df.copy()
-            for i, row in enumerate(self.revcomp_df.iterrows()):
-                result_df.at[row[0], '反向互补序列'] = self.get_reverse_complement(row[1][selected_column])
-                self.revcomp_progress_bar['value'] = i + 1
-                self.root.update_idletasks()  # 更新UI
-                
-            # 保存结果
-            result_df.to_csv(save_path, index=False, encoding='utf-8-sig')
-            
-            # 隐藏进度条
-            self.revcomp_progress_bar.grid_remove()
-            
+            processed = reverse_complement_file(
+                input_file, save_path, column, chunksize=self.REVCOMP_CHUNKSIZE, rna=rna, job=job
+            )
+            if processed is None:
+                self.log_message(f'反向互补处理已取消，已写入的部分保留在: {save_path}')
+                return
+            self.log_message(f'反向互补处理完成，共处理 {processed} 条序列')
+            self.log_message(job.format_summary())
             messagebox.showinfo("成功", f'处理完成！文件已保存至:\n{save_path}')
-            self.log_message(f'反向互补处理完成，共处理 {len(self.revcomp_df)} 条序列')
             
         except Exception as e:
-            self.revcomp_progress_bar.grid_remove()
             messagebox.showerror("错误", f'处理过程中出错:\n{str(e)}')
+        finally:
+            self.ui_update_queue.put(("revcomp_done", []))
+    
+    def cancel_revcomp(self):
+        """取消反向互补处理，在下一个数据块边界生效"""
+        if self.revcomp_job is not None:
+            self.revcomp_job.cancel()
+            self.log_message("⏹️ 反向互补取消请求已发送")
+    
+    def finish_revcomp(self):
+        """反向互补处理结束后恢复界面"""
+        self.revcomp_progress_bar.grid_remove()
+        self.revcomp_process_btn.config(state=tk.NORMAL)
+        self.revcomp_cancel_btn.config(state=tk.DISABLED)
             
     def browse_input_file(self):
         """浏览输入文件"""
@@ -892,27 +1323,35 @@ class DNAProbeAnalyzerUI:
         if directory:
             self.design_db_path_var.set(directory)
             
+    def browse_specificity_index(self):
+        """浏览本地特异性索引目录"""
+        directory = filedialog.askdirectory(title="选择特异性索引目录")
+        if directory:
+            self.specificity_index_var.set(directory)
+
     def load_fasta(self):
         """加载FASTA文件"""
         filepath = filedialog.askopenfilename(
             title="打开FASTA文件", 
-            filetypes=[("FASTA文件", "*.fasta *.fa *.fna"), ("所有文件", "*.*")]
+            filetypes=[("FASTA文件", "*.fasta *.fa *.fna *.gz"), ("所有文件", "*.*")]
         )
         
         if filepath:
             try:
-                # 使用简单的文件读取而不是Bio.SeqIO
-                with open(filepath, 'r') as f:
-                    content = f.read()
-                
-                # 提取序列部分（简单处理，跳过标题行）
-                lines = content.split('\n')
-                sequence_lines = [line for line in lines if not line.startswith('>') and line.strip()]
-                sequence = ''.join(sequence_lines)
+                # 只载入第一条记录，多记录文件不再拼接成一条嵌合序列
+                records = iter_fasta(filepath)
+                record = next(records, None)
+                if record is None:
+                    messagebox.showerror("错误", "FASTA文件中没有序列")
+                    return
+                record_id, sequence = record
                 
                 self.seq_input.delete(1.0, tk.END)
                 self.seq_input.insert(tk.END, sequence)
-                self.log_message(f"已加载序列来自: {os.path.basename(filepath)}")
+                self.log_message(f"已加载序列 {record_id} 来自: {os.path.basename(filepath)}")
+                if next(records, None) is not None:
+                    messagebox.showinfo("提示", f"文件包含多条记录，只载入了第一条（{record_id}）。\n"
+                                              "为所有记录设计探针请使用“批量设计FASTA”。")
             except Exception as e:
                 messagebox.showerror("错误", f"读取FASTA文件时出错: {str(e)}")
     
@@ -949,8 +1388,11 @@ class DNAProbeAnalyzerUI:
             self.log_message("⏸️ 分析暂停")
             
     def cancel_analysis(self):
-        """取消分析"""
-        self.cancel_flag.set()
+        """取消分析（分析后的BLAST正在运行时同时终止blastn进程）"""
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+        else:
+            self.cancel_flag.set()
         self.log_message("⏹️ 分析取消请求已发送")
         
     def start_analysis(self):
@@ -964,15 +1406,28 @@ class DNAProbeAnalyzerUI:
             messagebox.showerror("错误", f"输入文件不存在: {input_file}")
             return
             
-        # 检查输出文件是否已存在
+        # 上次中断留下检查点时询问是否续跑，续跑时保留已写出的部分结果
         output_file = self.output_file_var.get()
-        if os.path.exists(output_file) and not self.overwrite_var.get():
+        resume = self.ask_resume(RunCheckpoint.default_dir(output_file), "探针分析")
+        if resume is None:
+            return
+        blast_resume = False
+        if self.run_blast_var.get():
+            blast_resume = self.ask_resume(RunCheckpoint.default_dir(self.blast_output_var.get()), "BLAST")
+            if blast_resume is None:
+                return
+            
+        # 检查输出文件是否已存在
+        if not resume and os.path.exists(output_file) and not self.overwrite_var.get():
             if not messagebox.askyesno("确认", f"输出文件已存在: {output_file}\n是否覆盖?"):
                 return
             
         # 重置标志
         self.pause_flag.clear()
         self.cancel_flag.clear()
+        self.analysis_job = JobControl("探针分析", '条序列', progress_callback=self.update_progress,
+                                       status_callback=self.update_status,
+                                       pause_flag=self.pause_flag, cancel_flag=self.cancel_flag)
         
         # 禁用开始按钮，启用暂停和取消按钮
         self.start_button.config(state='disabled')
@@ -980,11 +1435,35 @@ class DNAProbeAnalyzerUI:
         self.cancel_button.config(state='normal')
         
         # 在新线程中运行分析，避免界面冻结
-        thread = threading.Thread(target=self.run_analysis)
+        thread = threading.Thread(target=self.run_analysis, args=(resume, blast_resume))
         thread.daemon = True
         thread.start()
         
-    def run_analysis(self):
+    def ask_resume(self, checkpoint_dir, task_name):
+        """存在检查点时询问是否续跑：True续跑，False从头开始，None放弃本次运行"""
+        manifest = RunCheckpoint.read_manifest(checkpoint_dir)
+        if manifest is None:
+            return False
+        return messagebox.askyesnocancel(
+            "断点续跑",
+            f"发现上次中断的{task_name}检查点（{manifest.get('updated', '未知时间')}）:\n"
+            f"{manifest.get('description', '')}\n\n"
+            f"是: 跳过已完成的部分继续运行\n否: 丢弃检查点从头开始\n取消: 不运行")
+        
+    def checkpoint_dir_for(self, output_file, enabled, resume=False):
+        """勾选保存检查点或选择续跑时使用输出文件旁的检查点目录，否则不记录检查点
+
+        未勾选且未续跑时删除上次留下的检查点（询问续跑时用户已选择丢弃），下次运行不再询问。
+        """
+        checkpoint_dir = RunCheckpoint.default_dir(output_file)
+        if enabled or resume:
+            return checkpoint_dir
+        if RunCheckpoint.exists(checkpoint_dir):
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+            self.log_message(f"已丢弃上次中断留下的检查点: {checkpoint_dir}")
+        return None
+        
+    def run_analysis(self, resume=False, blast_resume=False):
         """运行分析的主函数"""
         try:
             self.update_status("正在分析...")
@@ -998,20 +1477,30 @@ class DNAProbeAnalyzerUI:
                 'run_blast': self.run_blast_var.get(),
                 'blast_path': self.blast_path_var.get(),
                 'db_path': self.db_path_var.get(),
-                'blast_output': self.blast_output_var.get()
+                'blast_output': self.blast_output_var.get(),
+                'workers': int(self.workers_var.get()),
+                'blast_shards': int(self.blast_shards_var.get()),
+                'blast_threads': int(self.blast_threads_var.get()),
+                'stream_chunksize': 50000 if self.stream_var.get() else None,
+                'blast_long_table': self.blast_long_var.get(),
+                'checkpoint_dir': self.checkpoint_dir_for(self.output_file_var.get(), self.checkpoint_var.get(),
+                                                          resume),
+                'resume': resume,
+                # 不运行BLAST时没有询问过BLAST检查点，保持原样
+                'blast_checkpoint_dir': (self.checkpoint_dir_for(self.blast_output_var.get(),
+                                                                 self.checkpoint_var.get(), blast_resume)
+                                         if self.run_blast_var.get() else None),
+                'blast_resume': blast_resume
             }
             
+            self.analyzer.profiler = StageProfiler() if self.profile_var.get() else None
             self.log_message(f"输入文件: {config['input_file']}")
             self.log_message(f"Tm计算方法: {config['tm_method']}")
+            self.log_message(f"并行进程数: {config['workers']}")
             
-            # 读取文件获取总行数
+            # 统计换行符获取总行数，避免为进度条完整解析一遍文件
             try:
-                # 尝试不同的分隔符
-                try:
-                    df = pd.read_csv(config['input_file'])
-                except:
-                    df = pd.read_csv(config['input_file'], sep='\t')
-                total_rows = len(df)
+                total_rows = self.analyzer.count_data_rows(config['input_file'])
             except Exception as e:
                 self.log_message(f"读取文件错误: {e}")
                 self.ui_update_queue.put(("enable_buttons", []))
@@ -1020,11 +1509,9 @@ class DNAProbeAnalyzerUI:
             # 执行分析
             success = self.analyzer.analyze_probes(
                 config=config,
-                pause_flag=self.pause_flag,
-                cancel_flag=self.cancel_flag,
-                progress_callback=self.update_progress,
                 log_callback=self.log_message,
-                total_rows=total_rows
+                total_rows=total_rows,
+                job=self.analysis_job
             )
             
             if self.cancel_flag.is_set():
@@ -1034,16 +1521,17 @@ class DNAProbeAnalyzerUI:
             elif success:
                 self.update_status("分析完成")
                 self.log_message("✅ 分析顺利完成！")
+                self.log_message(self.analysis_job.format_summary())
                 
-                # 更新统计信息
+                # 更新统计信息（分析过程中已累加，无需重新读取结果文件）
                 try:
-                    results_df = pd.read_csv(config['output_file'])
-                    valid_seqs = results_df['valid_sequence'].sum() if 'valid_sequence' in results_df.columns else 0
-                    avg_tm = results_df['tm'].mean() if 'tm' in results_df.columns and not results_df['tm'].isnull().all() else 0
-                    avg_gc = results_df['gc_content'].mean() if 'gc_content' in results_df.columns and not results_df['gc_content'].isnull().all() else 0
+                    summary = self.analyzer.summary
+                    valid_seqs = summary['valid']
+                    avg_tm = summary['tm_sum'] / summary['tm_count'] if summary['tm_count'] else 0
+                    avg_gc = summary['gc_sum'] / summary['gc_count'] if summary['gc_count'] else 0
                     
                     self.ui_update_queue.put(("update_results", [
-                        str(total_rows),
+                        str(summary['total']),
                         str(valid_seqs),
                         f"{avg_tm:.2f}°C",
                         f"{avg_gc:.2f}%"
@@ -1083,156 +1571,73 @@ class DNAProbeAnalyzerUI:
                 return
                 
             # 检查数据库是否存在
-            db_name = os.path.basename(config['db_path'])
-            db_dir = os.path.dirname(config['db_path'])
-            db_files = [f for f in os.listdir(db_dir) if f.startswith(db_name)]
-            if not db_files:
+            if not blast_db_exists(config['db_path']):
                 self.log_message(f"❌ BLAST数据库不存在: {config['db_path']}")
                 messagebox.showerror("错误", f"BLAST数据库不存在: {config['db_path']}")
                 return
                 
-            # 创建临时FASTA文件用于BLAST查询
-            temp_fasta = tempfile.NamedTemporaryFile(mode='w', suffix='.fasta', delete=False)
-            try:
-                # 读取分析结果，只选择有效序列
-                results_df = pd.read_csv(config['output_file'])
-                valid_seqs = results_df[results_df['valid_sequence'] == True]
-                
-                if len(valid_seqs) == 0:
-                    self.log_message("❌ 没有有效的序列可供BLAST分析")
-                    messagebox.showwarning("警告", "没有有效的序列可供BLAST分析")
-                    return
-                    
-                # 写入FASTA文件
-                for _, row in valid_seqs.iterrows():
-                    seq_id = row['id']
-                    sequence = row['sequence']
-                    temp_fasta.write(f">{seq_id}\n{sequence}\n")
-                temp_fasta.close()
-                
-                self.log_message(f"创建临时FASTA文件: {temp_fasta.name}")
-                self.log_message(f"有效序列数: {len(valid_seqs)}")
-                
-                # 构建BLAST命令 - 添加-evalue 0.1参数
-                blast_cmd = [
-                    config['blast_path'],
-                    "-db", config['db_path'],
-                    "-query", temp_fasta.name,
-                    "-outfmt", "7",
-                    "-max_target_seqs", "30",  # 限制每个查询的最大命中数为30
-                    "-evalue", "0.1",  # 添加最低E值参数
-                    "-out", config['blast_output']
-                ]
-                
-                self.log_message(f"运行BLAST命令: {' '.join(blast_cmd)}")
-                
-                # 运行BLAST
-                process = subprocess.Popen(
-                    blast_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
+            # 读取分析结果，只选择有效序列
+            results_df = pd.read_csv(config['output_file'])
+            valid_seqs = results_df[results_df['valid_sequence'] == True]
+            
+            if len(valid_seqs) == 0:
+                self.log_message("❌ 没有有效的序列可供BLAST分析")
+                messagebox.showwarning("警告", "没有有效的序列可供BLAST分析")
+                return
                 
-                # 等待进程完成
-                stdout, stderr = process.communicate()
+            self.log_message(f"有效序列数: {len(valid_seqs)}")
+            records = list(zip(valid_seqs['id'], valid_seqs['sequence']))
+            
+            # 按分片并发运行BLAST
+            runner = BlastRunner(config['blast_path'], config['db_path'],
+                                 shards=config.get('blast_shards', 1),
+                                 num_threads=config.get('blast_threads', 1),
+                                 cache=self.blast_cache, profiler=self.analyzer.profiler)
+            job = self.analysis_job
+            job.name = "BLAST"
+            success, stderr = runner.run(records, config['blast_output'], log_callback=self.log_message, job=job,
+                                         checkpoint_dir=config['blast_checkpoint_dir'],
+                                         resume=config.get('blast_resume', False))
+            
+            if job.cancelled:
+                self.update_status("BLAST已取消")
+                messagebox.showinfo("信息", "BLAST分析已取消")
+            elif success:
+                self.log_message("✅ BLAST分析完成")
+                self.log_message(f"结果已保存到: {config['blast_output']}")
                 
-                if process.returncode == 0:
-                    self.log_message("✅ BLAST分析完成")
-                    self.log_message(f"结果已保存到: {config['blast_output']}")
-                    
-                    # 合并BLAST结果到Tm分析结果
-                    merged_file = config['output_file'].replace('.csv', '_with_blast.csv')
-                    if self.merge_blast_results(config['output_file'], config['blast_output'], merged_file):
-                        self.log_message(f"✅ 合并结果已保存到: {merged_file}")
-                        messagebox.showinfo("完成", f"BLAST分析完成！合并结果已保存到: {merged_file}")
-                    else:
-                        messagebox.showinfo("完成", f"BLAST分析完成！但合并结果失败，原始结果已保存到: {config['blast_output']}")
+                # 合并BLAST结果到Tm分析结果
+                merged_file = config['output_file'].replace('.csv', '_with_blast.csv')
+                long_file = config['output_file'].replace('.csv', '_blast_hits_long.csv') if config.get('blast_long_table') else None
+                if self.merge_blast_results(config['output_file'], config['blast_output'], merged_file, long_file):
+                    self.log_message(f"✅ 合并结果已保存到: {merged_file}")
+                    if long_file:
+                        self.log_message(f"✅ 长格式命中表已保存到: {long_file}")
+                    messagebox.showinfo("完成", f"BLAST分析完成！合并结果已保存到: {merged_file}")
                 else:
-                    self.log_message(f"❌ BLAST分析失败，错误信息: {stderr}")
-                    messagebox.showerror("错误", f"BLAST分析失败: {stderr}")
-                    
-            finally:
-                # 删除临时文件
-                os.unlink(temp_fasta.name)
+                    messagebox.showinfo("完成", f"BLAST分析完成！但合并结果失败，原始结果已保存到: {config['blast_output']}")
+            else:
+                self.log_message(f"❌ BLAST分析失败，错误信息: {stderr}")
+                messagebox.showerror("错误", f"BLAST分析失败: {stderr}")
                 
         except Exception as e:
             self.log_message(f"BLAST分析过程中出现错误: {e}")
             messagebox.showerror("错误", f"BLAST分析失败: {e}")
             
-    def merge_blast_results(self, tm_results_file, blast_results_file, output_file):
-        """合并Tm分析结果和BLAST结果（提取前20个BLAST命中，但只保留前5个的详细信息，并统计命中总数）"""
+    def clear_blast_cache(self, db_path):
+        """清除指定数据库的BLAST命中缓存"""
+        if self.blast_cache is None:
+            messagebox.showwarning("警告", "BLAST缓存不可用")
+            return
+        if not messagebox.askyesno("确认", f"清除数据库 {db_path} 的BLAST缓存？"):
+            return
+        removed = self.blast_cache.invalidate(db_path)
+        self.log_message(f"已清除BLAST缓存 {removed} 条（数据库: {db_path}）")
+
+    def merge_blast_results(self, tm_results_file, blast_results_file, output_file, long_output_file=None):
+        """合并Tm分析结果和BLAST结果（只保留前5个命中的详细信息，并统计命中总数）"""
         try:
-            # 读取Tm分析结果
-            tm_df = pd.read_csv(tm_results_file)
-            
-            # 解析BLAST结果文件，提取每个查询的命中信息
-            blast_data = {}
-            current_query = None
-            current_hits = []
-            hit_counts = {}  # 存储每个查询的命中总数
-            
-            with open(blast_results_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    
-                    # 检测新的查询开始
-                    if line.startswith('# Query:'):
-                        # 保存前一个查询的结果
-                        if current_query and current_hits:
-                            blast_data[current_query] = current_hits[:5]  # 只保留前5个命中的详细信息
-                            hit_counts[current_query] = len(current_hits)  # 保存命中总数
-                        
-                        # 开始新的查询
-                        current_query = line.split()[2]
-                        current_hits = []
-                    
-                    # 跳过注释行和空行
-                    elif line.startswith('#') or not line:
-                        continue
-                    
-                    # 处理数据行
-                    else:
-                        parts = line.split('\t')
-                        if len(parts) >= 12:  # 确保有足够的字段
-                            hit_info = {
-                                'subject': parts[1],  # subject acc.ver
-                                'identity': parts[2],  # % identity
-                                'evalue': parts[10],   # evalue
-                                'bitscore': parts[11]  # bit score
-                            }
-                            current_hits.append(hit_info)
-                
-                # 保存最后一个查询的结果
-                if current_query and current_hits:
-                    blast_data[current_query] = current_hits[:5]  # 只保留前5个命中的详细信息
-                    hit_counts[current_query] = len(current_hits)  # 保存命中总数
-            
-            # 为每个查询创建BLAST结果列
-            # 首先添加命中总数列
-            tm_df['blast_hits_count'] = tm_df['id'].map(lambda x: hit_counts.get(x, 0))
-            
-            # 为前5个命中创建详细信息列
-            for i in range(1, 6):  # 为前5个命中创建列
-                tm_df[f'blast_hit_{i}'] = ''
-                tm_df[f'blast_identity_{i}'] = ''
-                tm_df[f'blast_evalue_{i}'] = ''
-                tm_df[f'blast_bitscore_{i}'] = ''
-            
-            # 填充BLAST结果
-            for idx, row in tm_df.iterrows():
-                query_id = row['id']
-                if query_id in blast_data:
-                    hits = blast_data[query_id]
-                    for i, hit in enumerate(hits):
-                        if i < 5:  # 确保不超过5个
-                            tm_df.at[idx, f'blast_hit_{i+1}'] = hit['subject']
-                            tm_df.at[idx, f'blast_identity_{i+1}'] = hit['identity']
-                            tm_df.at[idx, f'blast_evalue_{i+1}'] = hit['evalue']
-                            tm_df.at[idx, f'blast_bitscore_{i+1}'] = hit['bitscore']
-            
-            # 保存合并后的结果
-            tm_df.to_csv(output_file, index=False)
+            merge_blast_results(tm_results_file, blast_results_file, output_file, long_output_file)
             return True
             
         except Exception as e:
@@ -1255,8 +1660,23 @@ class DNAProbeAnalyzerUI:
             messagebox.showerror("错误", "序列包含无效字符。只允许A,T,C,G,U")
             return
         
-        # 收集参数
-        parameters = {
+        parameters = self.collect_design_parameters()
+        self.designer.profiler = StageProfiler() if self.profile_var.get() else None
+        self.design_target_length = len(sequence)
+        
+        # 禁用设计按钮
+        self.design_btn.config(state=tk.DISABLED)
+        self.design_progress_var.set(0)
+        job = self.start_design_job("探针设计", '窗口')
+        
+        # 在新线程中运行设计，避免界面冻结
+        thread = threading.Thread(target=self.run_design, args=(sequence, parameters, job))
+        thread.daemon = True
+        thread.start()
+    
+    def collect_design_parameters(self):
+        """从设计选项卡收集设计参数"""
+        return {
             'probe_length': int(self.probe_length.get()),
             'min_gc': float(self.min_gc.get()),
             'max_gc': float(self.max_gc.get()),
@@ -1267,19 +1687,63 @@ class DNAProbeAnalyzerUI:
             'check_specificity': self.check_specificity.get(),
             'filter_repeats': self.filter_repeats.get(),
             'tm_method': self.design_tm_method.get(),
-            'max_homopolymer_length': int(self.max_homopolymer_length.get())
+            'max_homopolymer_length': int(self.max_homopolymer_length.get()),
+            'placement': self.design_placement.get(),
+            'specificity_index': self.specificity_index_var.get() if self.screen_on_design.get() else None,
+            'max_mismatches': int(self.max_mismatches.get())
         }
+    
+    def start_batch_design(self):
+        """为多记录FASTA文件中的每条记录设计探针，结果合并写入一个文件"""
+        fasta_path = filedialog.askopenfilename(
+            title="选择多记录FASTA文件",
+            filetypes=[("FASTA文件", "*.fasta *.fa *.fna *.gz"), ("所有文件", "*.*")]
+        )
+        if not fasta_path:
+            return
+        output_file = filedialog.asksaveasfilename(
+            title="保存批量设计结果",
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv")]
+        )
+        if not output_file:
+            return
         
-        # 禁用设计按钮
+        parameters = self.collect_design_parameters()
+        self.designer.profiler = StageProfiler() if self.profile_var.get() else None
         self.design_btn.config(state=tk.DISABLED)
+        self.batch_design_btn.config(state=tk.DISABLED)
         self.design_progress_var.set(0)
+        job = self.start_design_job("批量设计", '条记录')
         
-        # 在新线程中运行设计，避免界面冻结
-        thread = threading.Thread(target=self.run_design, args=(sequence, parameters))
+        # 并行进程数与分析选项卡共用
+        thread = threading.Thread(target=self.run_batch_design, args=(
+            fasta_path, output_file, parameters, int(self.workers_var.get()), job))
         thread.daemon = True
         thread.start()
     
-    def run_design(self, sequence, parameters):
+    def run_batch_design(self, fasta_path, output_file, parameters, workers, job):
+        """运行批量探针设计"""
+        try:
+            self.log_message("=== 开始批量RNA FISH探针设计 ===")
+            summary = self.designer.design_batch(
+                fasta_path, output_file, parameters, workers=workers,
+                log_callback=self.log_message, job=job
+            )
+            if summary is None:
+                messagebox.showinfo("信息", f"批量设计已取消，已完成的记录保留在: {output_file}")
+                return
+            messagebox.showinfo("完成", f"批量设计完成！共 {summary['records']} 条记录，"
+                                      f"{summary['probes']} 个探针。\n结果已保存到: {output_file}")
+        except Exception as e:
+            self.log_message(f"❌ 批量设计过程中出错: {str(e)}")
+            messagebox.showerror("错误", f"批量设计过程中出错: {str(e)}")
+        finally:
+            self.design_btn.config(state=tk.NORMAL)
+            self.batch_design_btn.config(state=tk.NORMAL)
+            self.ui_update_queue.put(("design_job_done", [job]))
+    
+    def run_design(self, sequence, parameters, job):
         """运行探针设计"""
         try:
             self.log_message("=== 开始RNA FISH探针设计 ===")
@@ -1291,13 +1755,29 @@ class DNAProbeAnalyzerUI:
             self.log_message(f"最小复杂度: {parameters['min_complexity']}")
             self.log_message(f"过滤重复序列: {'是' if parameters['filter_repeats'] else '否'}")
             
+            # 清空结果表格，设计过程中找到的探针分批追加显示
+            self.ui_update_queue.put(("update_design_tree", [[]]))
+            pending = []
+            last_flush = [time.time()]
+            
+            def on_probe(probe):
+                pending.append(probe)
+                if time.time() - last_flush[0] >= 0.25:
+                    self.ui_update_queue.put(("append_design_rows", [pending[:]]))
+                    pending.clear()
+                    last_flush[0] = time.time()
+            
             # 执行设计
             probes = self.designer.design_probes(
                 target_sequence=sequence,
                 parameters=parameters,
-                progress_callback=self.update_design_progress,
-                log_callback=self.log_message
+                log_callback=self.log_message,
+                probe_callback=on_probe,
+                job=job
             )
+            if probes is None:
+                self.log_message("❌ 探针设计已取消")
+                return
             
             # 更新设计结果
             self.design_results = probes
@@ -1315,12 +1795,57 @@ class DNAProbeAnalyzerUI:
             
             self.ui_update_queue.put(("enable_design_buttons", []))
             self.log_message(f"✅ 探针设计完成，共设计{len(probes)}个探针")
+            if self.designer.profiler is not None:
+                self.log_message(self.designer.profiler.format_report())
             
         except Exception as e:
             self.log_message(f"❌ 探针设计过程中出错: {str(e)}")
             messagebox.showerror("错误", f"探针设计过程中出错: {str(e)}")
         finally:
             self.design_btn.config(state=tk.NORMAL)
+            self.ui_update_queue.put(("design_job_done", [job]))
+    
+    def start_design_job(self, name, unit):
+        """为设计选项卡的后台任务新建任务控制，暂停/取消按钮作用于该任务"""
+        job = JobControl(name, unit, progress_callback=self.update_design_progress,
+                         status_callback=lambda message: self.ui_update_queue.put(
+                             ("update_design_job_status", [message])))
+        self.design_job = job
+        self.design_pause_btn.config(state=tk.NORMAL, text="暂停")
+        self.design_cancel_btn.config(state=tk.NORMAL)
+        return job
+    
+    def finish_design_job(self, job):
+        """任务结束后禁用暂停/取消按钮（期间又启动了新任务时保持不变）"""
+        if job is not self.design_job:
+            return
+        self.design_job = None
+        if job.cancelled:
+            self.design_job_var.set(f"{job.name}: 已取消")
+        self.design_pause_btn.config(state=tk.DISABLED, text="暂停")
+        self.design_cancel_btn.config(state=tk.DISABLED)
+    
+    def toggle_design_pause(self):
+        """暂停或继续当前设计/BLAST任务，在下一个检查点生效"""
+        job = self.design_job
+        if job is None:
+            return
+        if job.paused:
+            job.resume()
+            self.design_pause_btn.config(text="暂停")
+            self.log_message(f"▶️ {job.name}继续")
+        else:
+            job.pause()
+            self.design_pause_btn.config(text="继续")
+            self.log_message(f"⏸️ {job.name}暂停")
+    
+    def cancel_design_job(self):
+        """取消当前设计/BLAST任务，BLAST运行中时立即终止blastn进程"""
+        job = self.design_job
+        if job is None:
+            return
+        job.cancel()
+        self.log_message(f"⏹️ {job.name}取消请求已发送")
     
     def run_design_blast(self):
         """对设计的探针运行BLAST分析"""
@@ -1336,134 +1861,164 @@ class DNAProbeAnalyzerUI:
             messagebox.showerror("错误", f"BLAST程序不存在: {blast_path}")
             return
         
-        # 创建临时FASTA文件
-        temp_fasta = tempfile.NamedTemporaryFile(mode='w', suffix='.fasta', delete=False)
+        # 选择BLAST输出文件
+        blast_output = filedialog.asksaveasfilename(
+            title="保存BLAST结果",
+            defaultextension=".txt",
+            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+        )
+        
+        if not blast_output:
+            return
+        
+        resume = self.ask_resume(RunCheckpoint.default_dir(blast_output), "BLAST")
+        if resume is None:
+            return
+        checkpoint_dir = self.checkpoint_dir_for(blast_output, self.design_blast_checkpoint_var.get(), resume)
+        
+        # 在后台线程中运行BLAST，结果随查询完成逐步显示
+        self.blast_btn.config(state=tk.DISABLED)
+        job = self.start_design_job("BLAST", '条序列')
+        thread = threading.Thread(target=self.execute_design_blast, args=(
+            blast_path, db_path, blast_output,
+            int(self.design_blast_shards.get()), int(self.design_blast_threads.get()), job,
+            checkpoint_dir, resume))
+        thread.daemon = True
+        thread.start()
+    
+    def execute_design_blast(self, blast_path, db_path, blast_output, shards, num_threads, job,
+                             checkpoint_dir=None, resume=False):
+        """运行设计探针的BLAST，每个查询完成后立即更新特异性"""
         try:
-            # 写入探针序列到临时文件
-            for probe in self.design_results:
-                temp_fasta.write(f">{probe['id']}\n{probe['sequence']}\n")
-            temp_fasta.close()
-            
-            # 选择BLAST输出文件
-            blast_output = filedialog.asksaveasfilename(
-                title="保存BLAST结果",
-                defaultextension=".txt",
-                filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
-            )
-            
-            if not blast_output:
-                return
-            
             self.log_message("=== 开始BLAST分析设计探针 ===")
             
-            # 构建BLAST命令 - 添加-evalue 0.1参数
-            blast_cmd = [
-                blast_path,
-                "-db", db_path,
-                "-query", temp_fasta.name,
-                "-outfmt", "7",
-                "-max_target_seqs", "30",  # 限制每个查询的最大命中数为30
-                "-evalue", "0.1",  # 添加最低E值参数
-                "-out", blast_output
-            ]
-            
-            self.log_message(f"运行BLAST命令: {' '.join(blast_cmd)}")
+            probes_by_id = {str(probe['id']): probe for probe in self.design_results}
+            seen = set()
+            last_refresh = [time.time()]
             
-            # 运行BLAST
-            process = subprocess.Popen(
-                blast_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            
-            # 等待进程完成
-            stdout, stderr = process.communicate()
-            
-            if process.returncode == 0:
+            def on_result(query, hits):
+                if query not in probes_by_id:
+                    return
+                self.apply_blast_hits(probes_by_id[query], hits)
+                seen.add(query)
+                # 每秒最多刷新一次表格
+                if time.time() - last_refresh[0] >= 1.0:
+                    last_refresh[0] = time.time()
+                    self.ui_update_queue.put(("update_design_tree", [self.design_results]))
+                    self.log_message(f"BLAST进度: {len(seen)}/{len(probes_by_id)} 个探针")
+            
+            # 按分片并发运行BLAST
+            records = [(probe['id'], probe['sequence']) for probe in self.design_results]
+            runner = BlastRunner(blast_path, db_path, shards=shards, num_threads=num_threads,
+                                 cache=self.blast_cache, profiler=self.designer.profiler)
+            success, stderr = runner.run(records, blast_output, log_callback=self.log_message,
+                                         result_callback=on_result, job=job,
+                                         checkpoint_dir=checkpoint_dir, resume=resume)
+            
+            if job.cancelled:
+                # 已返回的查询保留特异性结果，其余探针保持原状
+                self.ui_update_queue.put(("update_design_tree", [self.design_results]))
+                messagebox.showinfo("信息", f"BLAST已取消，已完成 {len(seen)}/{len(probes_by_id)} 个探针")
+            elif success:
                 self.log_message("✅ BLAST分析完成")
                 
-                # 解析BLAST结果并更新探针特异性
-                self.parse_blast_results(blast_output)
+                # 报告中没有出现的探针视为无匹配
+                for probe_id, probe in probes_by_id.items():
+                    if probe_id not in seen:
+                        probe['specificity'] = "无匹配"
                 self.ui_update_queue.put(("update_design_tree", [self.design_results]))
                 
                 messagebox.showinfo("完成", f"BLAST分析完成！结果已保存到: {blast_output}")
             else:
                 self.log_message(f"❌ BLAST分析失败，错误信息: {stderr}")
                 messagebox.showerror("错误", f"BLAST分析失败: {stderr}")
-                
+        except Exception as e:
+            self.log_message(f"BLAST分析过程中出现错误: {e}")
+            messagebox.showerror("错误", f"BLAST分析失败: {e}")
         finally:
-            # 删除临时文件
-            os.unlink(temp_fasta.name)
+            self.ui_update_queue.put(("enable_design_buttons", []))
+            self.ui_update_queue.put(("design_job_done", [job]))
     
     def parse_blast_results(self, blast_output_file):
         """解析BLAST结果并更新探针特异性"""
         try:
-            blast_results = {}
+            probes_by_id = {str(probe['id']): probe for probe in self.design_results}
+            seen = set()
             
+            # 逐个查询流式解析，无需把整个报告读入内存
             with open(blast_output_file, 'r') as f:
-                current_query = None
-                hits = []
-                
-                for line in f:
-                    line = line.strip()
-                    
-                    if line.startswith('# Query:'):
-                        if current_query and hits:
-                            blast_results[current_query] = hits
-                        
-                        current_query = line.split()[2]
-                        hits = []
-                    
-                    elif line.startswith('#') or not line:
-                        continue
-                    
-                    else:
-                        parts = line.split('\t')
-                        if len(parts) >= 12:
-                            hit_info = {
-                                'subject': parts[1],
-                                'identity': float(parts[2]),
-                                'evalue': float(parts[10]),
-                                'bitscore': float(parts[11])
-                            }
-                            hits.append(hit_info)
-                
-                # 添加最后一个查询的结果
-                if current_query and hits:
-                    blast_results[current_query] = hits
+                for query, hits in iter_blast_results(f):
+                    if query in probes_by_id:
+                        self.apply_blast_hits(probes_by_id[query], hits)
+                        seen.add(query)
             
-            # 更新探针特异性
-            for probe in self.design_results:
-                probe_id = str(probe['id'])
-                if probe_id in blast_results:
-                    hits = blast_results[probe_id]
-                    hit_count = len(hits)
-                    
-                    # 计算特异性评分（基于最高identity、evalue和命中数量）
-                    if hits:
-                        best_hit = hits[0]
-                        identity = best_hit['identity']
-                        evalue = best_hit['evalue']
-                        
-                        # 新的特异性判断逻辑
-                        if identity > 99 and evalue < 1e-5 and hit_count < 5:
-                            probe['specificity'] = "高"
-                        elif identity > 95 and evalue < 1e-4 and hit_count < 10:
-                            probe['specificity'] = "中"
-                        elif identity > 75 and evalue < 0.01 and hit_count < 20:
-                            probe['specificity'] = "低"
-                        else:
-                            probe['specificity'] = "不建议使用"
-                            
-                        # 添加BLAST命中详细信息
-                        probe['blast_hits'] = hits[:10]  # 保存前10个命中
-                else:
+            for probe_id, probe in probes_by_id.items():
+                if probe_id not in seen:
                     probe['specificity'] = "无匹配"
                     
         except Exception as e:
             self.log_message(f"解析BLAST结果时出错: {e}")
     
+    def apply_blast_hits(self, probe, hits):
+        """根据一个查询的BLAST命中更新探针特异性"""
+        apply_specificity(probe, hits)
+
+    def start_index_build(self):
+        """选择转录组FASTA，在后台线程中构建本地特异性索引"""
+        fasta_path = filedialog.askopenfilename(
+            title="选择转录组FASTA文件",
+            filetypes=[("FASTA文件", "*.fasta *.fa *.fna *.gz"), ("所有文件", "*.*")]
+        )
+        if not fasta_path:
+            return
+        index_dir = self.specificity_index_var.get() or filedialog.askdirectory(title="选择索引保存目录")
+        if not index_dir:
+            return
+        self.specificity_index_var.set(index_dir)
+        thread = threading.Thread(target=self.run_index_build, args=(fasta_path, index_dir))
+        thread.daemon = True
+        thread.start()
+
+    def run_index_build(self, fasta_path, index_dir):
+        """构建本地特异性索引"""
+        try:
+            KmerOffTargetIndex.build(fasta_path, index_dir, progress_callback=self.update_design_progress,
+                                     log_callback=self.log_message)
+            messagebox.showinfo("完成", f"特异性索引构建完成，保存在: {index_dir}")
+        except Exception as e:
+            self.log_message(f"❌ 构建特异性索引时出错: {e}")
+            messagebox.showerror("错误", f"构建特异性索引时出错: {e}")
+        finally:
+            self.update_design_progress(0)
+
+    def run_design_screen(self):
+        """用本地特异性索引筛查设计结果，替代BLAST填写特异性"""
+        if not hasattr(self, 'design_results') or not self.design_results:
+            messagebox.showerror("错误", "没有设计结果可供筛查")
+            return
+        index_dir = self.specificity_index_var.get()
+        if not index_dir or not KmerOffTargetIndex.exists(index_dir):
+            messagebox.showerror("错误", f"特异性索引不存在: {index_dir}")
+            return
+        parameters = {'specificity_index': index_dir, 'max_mismatches': int(self.max_mismatches.get())}
+        self.screen_btn.config(state=tk.DISABLED)
+        thread = threading.Thread(target=self.execute_design_screen, args=(parameters,))
+        thread.daemon = True
+        thread.start()
+
+    def execute_design_screen(self, parameters):
+        """在后台线程中筛查全部设计探针并刷新表格"""
+        try:
+            start = time.time()
+            self.designer.screen_probes(self.design_results, parameters, log_callback=self.log_message)
+            self.log_message(f"✅ 本地特异性筛查完成，用时 {time.time() - start:.2f} 秒")
+            self.ui_update_queue.put(("update_design_tree", [self.design_results]))
+        except Exception as e:
+            self.log_message(f"❌ 本地特异性筛查时出错: {e}")
+            messagebox.showerror("错误", f"本地特异性筛查时出错: {e}")
+        finally:
+            self.ui_update_queue.put(("enable_design_buttons", []))
+    
     def export_design_results(self):
         """导出设计结果"""
         if not hasattr(self, 'design_results') or not self.design_results:
@@ -1480,12 +2035,7 @@ class DNAProbeAnalyzerUI:
             try:
                 # 使用pandas导出结果，如果没有安装pandas，则使用csv模块
                 try:
-                    df = pd.DataFrame(self.design_results)
-                    # 处理blast_hits列（如果是列表）
-                    if 'blast_hits' in df.columns:
-                        df['blast_hits'] = df['blast_hits'].apply(
-                            lambda x: '; '.join([f"{h['subject']}({h['identity']}%)" for h in x]) if isinstance(x,
-                                                                                                                list) else '')
+                    df = design_results_frame(self.design_results)
                     df.to_csv(filepath, index=False)
                 except ImportError:
                     # 如果没有pandas，使用csv模块
@@ -1518,6 +2068,8 @@ class DNAProbeAnalyzerUI:
                             writer.writerow(row)
                 
                 self.log_message(f"设计结果已导出到: {filepath}")
+                if self.designer.profiler is not None:
+                    self.designer.profiler.publish(filepath, self.log_message)
                 messagebox.showinfo("成功", f"设计结果已导出到: {filepath}")
             except Exception as e:
                 self.log_message(f"导出结果时出错: {str(e)}")
@@ -1525,395 +2077,256 @@ class DNAProbeAnalyzerUI:
 
 
 ###########################################################################
-# RNA探针设计器类 - 新增功能模块
+# 界面更新通道 - 界面组件
 ###########################################################################
-class RNAProbeDesigner:
-    def __init__(self):
-        self.results = []
-    
-    def calculate_gc(self, sequence):
-        """计算序列的GC含量百分比"""
-        gc_count = sequence.count('G') + sequence.count('C')
-        return (gc_count / len(sequence)) * 100 if len(sequence) > 0 else 0
-
-    def calculate_tm(self, sequence, method='santalucia'):
-        """使用Bio.SeqUtils.MeltingTemp计算熔解温度"""
-        if not sequence or not isinstance(sequence, str):
-            return None
-            
-        sequence = sequence.upper().strip()
-        
-        # 替换U为T，因为MeltingTemp模块处理的是DNA序列
-        sequence = sequence.replace('U', 'T')
-        
-        if not self.check_sequence_validity(sequence):
-            return None
-            
-        try:
-            if method == 'santalucia':
-                tm = mt.Tm_NN(Seq(sequence), nn_table=mt.DNA_NN1)
-            elif method == 'wallace':
-                tm = mt.Tm_Wallace(Seq(sequence))
-            elif method == 'gc':
-                tm = mt.Tm_GC(Seq(sequence))
-            elif method == 'nn':
-                tm = mt.Tm_NN(Seq(sequence))
-            else:
-                tm = mt.Tm_NN(Seq(sequence))
-            return round(tm, 2)
-        except Exception as e:
-            return None
-    
-    def check_sequence_validity(self, sequence):
-        """检查序列有效性"""
-        if not sequence:
-            return False
-            
-        sequence = sequence.upper().strip()
-        # 替换U为T，因为MeltingTemp模块处理的是DNA序列
-        sequence = sequence.replace('U', 'T')
-        valid_chars = set('ATCGN')
-        return all(char in valid_chars for char in sequence) and len(sequence) > 0
-    
-    def calculate_complexity(self, sequence):
-        """计算序列复杂度（基于序列熵）"""
-        if len(sequence) <= 1:
-            return 0
-            
-        # 计算碱基频率
-        base_counts = Counter(sequence)
-        total = len(sequence)
-        
-        # 计算熵
-        entropy = 0
-        for count in base_counts.values():
-            p = count / total
-            entropy -= p * np.log2(p)
-            
-        # 标准化到0-2范围（最大熵为2，当4种碱基各占25%时）
-        return entropy / 2
-    
-    def has_repeats(self, sequence, target_sequence, min_repeat_length=6):
-        """检查序列是否在目标序列中有重复出现"""
-        # 检查序列自身是否有重复
-        for i in range(len(sequence) - min_repeat_length + 1):
-            substring = sequence[i:i+min_repeat_length]
-            if sequence.count(substring) > 1:
-                return True
-                
-        # 检查序列是否在目标序列的其他位置出现（除了它本身的位置）
-        occurrences = []
-        start_idx = 0
-        while True:
-            idx = target_sequence.find(sequence, start_idx)
-            if idx == -1:
-                break
-            occurrences.append(idx)
-            start_idx = idx + 1
-            
-        # 如果有多个出现位置，则认为是重复
-        return len(occurrences) > 1
+class UIUpdateChannel:
+    """后台线程向界面线程传递更新的通道：日志批量合并，进度/状态类更新只保留最新值，其余事件按顺序保留"""
 
-    def has_homopolymer(self, sequence, max_homopolymer_length):
-        """检查序列中是否存在超过指定长度的连续相同碱基"""
-        for base in 'ATCG':
-            if base * (max_homopolymer_length + 1) in sequence:
-                return True
-        return False
+    # 只需要最新值的更新
+    COALESCED_TASKS = ("update_progress", "update_design_progress", "update_status",
+                       "update_results", "update_design_stats", "update_revcomp_progress",
+                       "update_sweep_progress", "update_design_job_status")
+    # 日志控件和待处理日志保留的最大行数
+    LOG_MAX_LINES = 5000
 
-    def design_probes(self, target_sequence, parameters, progress_callback=None, log_callback=None):
-        """设计RNA FISH探针的核心算法"""
-        probes = []
-        seq = target_sequence.upper()  # 直接使用字符串
-        seq_length = len(seq)
-
-        # 获取参数
-        probe_length = parameters['probe_length']
-        min_gc = parameters['min_gc']
-        max_gc = parameters['max_gc']
-        min_tm = parameters['min_tm']
-        max_tm = parameters['max_tm']
-        spacing = parameters['spacing']
-        min_complexity = parameters['min_complexity']
-        filter_repeats = parameters['filter_repeats']
-        tm_method = parameters.get('tm_method', 'santalucia')
-        max_homopolymer_length = parameters.get('max_homopolymer_length', 3)  # 新增参数，默认值为3
-
-        # 沿着序列设计探针
-        position = 0
-        probe_id = 1
-        last_progress = -1
-
-        while position < seq_length - probe_length:
-            # 更新进度（每1%更新一次）
-            if progress_callback:
-                current_progress = int((position / seq_length) * 100)
-                if current_progress != last_progress:
-                    progress_callback(current_progress)
-                    last_progress = current_progress
-
-            # 获取候选探针序列（RNA片段）
-            rna_fragment = seq[position:position + probe_length]
-
-            # 计算反向互补序列（DNA探针）
-            # 将RNA转换为DNA：U→T，然后计算反向互补
-            dna_fragment = rna_fragment.replace('U', 'T')
-            candidate_seq = Seq(dna_fragment)
-            candidate = str(candidate_seq.reverse_complement())
-
-            # 计算GC含量
-            gc_content = self.calculate_gc(candidate)
-
-            # 计算熔解温度
-            tm = self.calculate_tm(candidate, method=tm_method)
-
-            # 计算复杂度
-            complexity = self.calculate_complexity(candidate)
-
-            # 检查重复序列
-            has_repeats = self.has_repeats(rna_fragment, seq) if filter_repeats else False
-
-            # 检查是否存在超过指定长度的连续相同碱基
-            has_homopolymer = self.has_homopolymer(candidate, max_homopolymer_length)
-
-            # 检查是否符合条件
-            if (tm is not None and gc_content is not None and
-                    min_gc <= gc_content <= max_gc and
-                    min_tm <= tm <= max_tm and
-                    complexity >= min_complexity and
-                    not has_repeats and
-                    not has_homopolymer):  # 新增条件
-
-                if log_callback:
-                    log_callback(
-                        f"找到探针 {probe_id}: {candidate} (GC: {gc_content:.2f}%, Tm: {tm:.2f}°C, 复杂度: {complexity:.3f})")
-
-                # 添加到探针列表
-                probes.append({
-                    'id': probe_id,
-                    'sequence': candidate,  # 存储DNA探针序列
-                    'rna_fragment': rna_fragment,  # 存储对应的RNA片段
-                    'start': position + 1,
-                    'end': position + probe_length,
-                    'gc_content': gc_content,
-                    'tm': tm,
-                    'complexity': complexity,
-                    'specificity': '未检查'
-                })
-                probe_id += 1
-                position += probe_length + spacing - 1
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logs = deque(maxlen=self.LOG_MAX_LINES)
+        self._latest = {}
+        self._events = deque()
+        self.dropped_logs = 0
+        self.peak_depth = 0
+
+    def put(self, item):
+        """加入一个(任务, 参数列表)更新，与queue.Queue.put的调用方式相同"""
+        task, args = item
+        with self._lock:
+            if task == "log_message":
+                if len(self._logs) == self._logs.maxlen:
+                    self.dropped_logs += 1
+                self._logs.append(args[0])
+            elif task in self.COALESCED_TASKS:
+                self._latest[task] = args
             else:
-                position += 1
-
-        return probes
+                self._events.append((task, args))
+            self.peak_depth = max(self.peak_depth, self._depth())
+
+    def drain(self):
+        """取出全部待处理更新，返回(日志行列表, {任务: 最新参数}, [(任务, 参数)])"""
+        with self._lock:
+            logs = list(self._logs)
+            if self.dropped_logs:
+                logs.insert(0, f"...（界面处理不及，省略了 {self.dropped_logs} 行日志）")
+                self.dropped_logs = 0
+            latest = self._latest
+            events = list(self._events)
+            self._logs.clear()
+            self._latest = {}
+            self._events.clear()
+        return logs, latest, events
+
+    def _depth(self):
+        return len(self._logs) + len(self._latest) + len(self._events)
+
+    def depth(self):
+        """当前待处理的更新数量"""
+        with self._lock:
+            return self._depth()
 
 
 ###########################################################################
-# DNA探针分析器类 - 核心功能模块
+# 虚拟化结果表格 - 界面组件
 ###########################################################################
-class DNAProbeAnalyzer:
-    def __init__(self):
-        self.results = []
-    
-    #######################################################################
-    # 序列分析模块
-    #######################################################################
-    def calculate_tm(self, sequence, method='santalucia'):
-        """计算DNA序列的Tm值"""
-        if not sequence or not isinstance(sequence, str):
-            return None
-            
-        sequence = sequence.upper().strip()
-        
-        if not self.check_sequence_validity(sequence):
-            return None
-            
-        try:
-            if method == 'santalucia':
-                tm = mt.Tm_NN(Seq(sequence), nn_table=mt.DNA_NN1)
-            elif method == 'wallace':
-                tm = mt.Tm_Wallace(Seq(sequence))
-            elif method == 'gc':
-                tm = mt.Tm_GC(Seq(sequence))
-            elif method == 'nn':
-                tm = mt.Tm_NN(Seq(sequence))
-            else:
-                tm = mt.Tm_NN(Seq(sequence))
-            return round(tm, 2)
-        except Exception as e:
-            return None
-    
-    def calculate_gc_content(self, sequence):
-        """计算GC含量"""
-        if not sequence or not isinstance(sequence, str):
-            return None
-            
-        sequence = sequence.upper().strip()
-        
-        if not self.check_sequence_validity(sequence):
-            return None
-            
-        try:
-            gc_count = sequence.count('G') + sequence.count('C')
-            total_bases = len(sequence)
-            
-            if total_bases == 0:
-                return 0.0
-                
-            gc_content = (gc_count / total_bases) * 100
-            return round(gc_content, 2)
-        except Exception as e:
-            return None
-    
-    def check_sequence_validity(self, sequence):
-        """检查序列有效性"""
-        if not sequence:
-            return False
-            
-        sequence = sequence.upper().strip()
-        valid_chars = set('ATCGN')
-        return all(char in valid_chars for char in sequence) and len(sequence) > 0
-    
-    #######################################################################
-    # 主分析模块
-    #######################################################################
-    def analyze_probes(self, config, pause_flag=None, cancel_flag=None, progress_callback=None, 
-                      log_callback=None, total_rows=None):
-        """主分析函数"""
-        input_file = config['input_file']
-        if not os.path.exists(input_file):
-            if log_callback:
-                log_callback(f"错误：输入文件 {input_file} 不存在")
-            return False
-        
-        try:
-            # 尝试不同的分隔符
-            try:
-                df = pd.read_csv(input_file)
-            except:
-                df = pd.read_csv(input_file, sep='\t')
-                
-            if log_callback:
-                log_callback(f"成功读取文件，共 {len(df)} 条序列")
-        except Exception as e:
-            if log_callback:
-                log_callback(f"读取CSV文件错误: {e}")
-            return False
-        
-        # 检查必要的列
-        required_columns = ['sequence']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            if log_callback:
-                log_callback(f"CSV文件中缺少必要的列: {missing_columns}")
-                log_callback(f"文件列名: {list(df.columns)}")
-            return False
-        
-        results = []
-        last_progress = -1
-        
-        for index, row in df.iterrows():
-            # 检查是否取消
-            if cancel_flag and cancel_flag.is_set():
-                if log_callback:
-                    log_callback("分析被用户取消")
+class VirtualProbeTable:
+    """只渲染可见行的探针结果表格：探针保存在列表中，筛选和排序只调整下标视图，滚动时复用固定数量的行"""
+
+    # (列标题, 探针字段, 显示格式)
+    COLUMNS = (
+        ("ID", 'id', str),
+        ("序列", 'sequence', str),
+        ("起始位置", 'start', str),
+        ("结束位置", 'end', str),
+        ("GC含量 (%)", 'gc_content', lambda value: f"{value:.2f}"),
+        ("熔解温度 (°C)", 'tm', lambda value: f"{value:.2f}"),
+        ("复杂度", 'complexity', lambda value: f"{value:.3f}"),
+        ("特异性", 'specificity', str),
+    )
+    DEFAULTS = {'complexity': 0, 'specificity': '未检查'}
+    # 特异性排序顺序（无匹配最好，未检查排在最后）
+    SPECIFICITY_ORDER = {'无匹配': 0, '高': 1, '中': 2, '低': 3, '不建议使用': 4, '未检查': 5}
+
+    def __init__(self, parent, height=10):
+        self.tree = ttk.Treeview(parent, columns=[column[0] for column in self.COLUMNS],
+                                 show="headings", height=height, selectmode="browse")
+        for heading, field, _ in self.COLUMNS:
+            self.tree.heading(heading, text=heading, command=lambda field=field: self.sort_by(field))
+            self.tree.column(heading, width=100)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scroll)
+
+        self.probes = []
+        self.view = []  # 通过筛选的探针下标，按当前排序排列
+        self.items = []  # 复用的Treeview行
+        self.top = 0
+        self.rows = height
+        self.sort_field = None
+        self.sort_reverse = False
+        self.ranges = {}
+        self.specificity = None
+        self.selected_index = None
+
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll_to(self.top - event.delta // 40))
+        self.tree.bind('<Button-4>', lambda event: self.scroll_to(self.top - 3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_to(self.top + 3))
+        self.tree.bind('<Up>', lambda event: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda event: self.move_selection(1))
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select, add='+')
+
+    def set_probes(self, probes):
+        """替换全部数据（列表按引用保存，探针字段更新后调用refresh即可）"""
+        self.probes = probes
+        self.refresh()
+
+    def append(self, probes):
+        """追加探针（设计过程中增量显示），不重建已有的行"""
+        start = len(self.probes)
+        self.probes.extend(probes)
+        self.view.extend(index for index in range(start, len(self.probes)) if self.matches(self.probes[index]))
+        if self.sort_field is not None:
+            self.sort_view()
+        self.render()
+
+    def refresh(self):
+        """按当前筛选和排序重建下标视图"""
+        self.view = [index for index, probe in enumerate(self.probes) if self.matches(probe)]
+        if self.sort_field is not None:
+            self.sort_view()
+        self.top = max(0, min(self.top, len(self.view) - self.rows))
+        self.render()
+
+    def set_filter(self, ranges, specificity=None):
+        """设置筛选条件：ranges为{字段: (下限, 上限)}，None表示不限"""
+        self.ranges = ranges
+        self.specificity = specificity
+        self.top = 0
+        self.refresh()
+
+    def matches(self, probe):
+        for field, (low, high) in self.ranges.items():
+            value = probe.get(field, self.DEFAULTS.get(field))
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
                 return False
-                
-            # 检查是否暂停
-            if pause_flag and pause_flag.is_set():
-                if log_callback:
-                    log_callback("分析暂停中...")
-                while pause_flag.is_set():
-                    time.sleep(0.5)
-                    if cancel_flag and cancel_flag.is_set():
-                        if log_callback:
-                            log_callback("分析被用户取消")
-                        return False
-            
-            sequence = str(row['sequence']).strip()
-            probe_id = row.get('id', f"probe_{index+1}")
-            
-            if log_callback:
-                if index % 10 == 0:  # 每10条序列记录一次日志
-                    log_callback(f"处理探针 {probe_id} ({index+1}/{len(df)})")
-            
-            # 更新进度（每1%更新一次）
-            if progress_callback and total_rows:
-                current_progress = int((index + 1) / total_rows * 100)
-                if current_progress != last_progress:
-                    progress_callback(current_progress)
-                    last_progress = current_progress
-            
-            # 检查序列有效性
-            if not self.check_sequence_validity(sequence):
-                if log_callback and index % 10 == 0:  # 减少日志输出
-                    log_callback(f"探针 {probe_id}: 序列包含无效字符，跳过")
-                result = {
-                    'id': probe_id,
-                    'sequence': sequence,
-                    'valid_sequence': False,
-                    'tm': None,
-                    'gc_content': None,
-                }
-                results.append(result)
-                continue
-            
-            # 计算Tm值
-            tm = self.calculate_tm(sequence, method=config['tm_method'])
-            
-            # 计算GC含量
-            gc_content = self.calculate_gc_content(sequence)
-            
-            if log_callback and index % 10 == 0:  # 减少日志输出
-                log_callback(f"探针 {probe_id}: Tm={tm}°C, GC={gc_content}%")
-            
-            result = {
-                'id': probe_id,
-                'sequence': sequence,
-                'valid_sequence': True,
-                'tm': tm,
-                'gc_content': gc_content,
-            }
-            
-            results.append(result)
-        
-        # 保存结果
-        try:
-            results_df = pd.DataFrame(results)
-            csv_columns = ['id', 'sequence', 'valid_sequence', 'tm', 'gc_content']
-            
-            # 确保输出目录存在
-            output_dir = os.path.dirname(os.path.abspath(config['output_file']))
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-            
-            # 根据文件扩展名选择保存格式
-            output_ext = os.path.splitext(config['output_file'])[1].lower()
-            if output_ext == '.csv':
-                results_df[csv_columns].to_csv(config['output_file'], index=False)
-            elif output_ext == '.tsv':
-                results_df[csv_columns].to_csv(config['output_file'], sep='\t', index=False)
-            elif output_ext == '.xlsx':
-                results_df[csv_columns].to_excel(config['output_file'], index=False)
-            else:
-                # 默认保存为CSV
-                results_df[csv_columns].to_csv(config['output_file'], index=False)
-            
-            if log_callback:
-                log_callback(f"✅ 分析完成！结果已保存到: {config['output_file']}")
-            
-            return True
-            
-        except Exception as e:
-            if log_callback:
-                log_callback(f"❌ 保存结果错误: {e}")
-            return False
+        return self.specificity is None or probe.get('specificity', '未检查') == self.specificity
+
+    def sort_by(self, field):
+        """点击列标题排序，再次点击同一列切换升降序"""
+        self.sort_reverse = not self.sort_reverse if self.sort_field == field else False
+        self.sort_field = field
+        for heading, column_field, _ in self.COLUMNS:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if column_field == field else ""
+            self.tree.heading(heading, text=heading + arrow)
+        self.sort_view()
+        self.render()
+
+    def sort_view(self):
+        field = self.sort_field
+        default = self.DEFAULTS.get(field)
+        if field == 'specificity':
+            order = self.SPECIFICITY_ORDER
+            key = lambda index: order.get(self.probes[index].get(field, default), len(order))
+        else:
+            key = lambda index: self.probes[index].get(field, default)
+        self.view.sort(key=key, reverse=self.sort_reverse)
+
+    def render(self):
+        """只把当前可见的行写入Treeview"""
+        count = max(0, min(self.rows, len(self.view) - self.top))
+        while len(self.items) < count:
+            self.items.append(self.tree.insert("", tk.END))
+        while len(self.items) > count:
+            self.tree.delete(self.items.pop())
+
+        selected = ()
+        for offset, item in enumerate(self.items):
+            index = self.view[self.top + offset]
+            probe = self.probes[index]
+            self.tree.item(item, values=[fmt(probe.get(field, self.DEFAULTS.get(field)))
+                                         for _, field, fmt in self.COLUMNS])
+            if index == self.selected_index:
+                selected = (item,)
+        # 选中行随数据滚动，不留在固定的行位置上
+        if self.tree.selection() != selected:
+            self.tree.selection_set(selected)
+
+        total = len(self.view)
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + count) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, top):
+        top = max(0, min(int(top), len(self.view) - self.rows))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+
+    def on_scroll(self, *args):
+        """滚动条回调：拖动(moveto)或按行/页滚动(scroll)"""
+        if args[0] == 'moveto':
+            self.scroll_to(float(args[1]) * len(self.view))
+        elif args[0] == 'scroll':
+            step = int(args[1]) * (self.rows if args[2] == 'pages' else 1)
+            self.scroll_to(self.top + step)
+
+    def move_selection(self, step):
+        """方向键移动选择，到达可见区域边缘时滚动"""
+        if not self.view:
+            return "break"
+        if self.selected_index in self.view:
+            position = self.view.index(self.selected_index) + step
+        else:
+            position = self.top
+        position = max(0, min(position, len(self.view) - 1))
+        self.selected_index = self.view[position]
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.rows:
+            self.top = position - self.rows + 1
+        self.render()
+        return "break"
+
+    def on_resize(self, event):
+        """根据控件高度计算可见行数"""
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        rows = max(1, (event.height - row_height - 4) // row_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.top = max(0, min(self.top, len(self.view) - self.rows))
+            self.render()
+
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.items:
+            self.selected_index = self.view[self.top + self.items.index(selection[0])]
+
+    def selected_probe(self):
+        """返回当前选中的探针，没有选中时返回None"""
+        if self.selected_index is None or self.selected_index >= len(self.probes):
+            return None
+        return self.probes[self.selected_index]
+
+    def visible_count(self):
+        return len(self.view)
 
 
 ###########################################################################
 # 主函数模块
 ###########################################################################
 def main():
+    # 打包为exe时进程池子进程需要此调用
+    multiprocessing.freeze_support()
+
     # 设置高DPI显示（Windows）
     if os.name == 'nt':
         from ctypes import windll
@@ -1921,6 +2334,9 @@ def main():
     
     root = tk.Tk()
     app = DNAProbeAnalyzerUI(root)
+    _startup_marks.append(("界面构建", time.perf_counter()))
+    if '--profile-startup' in sys.argv[1:]:
+        print(format_startup_report(_startup_marks), file=sys.stderr, flush=True)
     root.mainloop()
 
 if __name__ == "__main__":
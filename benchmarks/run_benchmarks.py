@@ -0,0 +1,268 @@
+"""FISH探针工具性能基准
+
+用法:
+    python benchmarks/run_benchmarks.py --size small --output bench.json
+    python benchmarks/run_benchmarks.py --size small --baseline bench_old.json --threshold 0.2
+
+所有输入数据由固定随机种子生成，BLAST解析/合并使用fixtures中的outfmt 7样例按需复制扩展。
+指定--baseline时逐项比较中位耗时，任一项变慢超过阈值则以返回码1退出。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import Bio
+from fish_engine import (RNAProbeDesigner, DNAProbeAnalyzer, iter_blast_results, blast_specificity,
+                         merge_blast_results, reverse_complement_file)
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BLAST_FIXTURE = os.path.join(FIXTURE_DIR, 'blast_outfmt7.txt')
+
+# 各规模下的工作量：设计的转录本长度、分析的寡核苷酸行数、BLAST查询数、反向互补行数
+SIZES = {
+    'small': {'design': [1000, 10000], 'analyze': [1000, 10000], 'blast': [1000], 'revcomp': [10000]},
+    'medium': {'design': [1000, 100000], 'analyze': [1000, 100000], 'blast': [10000], 'revcomp': [100000]},
+    'large': {'design': [1000, 100000, 1000000], 'analyze': [1000, 100000, 1000000],
+              'blast': [100000], 'revcomp': [1000000]},
+}
+
+DESIGN_PARAMETERS = {
+    'probe_length': 20,
+    'min_gc': 40.0,
+    'max_gc': 60.0,
+    'min_tm': 55.0,
+    'max_tm': 70.0,
+    'spacing': 3,
+    'min_complexity': 0.8,
+    'check_specificity': True,
+    'filter_repeats': True,
+    'tm_method': 'santalucia',
+    'max_homopolymer_length': 3
+}
+
+
+###########################################################################
+# 合成数据
+###########################################################################
+def random_sequence(rng, length, alphabet='ACGT'):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def make_transcript(length, seed=1):
+    """生成合成转录本（RNA，含U）"""
+    return random_sequence(random.Random(seed), length, 'ACGU')
+
+
+def make_oligo_csv(path, rows, seed=2):
+    """生成寡核苷酸CSV（id, sequence），约1%的行含无效字符"""
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write('id,sequence\n')
+        for index in range(rows):
+            sequence = random_sequence(rng, rng.randint(18, 30))
+            if rng.random() < 0.01:
+                sequence = sequence[:5] + 'N' + sequence[6:]
+            f.write(f"probe_{index + 1},{sequence}\n")
+
+
+def load_blast_blocks():
+    """把fixture拆分为每个查询的(查询ID, 文本块)"""
+    blocks = []
+    current = []
+    with open(BLAST_FIXTURE, 'r') as f:
+        for line in f:
+            if line.startswith('# BLASTN') and current:
+                blocks.append(''.join(current))
+                current = []
+            if line.startswith('# BLAST processed'):
+                break
+            current.append(line)
+    if current:
+        blocks.append(''.join(current))
+    return [(block.split('# Query: ')[1].split()[0], block) for block in blocks]
+
+
+def make_blast_report(path, queries):
+    """复制fixture中的查询块，生成含指定查询数的outfmt 7报告（查询ID依次重命名为probe_N）"""
+    blocks = load_blast_blocks()
+    with open(path, 'w') as f:
+        for index in range(queries):
+            query, block = blocks[index % len(blocks)]
+            f.write(block.replace(query, f"probe_{index + 1}"))
+        f.write(f"# BLAST processed {queries} queries\n")
+
+
+###########################################################################
+# 计时
+###########################################################################
+def measure(function, repeat):
+    """运行repeat次，返回每次的耗时（秒）和最后一次的返回值"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def record(results, name, timings, items, unit):
+    median = statistics.median(timings)
+    results[name] = {
+        'seconds_min': min(timings),
+        'seconds_median': median,
+        'runs': len(timings),
+        'items': items,
+        'unit': unit,
+        'items_per_second': items / median if median > 0 else None,
+    }
+    print(f"{name:<28} 中位 {median:9.4f} s  最快 {min(timings):9.4f} s  {items} {unit}", flush=True)
+
+
+def run_benchmarks(size, repeat, only=None):
+    """运行指定规模的全部基准，返回{名称: 结果}"""
+    plan = SIZES[size]
+    work_dir = tempfile.mkdtemp(prefix="fish_bench_")
+    results = {}
+
+    def wanted(group):
+        return only is None or group in only
+
+    try:
+        if wanted('design'):
+            for length in plan['design']:
+                sequence = make_transcript(length)
+                timings, _ = measure(
+                    lambda: RNAProbeDesigner().design_probes(sequence, DESIGN_PARAMETERS), repeat)
+                record(results, f"design_probes_{length}bp", timings, length, 'bp')
+
+        if wanted('analyze'):
+            for rows in plan['analyze']:
+                input_file = os.path.join(work_dir, f"oligos_{rows}.csv")
+                make_oligo_csv(input_file, rows)
+                config = {
+                    'input_file': input_file,
+                    'output_file': os.path.join(work_dir, f"analysis_{rows}.csv"),
+                    'tm_method': 'santalucia',
+                    'workers': 1,
+                    'stream_chunksize': 50000
+                }
+                timings, _ = measure(lambda: DNAProbeAnalyzer().analyze_probes(config), repeat)
+                record(results, f"analyze_probes_{rows}", timings, rows, 'rows')
+
+        if wanted('blast'):
+            for queries in plan['blast']:
+                report = os.path.join(work_dir, f"blast_{queries}.txt")
+                make_blast_report(report, queries)
+
+                def parse():
+                    # 与界面中parse_blast_results相同的路径：流式解析并计算特异性
+                    with open(report, 'r') as f:
+                        return sum(1 for _, hits in iter_blast_results(f) if blast_specificity(hits))
+                timings, _ = measure(parse, repeat)
+                record(results, f"parse_blast_results_{queries}", timings, queries, 'queries')
+
+                tm_file = os.path.join(work_dir, f"tm_{queries}.csv")
+                make_oligo_csv(tm_file, queries)
+                merged_file = os.path.join(work_dir, f"merged_{queries}.csv")
+                timings, _ = measure(lambda: merge_blast_results(tm_file, report, merged_file), repeat)
+                record(results, f"merge_blast_results_{queries}", timings, queries, 'queries')
+
+        if wanted('revcomp'):
+            for rows in plan['revcomp']:
+                input_file = os.path.join(work_dir, f"revcomp_{rows}.csv")
+                make_oligo_csv(input_file, rows, seed=3)
+                output_file = os.path.join(work_dir, f"revcomp_out_{rows}.csv")
+                timings, _ = measure(
+                    lambda: reverse_complement_file(input_file, output_file, 'sequence'), repeat)
+                record(results, f"revcomp_{rows}", timings, rows, 'rows')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+###########################################################################
+# 结果输出与基线比较
+###########################################################################
+def environment():
+    """记录运行环境，便于判断结果是否可比"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'biopython': Bio.__version__,
+    }
+
+
+def compare(results, baseline, threshold):
+    """逐项比较中位耗时，返回变慢超过阈值的基准名称列表"""
+    regressions = []
+    print(f"\n{'基准':<28} {'基线(s)':>10} {'当前(s)':>10} {'变化':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<28} {'-':>10} {current['seconds_median']:10.4f} {'新增':>8}")
+            continue
+        ratio = current['seconds_median'] / previous['seconds_median'] if previous['seconds_median'] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  ← 变慢"
+        print(f"{name:<28} {previous['seconds_median']:10.4f} {current['seconds_median']:10.4f} "
+              f"{(ratio - 1) * 100:+7.1f}%{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FISH探针工具性能基准")
+    parser.add_argument('--size', choices=list(SIZES), default='small', help="工作量规模")
+    parser.add_argument('--repeat', type=int, default=3, help="每项重复次数（取中位数）")
+    parser.add_argument('--only', nargs='+', choices=['design', 'analyze', 'blast', 'revcomp'],
+                        help="只运行指定的基准组")
+    parser.add_argument('--output', help="把结果写入JSON文件")
+    parser.add_argument('--baseline', help="与之比较的基线JSON文件")
+    parser.add_argument('--threshold', type=float, default=0.2, help="允许的变慢比例（0.2表示20%%）")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.size, args.repeat, args.only)
+    report = {'size': args.size, 'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 项基准变慢超过 {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"\n✅ 没有超过 {args.threshold:.0%} 的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
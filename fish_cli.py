@@ -0,0 +1,363 @@
+import time
+# 启动计时：--profile-startup时输出各阶段耗时
+_startup_marks = [("解释器就绪", time.perf_counter())]
+import argparse
+import os
+import sys
+import multiprocessing
+# pandas和Biopython由fish_engine在首次使用时导入
+from fish_engine import (DNAProbeAnalyzer, RNAProbeDesigner, ResultCache, BlastHitCache, BlastRunner,
+                         StageProfiler, LazyModule, JobControl, RunCheckpoint, KmerOffTargetIndex,
+                         PackedSequenceStore, blast_db_exists,
+                         merge_blast_results,
+                         reverse_complement_series, reverse_complement_file, apply_specificity, design_results_frame,
+                         REVCOMP_COLUMN, format_startup_report)
+_startup_marks.append(("fish_engine（含NumPy）", time.perf_counter()))
+pd = LazyModule('pandas')
+
+
+###########################################################################
+# 命令行入口 - 无界面批处理模块
+# 用法: python fish_cli.py {analyze,design,revcomp,blast,blast-cache,pack,index,screen} ...
+###########################################################################
+def log(message):
+    """带时间戳输出日志到标准错误，标准输出留给结果"""
+    timestamp = time.strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+
+
+def open_cache(args, factory):
+    """按命令行参数打开持久化缓存，不可用时不使用缓存"""
+    if args.no_cache:
+        return None
+    try:
+        return factory()
+    except Exception as e:
+        log(f"无法打开缓存，将不使用缓存: {e}")
+        return None
+
+
+def open_profiler(args):
+    """指定--profile时创建性能计量器，结果写入日志并保存在输出文件旁"""
+    return StageProfiler() if args.profile else None
+
+
+# 长任务在日志中输出进度的间隔（秒）
+PROGRESS_LOG_INTERVAL = 10.0
+
+
+def open_job(name, unit):
+    """长任务每PROGRESS_LOG_INTERVAL秒在日志中输出一次进度、吞吐量和剩余时间"""
+    return JobControl(name, unit, status_callback=log, progress_interval=PROGRESS_LOG_INTERVAL)
+
+
+def checkpoint_dir(args, output_file):
+    """只在指定--checkpoint-dir或--resume时记录检查点，后者默认使用输出文件旁的目录"""
+    if args.checkpoint_dir:
+        return args.checkpoint_dir
+    return RunCheckpoint.default_dir(output_file) if args.resume else None
+
+
+def cmd_analyze(args):
+    """分析探针文件的Tm、GC含量和序列有效性"""
+    analyzer = DNAProbeAnalyzer(cache=open_cache(args, ResultCache), profiler=open_profiler(args))
+    config = {
+        'input_file': args.input,
+        'output_file': args.output,
+        'tm_method': args.tm_method,
+        'workers': args.workers,
+        'stream_chunksize': args.chunksize or None,
+        'checkpoint_dir': checkpoint_dir(args, args.output),
+        'resume': args.resume
+    }
+    if not analyzer.analyze_probes(config, log_callback=log, job=open_job("探针分析", '条序列')):
+        return 1
+
+    summary = analyzer.summary
+    log(f"总序列数: {summary['total']}，有效序列数: {summary['valid']}")
+    if summary['tm_count']:
+        log(f"平均Tm值: {summary['tm_sum'] / summary['tm_count']:.2f}°C")
+    if summary['gc_count']:
+        log(f"平均GC含量: {summary['gc_sum'] / summary['gc_count']:.2f}%")
+    return 0
+
+
+def cmd_design(args):
+    """为多记录FASTA（可为gzip）中的每条目标序列设计RNA FISH探针，结果按记录ID合并写入一个CSV"""
+    designer = RNAProbeDesigner(cache=open_cache(args, ResultCache), profiler=open_profiler(args))
+    parameters = {
+        'probe_length': args.probe_length,
+        'min_gc': args.min_gc,
+        'max_gc': args.max_gc,
+        'min_tm': args.min_tm,
+        'max_tm': args.max_tm,
+        'spacing': args.spacing,
+        'min_complexity': args.min_complexity,
+        'check_specificity': True,
+        'filter_repeats': not args.keep_repeats,
+        'tm_method': args.tm_method,
+        'max_homopolymer_length': args.max_homopolymer_length,
+        'placement': args.placement,
+        'filter_order': args.filter_order,
+        'specificity_index': args.index,
+        'max_mismatches': args.mismatches
+    }
+    if args.index and not KmerOffTargetIndex.exists(args.index):
+        log(f"❌ 特异性索引不存在: {args.index}")
+        return 1
+
+    summary = designer.design_batch(args.fasta, args.output, parameters, workers=args.workers, log_callback=log,
+                                    job=open_job("批量设计", '条记录'))
+    if summary is None:
+        log(f"❌ 批量设计已取消，已完成的记录保留在: {args.output}")
+        return 1
+    if not summary['probes']:
+        log("❌ 没有设计出任何探针")
+        return 1
+    log(f"结果已保存到: {args.output}")
+    return 0
+
+
+def cmd_revcomp(args):
+    """为表格文件的指定列添加反向互补序列列（CSV按块流式处理）"""
+    if args.input.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(args.input)
+        if args.column not in df.columns:
+            log(f"❌ 文件中没有列: {args.column}")
+            return 1
+        df[REVCOMP_COLUMN] = reverse_complement_series(df[args.column], rna=args.rna)
+        df.to_csv(args.output, index=False, encoding='utf-8-sig')
+        processed = len(df)
+    else:
+        try:
+            processed = reverse_complement_file(args.input, args.output, args.column,
+                                                chunksize=args.chunksize, rna=args.rna,
+                                                job=open_job("反向互补", '行'))
+        except KeyError as e:
+            log(f"❌ {e.args[0]}")
+            return 1
+    log(f"反向互补处理完成，共处理 {processed} 条序列，结果已保存到: {args.output}")
+    return 0
+
+
+def cmd_blast(args):
+    """对分析结果中的有效序列运行BLAST，并把命中合并到分析结果"""
+    if not os.path.exists(args.blast_path):
+        log(f"❌ BLAST程序不存在: {args.blast_path}")
+        return 1
+    if not blast_db_exists(args.db):
+        log(f"❌ BLAST数据库不存在: {args.db}")
+        return 1
+
+    results_df = pd.read_csv(args.results)
+    valid_seqs = results_df[results_df['valid_sequence'] == True]
+    if len(valid_seqs) == 0:
+        log("❌ 没有有效的序列可供BLAST分析")
+        return 1
+    log(f"有效序列数: {len(valid_seqs)}")
+
+    runner = BlastRunner(args.blast_path, args.db, shards=args.shards, num_threads=args.threads,
+                         evalue=args.evalue, max_target_seqs=args.max_target_seqs,
+                         cache=open_cache(args, BlastHitCache), profiler=open_profiler(args))
+    success, stderr = runner.run(list(zip(valid_seqs['id'], valid_seqs['sequence'])), args.out, log_callback=log,
+                                 job=open_job("BLAST", '条序列'),
+                                 checkpoint_dir=checkpoint_dir(args, args.out),
+                                 resume=args.resume)
+    if not success:
+        log(f"❌ BLAST分析失败，错误信息: {stderr}")
+        return 1
+    log(f"✅ BLAST分析完成，结果已保存到: {args.out}")
+
+    merged_file = args.results.replace('.csv', '_with_blast.csv')
+    long_file = args.results.replace('.csv', '_blast_hits_long.csv') if args.long_table else None
+    merge_blast_results(args.results, args.out, merged_file, long_file)
+    log(f"✅ 合并结果已保存到: {merged_file}")
+    if long_file:
+        log(f"✅ 长格式命中表已保存到: {long_file}")
+    return 0
+
+
+def cmd_blast_cache_invalidate(args):
+    """删除指定数据库（不指定时为全部数据库）的BLAST命中缓存条目"""
+    try:
+        cache = BlastHitCache()
+    except Exception as e:
+        log(f"❌ 无法打开BLAST缓存: {e}")
+        return 1
+    removed = cache.invalidate(args.db)
+    log(f"已清除BLAST缓存 {removed} 条（数据库: {args.db or '全部'}）")
+    return 0
+
+
+def cmd_pack(args):
+    """把FASTA写入2-bit打包的序列库目录，design可直接以该目录为输入"""
+    start = time.time()
+    count = PackedSequenceStore.from_fasta(args.fasta, args.store_dir, log_callback=log)
+    store = PackedSequenceStore(args.store_dir)
+    log(f"✅ 序列库写入完成: {count} 条记录，{store.total_length} 个碱基，"
+        f"{len(store.mask)} 段掩码，用时 {time.time() - start:.2f} 秒，保存在: {args.store_dir}")
+    return 0
+
+
+def cmd_index(args):
+    """从转录组FASTA构建本地特异性k-mer索引"""
+    last = [-1]
+
+    def progress(value):
+        if value // 10 != last[0]:
+            last[0] = value // 10
+            log(f"写入k-mer表: {value}%")
+
+    KmerOffTargetIndex.build(args.fasta, args.index_dir, k=args.k, progress_callback=progress, log_callback=log)
+    return 0
+
+
+def cmd_screen(args):
+    """用本地特异性索引筛查表格中每条探针的脱靶命中，输出附加specificity和blast_hits列的CSV"""
+    if not KmerOffTargetIndex.exists(args.index):
+        log(f"❌ 特异性索引不存在: {args.index}")
+        return 1
+    index = KmerOffTargetIndex.open_cached(args.index)
+    df = pd.read_csv(args.input)
+    if 'sequence' not in df.columns:
+        log("❌ 输入文件中缺少sequence列")
+        return 1
+    ids = df['id'].tolist() if 'id' in df.columns else list(range(1, len(df) + 1))
+
+    start = time.time()
+    probes = []
+    results = []
+    try:
+        for probe_id, sequence in zip(ids, df['sequence'].astype(str).str.strip()):
+            probe = {'id': probe_id, 'sequence': sequence}
+            hits = index.search(sequence, args.mismatches, args.max_hits)
+            apply_specificity(probe, hits)
+            probes.append(probe)
+            results.append((str(probe_id), hits))
+    except ValueError as e:
+        log(f"❌ {e}")
+        return 1
+    log(f"筛查 {len(probes)} 条探针，用时 {time.time() - start:.2f} 秒")
+
+    frame = design_results_frame(probes)
+    df['specificity'] = frame['specificity'].values if len(frame) else []
+    df['blast_hits'] = frame['blast_hits'].values if 'blast_hits' in frame.columns else ''
+    df.to_csv(args.output, index=False)
+    log(f"✅ 结果已保存到: {args.output}")
+    if args.report:
+        index.write_report(results, args.report)
+        log(f"✅ outfmt 7报告已保存到: {args.report}")
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="fish_cli", description="FISH探针设计与分析工具（命令行版）")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="结束时输出启动各阶段和首次使用时导入的模块耗时")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze = subparsers.add_parser('analyze', help="分析探针文件的Tm和GC含量")
+    analyze.add_argument('input', help="输入CSV/TSV文件（需要id和sequence列）")
+    analyze.add_argument('output', help="输出文件（.csv/.tsv/.xlsx）")
+    analyze.add_argument('--tm-method', default='santalucia', choices=['santalucia', 'nn', 'wallace', 'gc'])
+    analyze.add_argument('--workers', type=int, default=1, help="并行进程数")
+    analyze.add_argument('--chunksize', type=int, default=50000, help="流式分析每块行数，0表示一次性读入")
+    analyze.set_defaults(func=cmd_analyze)
+
+    design = subparsers.add_parser('design', help="为FASTA中的目标序列设计探针")
+    design.add_argument('fasta', help="目标序列FASTA文件（可包含多条记录，支持.gz）或pack生成的序列库目录")
+    design.add_argument('output', help="输出CSV文件")
+    design.add_argument('--probe-length', type=int, default=20)
+    design.add_argument('--min-gc', type=float, default=40.0)
+    design.add_argument('--max-gc', type=float, default=60.0)
+    design.add_argument('--min-tm', type=float, default=55.0)
+    design.add_argument('--max-tm', type=float, default=70.0)
+    design.add_argument('--spacing', type=int, default=3)
+    design.add_argument('--min-complexity', type=float, default=0.8)
+    design.add_argument('--max-homopolymer-length', type=int, default=3)
+    design.add_argument('--tm-method', default='santalucia', choices=['santalucia', 'nn', 'wallace', 'gc'])
+    design.add_argument('--placement', default='greedy', choices=['greedy', 'max_count', 'tm_uniform'],
+                        help="探针放置策略：greedy贪心，max_count最多探针（Tm偏差最小），tm_uniform Tm一致性优先")
+    design.add_argument('--filter-order', default='adaptive', choices=['adaptive', 'cost'],
+                        help="逐窗口判定条件的执行顺序：adaptive按观测淘汰率调整，cost固定按成本从低到高")
+    design.add_argument('--workers', type=int, default=1, help="并行设计的进程数（每条记录一个任务）")
+    design.add_argument('--keep-repeats', action='store_true', help="不过滤含重复片段的探针")
+    design.add_argument('--index', help="本地特异性索引目录，指定时设计后直接筛查脱靶")
+    design.add_argument('--mismatches', type=int, default=1, help="筛查时允许的最大错配数")
+    design.set_defaults(func=cmd_design)
+
+    revcomp = subparsers.add_parser('revcomp', help="计算表格中某一列的反向互补序列")
+    revcomp.add_argument('input', help="输入CSV/Excel文件")
+    revcomp.add_argument('output', help="输出CSV文件")
+    revcomp.add_argument('--column', required=True, help="序列所在列名")
+    revcomp.add_argument('--rna', action='store_true', help="输出RNA互补序列（A配对为U）")
+    revcomp.add_argument('--chunksize', type=int, default=100000, help="流式处理每块行数")
+    revcomp.set_defaults(func=cmd_revcomp)
+
+    blast = subparsers.add_parser('blast', help="对分析结果运行BLAST并合并命中")
+    blast.add_argument('results', help="analyze输出的CSV文件")
+    blast.add_argument('--blast-path', required=True, help="blastn程序路径")
+    blast.add_argument('--db', required=True, help="BLAST数据库路径")
+    blast.add_argument('--out', default='blast_results.txt', help="BLAST输出文件")
+    blast.add_argument('--shards', type=int, default=1, help="查询分片数（并发blastn进程数）")
+    blast.add_argument('--threads', type=int, default=1, help="每分片线程数")
+    blast.add_argument('--evalue', default="0.1")
+    blast.add_argument('--max-target-seqs', default="30")
+    blast.add_argument('--long-table', action='store_true', help="同时输出长格式命中表")
+    blast.set_defaults(func=cmd_blast)
+
+    blast_cache = subparsers.add_parser('blast-cache', help="管理BLAST命中缓存")
+    blast_cache_commands = blast_cache.add_subparsers(dest='cache_command', required=True)
+    invalidate = blast_cache_commands.add_parser('invalidate', help="删除BLAST命中缓存（数据库更新后清除旧结果）")
+    invalidate.add_argument('--db', help="只删除该BLAST数据库的缓存，不指定时清空全部")
+    invalidate.set_defaults(func=cmd_blast_cache_invalidate)
+
+    pack = subparsers.add_parser('pack', help="把FASTA写入2-bit打包的内存映射序列库")
+    pack.add_argument('fasta', help="FASTA文件（支持.gz）")
+    pack.add_argument('store_dir', help="序列库输出目录")
+    pack.set_defaults(func=cmd_pack)
+
+    index = subparsers.add_parser('index', help="从转录组FASTA构建本地特异性索引")
+    index.add_argument('fasta', help="转录组FASTA文件（支持.gz）")
+    index.add_argument('index_dir', help="索引输出目录")
+    index.add_argument('--k', type=int, default=10, help="种子k-mer长度（4-13）")
+    index.set_defaults(func=cmd_index)
+
+    screen = subparsers.add_parser('screen', help="用本地特异性索引筛查探针脱靶（替代BLAST）")
+    screen.add_argument('input', help="含sequence列（可选id列）的CSV文件")
+    screen.add_argument('output', help="输出CSV文件")
+    screen.add_argument('--index', required=True, help="特异性索引目录")
+    screen.add_argument('--mismatches', type=int, default=1, help="允许的最大错配数")
+    screen.add_argument('--max-hits', type=int, default=30, help="每条探针最多保留的命中数")
+    screen.add_argument('--report', help="同时输出outfmt 7格式报告，可与analyze结果合并")
+    screen.set_defaults(func=cmd_screen)
+
+    for subparser in (analyze, design, blast):
+        subparser.add_argument('--no-cache', action='store_true', help="不使用持久化缓存")
+        subparser.add_argument('--profile', action='store_true',
+                               help="记录各阶段耗时和过滤淘汰数，结果保存为输出文件旁的.profile.json")
+    # 指定--checkpoint-dir或--resume时运行中定期把已完成的块/分片记入检查点目录，中断后用--resume跳过已完成的部分
+    for subparser in (analyze, blast):
+        subparser.add_argument('--resume', action='store_true',
+                               help="从上次中断处继续并记录检查点（输入和参数需与上次相同，否则报错并保留检查点）")
+        subparser.add_argument('--checkpoint-dir',
+                               help="记录检查点的目录，成功完成后删除；只给--resume时为输出文件旁的<输出文件>.checkpoint")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    _startup_marks.append(("解析参数", time.perf_counter()))
+    try:
+        return args.func(args)
+    finally:
+        if args.profile_startup:
+            _startup_marks.append((f"执行{args.command}", time.perf_counter()))
+            print(format_startup_report(_startup_marks), file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    # 打包为exe时进程池子进程需要此调用
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,3609 @@
+import bisect
+import hashlib
+import importlib
+import itertools
+import os
+import gzip
+import time
+import json
+import mmap
+import subprocess
+import tempfile
+import shutil
+import threading
+import sqlite3
+import heapq
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+
+###########################################################################
+# 延迟导入模块 - 启动加速
+###########################################################################
+class LazyModule:
+    """模块代理：首次访问属性时才导入真实模块，导入耗时记录在load_times中"""
+
+    load_times = {}
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            LazyModule.load_times.setdefault(self._name, time.perf_counter() - start)
+        value = getattr(self._module, attr)
+        # 缓存到代理实例上，之后的访问不再经过__getattr__
+        setattr(self, attr, value)
+        return value
+
+
+# pandas和Biopython导入耗时较长，只在首次使用时导入
+pd = LazyModule('pandas')
+mt = LazyModule('Bio.SeqUtils.MeltingTemp')
+bio_seq = LazyModule('Bio.Seq')
+futures = LazyModule('concurrent.futures')
+
+
+def format_startup_report(marks):
+    """marks为按时间顺序的[(阶段, perf_counter时间戳)]，返回各阶段耗时和已发生的延迟导入耗时"""
+    lines = ["启动耗时:"]
+    for (_, previous), (label, current) in zip(marks, marks[1:]):
+        lines.append(f"  {label:<24} {(current - previous) * 1000:8.1f} ms")
+    if len(marks) > 1:
+        lines.append(f"  {'合计':<24} {(marks[-1][1] - marks[0][1]) * 1000:8.1f} ms")
+    if LazyModule.load_times:
+        lines.append("首次使用时导入:")
+        for name, seconds in LazyModule.load_times.items():
+            lines.append(f"  {name:<24} {seconds * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+
+###########################################################################
+# 滑动窗口批量评分引擎 - 设计加速模块
+###########################################################################
+class WindowScoreEngine:
+    """将目标序列一次性编码为NumPy数组，批量计算所有窗口的GC含量、复杂度和最长同聚物长度"""
+
+    # 碱基编码：A/C/G/T(U)/N，其余字符统一编码为OTHER_CODE
+    BASE_CODES = {'A': 0, 'C': 1, 'G': 2, 'T': 3, 'U': 3, 'N': 4}
+    N_CODE = 4
+    OTHER_CODE = 5
+    # 分块处理窗口，避免长序列的步幅视图占用过多内存
+    BLOCK_SIZE = 65536
+    _code_lookup = None
+
+    def __init__(self, sequence, probe_length):
+        self.sequence = sequence
+        self.probe_length = probe_length
+        self.codes = self.encode_sequence(sequence)
+        self.window_count = max(len(self.codes) - probe_length + 1, 0)
+
+        self.gc_content = np.zeros(self.window_count)
+        self.complexity = np.zeros(self.window_count)
+        self.max_homopolymer = np.zeros(self.window_count, dtype=np.int64)
+        self.valid = np.zeros(self.window_count, dtype=bool)
+
+        if self.window_count > 0 and probe_length > 0:
+            self._score_base_counts()
+            self._score_homopolymers()
+
+    @classmethod
+    def code_lookup(cls):
+        """ASCII字符到碱基编码的查找表（只读，首次使用时构建）"""
+        if cls._code_lookup is None:
+            lookup = np.full(256, cls.OTHER_CODE, dtype=np.uint8)
+            for base, code in cls.BASE_CODES.items():
+                lookup[ord(base)] = code
+            lookup.flags.writeable = False
+            cls._code_lookup = lookup
+        return cls._code_lookup
+
+    @classmethod
+    def encode_sequence(cls, sequence):
+        """把序列编码为uint8数组（U与T同码，与DNA探针的计算方式一致），序列库视图直接解码"""
+        if isinstance(sequence, PackedSequence):
+            return sequence.codes()
+        raw = np.frombuffer(sequence.encode('ascii', errors='replace'), dtype=np.uint8)
+        return cls.code_lookup()[raw]
+
+    def _score_base_counts(self):
+        """利用前缀和一次性得到每个窗口的碱基计数，进而计算GC含量和复杂度"""
+        length = self.probe_length
+        counts = np.empty((self.OTHER_CODE + 1, self.window_count), dtype=np.int64)
+        for code in range(self.OTHER_CODE + 1):
+            prefix = np.concatenate(([0], np.cumsum(self.codes == code, dtype=np.int64)))
+            counts[code] = prefix[length:] - prefix[:-length]
+
+        # 与calculate_gc相同的运算顺序，保证浮点结果逐位一致
+        self.gc_content = ((counts[1] + counts[2]) / length) * 100
+        self.valid = counts[self.OTHER_CODE] == 0
+
+        # 反向互补只置换碱基种类，不改变频率分布，因此可直接在正链上计算熵
+        if length > 1:
+            freqs = counts / length
+            with np.errstate(divide='ignore', invalid='ignore'):
+                terms = np.where(counts > 0, freqs * np.log2(freqs), 0.0)
+            self.complexity = -terms.sum(axis=0) / 2
+
+    def _score_homopolymers(self):
+        """计算每个窗口内A/C/G/T最长连续相同碱基的长度"""
+        length = self.probe_length
+        codes = self.codes
+        is_base = codes < self.N_CODE
+
+        # run_end[i]：以位置i结尾的同碱基连续长度（N和其他字符为0）
+        change = np.ones(len(codes), dtype=bool)
+        change[1:] = codes[1:] != codes[:-1]
+        run_starts = np.flatnonzero(change)
+        run_ids = np.cumsum(change) - 1
+        run_end = np.arange(len(codes)) - run_starts[run_ids] + 1
+        run_end[~is_base] = 0
+
+        # 窗口内的连续长度不能超过其到窗口起点的距离
+        ramp = np.arange(1, length + 1)
+        windows = np.lib.stride_tricks.sliding_window_view(run_end, length)
+        for block_start in range(0, self.window_count, self.BLOCK_SIZE):
+            block = windows[block_start:block_start + self.BLOCK_SIZE]
+            self.max_homopolymer[block_start:block_start + len(block)] = np.minimum(block, ramp).max(axis=1)
+
+    def prefilter_mask(self, min_gc, max_gc, min_complexity, max_homopolymer_length):
+        """返回通过GC、复杂度、同聚物和字符有效性预筛的窗口掩码"""
+        # 复杂度的求和顺序与逐窗口计算不同，留出极小容差，最终由逐窗口精确计算裁决
+        return (self.valid &
+                (self.gc_content >= min_gc) & (self.gc_content <= max_gc) &
+                (self.complexity >= min_complexity - 1e-9) &
+                (self.max_homopolymer <= max_homopolymer_length))
+
+
+###########################################################################
+# 最近邻Tm增量计算器 - 设计加速模块
+###########################################################################
+class NearestNeighborTm:
+    """基于二核苷酸ΔH/ΔS前缀和的最近邻Tm计算器，整条目标序列预计算一次，每个窗口O(1)"""
+
+    # 与calculate_tm中各方法使用的热力学参数表对应
+    METHOD_TABLES = {'santalucia': 'DNA_NN1', 'nn': 'DNA_NN3'}
+    COMPLEMENT = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+    R = 1.987  # 气体常数，与Bio.SeqUtils.MeltingTemp一致
+
+    def __init__(self, sequence, nn_table, dnac1=25, dnac2=25, Na=50, K=0, Tris=0, Mg=0, dNTPs=0, saltcorr=5):
+        if saltcorr not in range(0, 6):
+            raise ValueError("增量Tm计算仅支持盐校正方法0-5")
+
+        self.nn_table = nn_table
+        self.salt_params = {'Na': Na, 'K': K, 'Tris': Tris, 'Mg': Mg, 'dNTPs': dNTPs}
+        self.saltcorr = saltcorr
+        self.log_k = np.log((dnac1 - (dnac2 / 2.0)) * 1e-9)
+        self._salt_corrections = {}
+
+        # U与T同码；N及其他字符的窗口交由Biopython处理
+        self.codes = WindowScoreEngine.encode_sequence(sequence)
+        is_base = self.codes < WindowScoreEngine.N_CODE
+        self._invalid_prefix = np.concatenate(([0], np.cumsum(~is_base, dtype=np.int64)))
+        is_gc = (self.codes == 1) | (self.codes == 2)
+        self._gc_prefix = np.concatenate(([0], np.cumsum(is_gc, dtype=np.int64)))
+
+        # 每个相邻碱基对的ΔH/ΔS，含非ACGT碱基的位置记0（这些窗口不会使用前缀和结果）
+        stack_h, stack_s = self._stack_tables(nn_table)
+        if len(self.codes) > 1:
+            pair_ok = is_base[:-1] & is_base[1:]
+            pair_index = np.where(pair_ok, self.codes[:-1].astype(np.int64) * 4 + self.codes[1:], 0)
+            step_h = np.where(pair_ok, stack_h[pair_index], 0.0)
+            step_s = np.where(pair_ok, stack_s[pair_index], 0.0)
+        else:
+            step_h = step_s = np.zeros(0)
+        self._h_prefix = np.concatenate(([0.0], np.cumsum(step_h)))
+        self._s_prefix = np.concatenate(([0.0], np.cumsum(step_s)))
+
+    @classmethod
+    def for_method(cls, sequence, method):
+        """按tm_method创建计算器，不支持的方法返回None"""
+        table_name = cls.METHOD_TABLES.get(method)
+        if table_name is None:
+            return None
+        return cls(sequence, getattr(mt, table_name))
+
+    @classmethod
+    def _stack_tables(cls, nn_table):
+        """把参数表展开为以 4*前一碱基+后一碱基 为索引的ΔH/ΔS数组"""
+        bases = 'ACGT'
+        stack_h = np.zeros(16)
+        stack_s = np.zeros(16)
+        for first in range(4):
+            for second in range(4):
+                top = bases[first] + bases[second]
+                key = top + '/' + cls.COMPLEMENT[top[0]] + cls.COMPLEMENT[top[1]]
+                values = nn_table.get(key, nn_table.get(key[::-1]))
+                if values is None:
+                    raise ValueError(f"参数表缺少最近邻参数: {key}")
+                stack_h[first * 4 + second], stack_s[first * 4 + second] = values
+        return stack_h, stack_s
+
+    def _salt_correction(self, length):
+        """盐校正只依赖窗口长度，按长度缓存"""
+        if length not in self._salt_corrections:
+            corr = 0.0
+            if self.saltcorr:
+                corr = mt.salt_correction(method=self.saltcorr, seq='A' * length, **self.salt_params)
+            self._salt_corrections[length] = corr
+        return self._salt_corrections[length]
+
+    def window_tm_array(self, length):
+        """计算所有长度为length的窗口对应DNA探针（反向互补）的Tm，含非ACGT碱基的窗口为NaN"""
+        window_count = len(self.codes) - length + 1
+        if window_count <= 0 or length < 2:
+            return np.full(max(window_count, 0), np.nan)
+
+        starts = np.arange(window_count)
+        ends = starts + length
+        table = self.nn_table
+
+        # 反向互补后堆积参数不变，直接对正链的相邻碱基对求和
+        delta_h = self._h_prefix[ends - 1] - self._h_prefix[starts] + table['init'][0]
+        delta_s = self._s_prefix[ends - 1] - self._s_prefix[starts] + table['init'][1]
+
+        has_gc = (self._gc_prefix[ends] - self._gc_prefix[starts]) > 0
+        delta_h += np.where(has_gc, table['init_oneG/C'][0], table['init_allA/T'][0])
+        delta_s += np.where(has_gc, table['init_oneG/C'][1], table['init_allA/T'][1])
+
+        # 探针5'端为T对应片段3'端为A，探针3'端为A对应片段5'端为T
+        first = self.codes[starts]
+        last = self.codes[ends - 1]
+        terminal_t = (last == 0).astype(int) + (first == 3).astype(int)
+        delta_h += table['init_5T/A'][0] * terminal_t
+        delta_s += table['init_5T/A'][1] * terminal_t
+
+        end_at = (first == 0).astype(int) + (first == 3) + (last == 0) + (last == 3)
+        end_gc = 2 - end_at
+        delta_h += table['init_A/T'][0] * end_at + table['init_G/C'][0] * end_gc
+        delta_s += table['init_A/T'][1] * end_at + table['init_G/C'][1] * end_gc
+
+        corr = self._salt_correction(length)
+        if self.saltcorr == 5:
+            delta_s = delta_s + corr
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tm = (1000 * delta_h) / (delta_s + self.R * self.log_k) - 273.15
+        if self.saltcorr in (1, 2, 3, 4):
+            tm = tm + corr
+
+        invalid = (self._invalid_prefix[ends] - self._invalid_prefix[starts]) > 0
+        tm[invalid] = np.nan
+        return tm
+
+
+###########################################################################
+# 重复序列索引 - 设计加速模块
+###########################################################################
+class RepeatIndex:
+    """目标序列的k-mer重复索引，每条目标序列只构建一次，可在多组设计参数之间复用"""
+
+    BLOCK_SIZE = 65536
+
+    def __init__(self, sequence, k=6):
+        self.sequence = sequence
+        self.k = k
+        self._duplicate_masks = {}
+        self._repeat_masks = {}
+
+        # 按字符出现的种类重新编号，保证任意字符都能精确比较
+        if isinstance(sequence, PackedSequence):
+            raw = sequence.ascii().astype(np.uint32)
+        else:
+            raw = np.frombuffer(sequence.encode('utf-32-le'), dtype=np.uint32)
+        alphabet, ranks = np.unique(raw, return_inverse=True)
+        self.ranks = ranks.astype(np.uint64).reshape(-1)
+        self.bits = max(1, int(np.ceil(np.log2(max(len(alphabet), 2)))))
+
+        # prev_far[i]：与位置i的k-mer相同、且起点不晚于i-k（不重叠）的最近一次出现，没有则为-1
+        kmer_count = max(len(sequence) - k + 1, 0)
+        self.prev_far = np.full(kmer_count, -1, dtype=np.int64)
+        if kmer_count > 0 and k > 0:
+            kmers = self._pack_windows(k)
+            _, kmer_ids = np.unique(kmers, axis=0, return_inverse=True)
+            kmer_ids = kmer_ids.reshape(-1).astype(np.int64)
+            positions = np.arange(kmer_count, dtype=np.int64)
+            keys = kmer_ids * (kmer_count + k + 1) + positions
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            found = np.searchsorted(sorted_keys, keys - k, side='right') - 1
+            valid = found >= 0
+            same_kmer = np.zeros(kmer_count, dtype=bool)
+            same_kmer[valid] = kmer_ids[order[found[valid]]] == kmer_ids[valid]
+            self.prev_far[same_kmer] = positions[order[found[same_kmer]]]
+
+    def _pack_windows(self, length):
+        """把每个长度为length的窗口无损打包为若干个uint64，用于整窗比较"""
+        window_count = len(self.ranks) - length + 1
+        chars_per_word = 64 // self.bits
+        word_count = -(-length // chars_per_word)
+        packed = np.zeros((window_count, word_count), dtype=np.uint64)
+        for offset in range(length):
+            word, slot = divmod(offset, chars_per_word)
+            shift = np.uint64(self.bits * (chars_per_word - 1 - slot))
+            packed[:, word] |= self.ranks[offset:offset + window_count] << shift
+        return packed
+
+    def duplicate_mask(self, length):
+        """所有长度为length的窗口是否在目标序列其他位置（允许重叠）再次出现"""
+        if length not in self._duplicate_masks:
+            window_count = len(self.ranks) - length + 1
+            if window_count <= 0 or length <= 0:
+                mask = np.zeros(max(window_count, 0), dtype=bool)
+            else:
+                _, inverse, counts = np.unique(self._pack_windows(length), axis=0,
+                                               return_inverse=True, return_counts=True)
+                mask = counts[inverse.reshape(-1)] > 1
+            self._duplicate_masks[length] = mask
+        return self._duplicate_masks[length]
+
+    def has_internal_repeat(self, start, length):
+        """窗口内是否有k-mer不重叠地出现两次以上（与str.count的语义一致）"""
+        last = start + length - self.k
+        if last < start:
+            return False
+        return bool((self.prev_far[start:last + 1] >= start).any())
+
+    def has_repeats(self, start, length):
+        """窗口内部重复或在目标序列其他位置重复出现，复杂度O(探针长度)"""
+        if self.has_internal_repeat(start, length):
+            return True
+        mask = self.duplicate_mask(length)
+        return bool(start < len(mask) and mask[start])
+
+    def repeat_mask(self, length):
+        """批量判断所有长度为length的窗口是否存在重复"""
+        if length not in self._repeat_masks:
+            mask = self.duplicate_mask(length).copy()
+            span = length - self.k + 1
+            if span > 0 and len(mask) > 0:
+                # 窗口内prev_far的最大值不小于窗口起点即存在内部重复
+                windows = np.lib.stride_tricks.sliding_window_view(self.prev_far, span)
+                for block_start in range(0, len(mask), self.BLOCK_SIZE):
+                    block = windows[block_start:block_start + self.BLOCK_SIZE]
+                    starts = np.arange(block_start, block_start + len(block))
+                    mask[block_start:block_start + len(block)] |= block.max(axis=1) >= starts
+            self._repeat_masks[length] = mask
+        return self._repeat_masks[length]
+
+
+###########################################################################
+# 窗口过滤流水线 - 设计加速模块
+###########################################################################
+class WindowFilterPipeline:
+    """逐窗口精确判定的过滤流水线：每个条件是带成本估计的阶段，遇到第一个不通过的阶段即淘汰窗口
+
+    order为'cost'时固定按成本从低到高执行；为'adaptive'时每隔RERANK_INTERVAL个窗口按观测到的淘汰率
+    重新排序（成本/淘汰率越小越靠前）。窗口只有通过全部阶段才被接受，因此执行顺序不影响设计结果。
+    """
+
+    # 单次判定的成本估计（微秒），来自性能计量的实测
+    STAGE_COSTS = {'repeat': 0.6, 'gc': 1.3, 'homopolymer': 1.5, 'tm': 3.2, 'complexity': 6.7}
+    # 没有k-mer索引时重复判定要扫描整条目标序列，没有增量Tm数组时逐窗口调用Biopython
+    SLOW_COSTS = {'repeat': 50.0, 'tm': 70.0}
+    RERANK_INTERVAL = 256
+    DECODE_CHUNK = 65536
+
+    def __init__(self, designer, seq, probe_length, parameters, tm_values=None, repeat_index=None,
+                 order=None, profiler=None):
+        self.designer = designer
+        self.seq = seq
+        self.probe_length = probe_length
+        self.parameters = parameters
+        self.tm_values = tm_values
+        self.profiler = profiler
+        if repeat_index is None and parameters['filter_repeats'] and isinstance(seq, PackedSequence):
+            # 序列库视图不做整条字符串查找，重复判定改用k-mer索引
+            repeat_index = designer.get_repeat_index(seq)
+        self.repeat_index = repeat_index
+        self.adaptive = (order or parameters.get('filter_order', 'adaptive')) == 'adaptive'
+        self.tm_method = parameters.get('tm_method', 'santalucia')
+        self.max_homopolymer_length = parameters.get('max_homopolymer_length', 3)
+
+        self.checks = {
+            'gc': self.check_gc,
+            'homopolymer': self.check_homopolymer,
+            'complexity': self.check_complexity,
+            'tm': self.check_tm,
+        }
+        if parameters['filter_repeats']:
+            self.checks['repeat'] = self.check_repeat
+        self.costs = {name: self.STAGE_COSTS[name] for name in self.checks}
+        if repeat_index is None and 'repeat' in self.costs:
+            self.costs['repeat'] = self.SLOW_COSTS['repeat']
+        if tm_values is None:
+            self.costs['tm'] = self.SLOW_COSTS['tm']
+        self.order = sorted(self.checks, key=self.costs.get)
+        self.evaluated = dict.fromkeys(self.checks, 0)
+        self.rejected = dict.fromkeys(self.checks, 0)
+        self.windows = 0
+        self._chunk_start = 0
+        self._chunk = ''
+
+    def check_gc(self, position, rna_fragment, candidate, values):
+        gc_content = self.designer.calculate_gc(candidate)
+        values['gc'] = gc_content
+        return self.parameters['min_gc'] <= gc_content <= self.parameters['max_gc']
+
+    def check_homopolymer(self, position, rna_fragment, candidate, values):
+        return not self.designer.has_homopolymer(candidate, self.max_homopolymer_length)
+
+    def check_complexity(self, position, rna_fragment, candidate, values):
+        complexity = self.designer.calculate_complexity(candidate)
+        values['complexity'] = complexity
+        return complexity >= self.parameters['min_complexity']
+
+    def check_tm(self, position, rna_fragment, candidate, values):
+        # 优先使用预计算的增量Tm，含N等特殊碱基的窗口回退到Biopython
+        if self.tm_values is not None and not np.isnan(self.tm_values[position]):
+            tm = round(float(self.tm_values[position]), 2)
+        else:
+            tm = self.designer.calculate_tm(candidate, method=self.tm_method)
+        values['tm'] = tm
+        return tm is not None and self.parameters['min_tm'] <= tm <= self.parameters['max_tm']
+
+    def check_repeat(self, position, rna_fragment, candidate, values):
+        # 有索引时为O(探针长度)查询
+        if self.repeat_index is not None:
+            return not self.repeat_index.has_repeats(position, self.probe_length)
+        return not self.designer.has_repeats(rna_fragment, self.seq)
+
+    def evaluate(self, position):
+        """判定一个窗口，合格时返回(RNA片段, DNA探针, GC, Tm, 复杂度)，否则返回None"""
+        profiler = self.profiler
+        lap = profiler.start_laps() if profiler is not None else None
+
+        # 获取候选探针序列（RNA片段），取反向互补得到DNA探针（互补表中U与T同样配对为A，无需先替换U→T）
+        rna_fragment = self.fragment(position)
+        candidate = reverse_complement(rna_fragment)
+        if lap:
+            lap('evaluate.revcomp')
+            profiler.count('windows_evaluated')
+
+        self.windows += 1
+        if self.adaptive and self.windows % self.RERANK_INTERVAL == 0:
+            self.rerank()
+
+        values = {}
+        for name in self.order:
+            self.evaluated[name] += 1
+            passed = self.checks[name](position, rna_fragment, candidate, values)
+            if lap:
+                lap('evaluate.' + name)
+            if not passed:
+                self.rejected[name] += 1
+                if lap:
+                    profiler.reject(name)
+                return None
+        return rna_fragment, candidate, values['gc'], values['tm'], values['complexity']
+
+    def fragment(self, position):
+        """取出窗口的RNA片段；序列库视图按块解码，块内窗口直接切片，内存占用与目标序列长度无关"""
+        end = position + self.probe_length
+        if isinstance(self.seq, str):
+            return self.seq[position:end]
+        if position < self._chunk_start or end > self._chunk_start + len(self._chunk):
+            self._chunk_start = position
+            self._chunk = str(self.seq[position:max(position + self.DECODE_CHUNK, end)])
+        return self._chunk[position - self._chunk_start:end - self._chunk_start]
+
+    def rerank(self):
+        """按期望成本重新排序：成本/淘汰率（加一平滑）越小越先执行"""
+        def expected_cost(name):
+            rate = (self.rejected[name] + 1) / (self.evaluated[name] + 2)
+            return self.costs[name] / rate
+        self.order.sort(key=expected_cost)
+
+    def stats(self):
+        """按当前执行顺序返回[(阶段, 判定次数, 淘汰次数)]"""
+        return [(name, self.evaluated[name], self.rejected[name]) for name in self.order]
+
+    def format_stats(self):
+        return "过滤统计（执行顺序）: " + "，".join(
+            f"{name} 判定 {evaluated} 淘汰 {rejected}" for name, evaluated, rejected in self.stats())
+
+
+###########################################################################
+# 持久化结果缓存 - 缓存模块
+###########################################################################
+def user_cache_dir():
+    """返回当前用户的缓存目录（Windows为LOCALAPPDATA，其他系统遵循XDG规范）"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = os.path.join(base, 'FISH-analysis-Tool-0C9')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class ResultCache:
+    """基于SQLite的Tm/GC结果缓存，按(序列, Tm方法, 参数表, 盐条件)内容寻址，超出容量时按LRU淘汰"""
+
+    DEFAULT_MAX_ENTRIES = 1000000
+    # 缓冲写入条数，达到后批量写入数据库
+    FLUSH_THRESHOLD = 5000
+    # 各Tm方法实际使用的参数表和盐条件（均为Bio.SeqUtils.MeltingTemp的默认值）
+    NN_CONDITIONS = "Na=50,K=0,Tris=0,Mg=0,dNTPs=0,saltcorr=5,dnac1=25,dnac2=25"
+    METHOD_CONDITIONS = {
+        'santalucia': ('DNA_NN1', NN_CONDITIONS),
+        'nn': ('DNA_NN3', NN_CONDITIONS),
+        'wallace': ('', ''),
+        'gc': ('', "valueset=7,Na=50,K=0,Tris=0,Mg=0,dNTPs=0,saltcorr=0"),
+    }
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(user_cache_dir(), 'tm_cache.sqlite')
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memo = {}
+        self._pending = {}
+        self._touched = set()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tm_cache ("
+                "key TEXT PRIMARY KEY, tm REAL, gc REAL, last_used REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tm_cache_lru ON tm_cache(last_used)")
+
+    @classmethod
+    def make_key(cls, sequence, method):
+        """由序列和计算条件生成内容地址"""
+        # 未知方法在calculate_tm中按默认最近邻表计算
+        nn_table, salt = cls.METHOD_CONDITIONS.get(method, cls.METHOD_CONDITIONS['nn'])
+        text = '|'.join((sequence.upper().strip(), method, nn_table, salt))
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def reset_stats(self):
+        """重置命中统计（每次运行开始时调用）"""
+        self.hits = 0
+        self.misses = 0
+
+    def prefetch(self, sequences, method):
+        """批量从数据库载入一批序列的缓存结果，之后的get不再逐条查询数据库"""
+        keys = list({self.make_key(sequence, method) for sequence in sequences})
+        with self._lock:
+            self._memo = {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, tm, gc FROM tm_cache WHERE key IN ({','.join('?' * len(batch))})",
+                    batch).fetchall()
+                for key, tm, gc in rows:
+                    self._memo[key] = (tm, gc)
+            # 预取范围内未命中的键直接记为不存在
+            for key in keys:
+                self._memo.setdefault(key, None)
+
+    def get(self, sequence, method):
+        """查询缓存，命中时返回(tm, gc)，未命中返回None"""
+        key = self.make_key(sequence, method)
+        with self._lock:
+            if key in self._pending:
+                entry = self._pending[key]
+            elif key in self._memo:
+                entry = self._memo[key]
+            else:
+                entry = self._conn.execute(
+                    "SELECT tm, gc FROM tm_cache WHERE key = ?", (key,)).fetchone()
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched.add(key)
+            return entry
+
+    def put(self, sequence, method, tm, gc=None):
+        """写入缓存（先缓冲，达到阈值后批量落盘）"""
+        key = self.make_key(sequence, method)
+        with self._lock:
+            self._pending[key] = (tm, gc)
+            if key in self._memo:
+                self._memo[key] = (tm, gc)
+            flush = len(self._pending) >= self.FLUSH_THRESHOLD
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的写入和访问时间更新落盘，并按LRU淘汰超出容量的条目"""
+        with self._lock:
+            now = time.time()
+            pending = [(key, tm, gc, now) for key, (tm, gc) in self._pending.items()]
+            touched = [(now, key) for key in self._touched if key not in self._pending]
+            self._pending = {}
+            self._touched = set()
+            with self._conn:
+                if pending:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO tm_cache (key, tm, gc, last_used) VALUES (?, ?, ?, ?)", pending)
+                if touched:
+                    self._conn.executemany("UPDATE tm_cache SET last_used = ? WHERE key = ?", touched)
+                count = self._conn.execute("SELECT COUNT(*) FROM tm_cache").fetchone()[0]
+                if count > self.max_entries:
+                    # 一次多淘汰10%，避免每次写入都触发淘汰
+                    excess = count - int(self.max_entries * 0.9)
+                    self._conn.execute(
+                        "DELETE FROM tm_cache WHERE key IN "
+                        "(SELECT key FROM tm_cache ORDER BY last_used LIMIT ?)", (excess,))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memo = {}
+            self._pending = {}
+            self._touched = set()
+            with self._conn:
+                self._conn.execute("DELETE FROM tm_cache")
+
+    def report(self):
+        """返回命中统计文本"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"Tm缓存: 命中 {self.hits}，未命中 {self.misses}（命中率 {rate:.1f}%）"
+
+
+class BlastHitCache:
+    """基于SQLite的BLAST命中缓存，按(探针序列, 数据库指纹, BLAST参数)内容寻址，超出容量时按LRU淘汰"""
+
+    DEFAULT_MAX_ENTRIES = 2000000
+    FLUSH_THRESHOLD = 1000
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(user_cache_dir(), 'blast_cache.sqlite')
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blast_cache ("
+                "key TEXT PRIMARY KEY, db TEXT, hits TEXT, last_used REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS blast_cache_lru ON blast_cache(last_used)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS blast_cache_db ON blast_cache(db)")
+
+    @staticmethod
+    def normalize_db(db_path):
+        """数据库路径的规范形式，用于按数据库失效缓存"""
+        return os.path.normcase(os.path.abspath(db_path))
+
+    @classmethod
+    def db_fingerprint(cls, db_path):
+        """由数据库各文件的名称、修改时间和大小生成指纹，数据库更新后旧缓存自动失效"""
+        db_name = os.path.basename(db_path)
+        db_dir = os.path.dirname(db_path) or '.'
+        parts = [cls.normalize_db(db_path)]
+        try:
+            names = sorted(f for f in os.listdir(db_dir) if f.startswith(db_name))
+        except OSError:
+            names = []
+        for name in names:
+            stat = os.stat(os.path.join(db_dir, name))
+            parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+        return '|'.join(parts)
+
+    @staticmethod
+    def make_key(sequence, fingerprint, params):
+        """由探针序列、数据库指纹和BLAST参数生成内容地址"""
+        text = '|'.join((sequence.upper().strip(), fingerprint, params))
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def reset_stats(self):
+        """重置命中统计（每次运行开始时调用）"""
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, sequences, fingerprint, params):
+        """批量查询缓存，返回{规范化序列: 命中列表}，未命中的序列不在结果中"""
+        keys = {}
+        for sequence in sequences:
+            normalized = sequence.upper().strip()
+            keys.setdefault(self.make_key(normalized, fingerprint, params), normalized)
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), 500):
+                batch = key_list[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, hits FROM blast_cache WHERE key IN ({','.join('?' * len(batch))})",
+                    batch).fetchall()
+                for key, hits in rows:
+                    found[keys[key]] = [parse_blast_hit(['cached'] + fields) for fields in json.loads(hits)]
+            for key, (db, hits) in self._pending.items():
+                if key in keys:
+                    found[keys[key]] = [parse_blast_hit(['cached'] + fields) for fields in json.loads(hits)]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE blast_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in keys if keys[key] in found])
+        return found
+
+    def put(self, sequence, fingerprint, params, db_path, hits):
+        """写入一个查询的命中（先缓冲，达到阈值后批量落盘）"""
+        key = self.make_key(sequence, fingerprint, params)
+        entry = (self.normalize_db(db_path), json.dumps([hit['fields'] for hit in hits]))
+        with self._lock:
+            self._pending[key] = entry
+            flush = len(self._pending) >= self.FLUSH_THRESHOLD
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的写入落盘，并按LRU淘汰超出容量的条目"""
+        with self._lock:
+            now = time.time()
+            pending = [(key, db, hits, now) for key, (db, hits) in self._pending.items()]
+            self._pending = {}
+            with self._conn:
+                if pending:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO blast_cache (key, db, hits, last_used) VALUES (?, ?, ?, ?)", pending)
+                count = self._conn.execute("SELECT COUNT(*) FROM blast_cache").fetchone()[0]
+                if count > self.max_entries:
+                    # 一次多淘汰10%，避免每次写入都触发淘汰
+                    excess = count - int(self.max_entries * 0.9)
+                    self._conn.execute(
+                        "DELETE FROM blast_cache WHERE key IN "
+                        "(SELECT key FROM blast_cache ORDER BY last_used LIMIT ?)", (excess,))
+
+    def invalidate(self, db_path=None):
+        """删除指定数据库的缓存条目（不指定时清空全部），返回删除的条目数"""
+        with self._lock:
+            if db_path is None:
+                self._pending = {}
+                with self._conn:
+                    return self._conn.execute("DELETE FROM blast_cache").rowcount
+            db = self.normalize_db(db_path)
+            self._pending = {key: entry for key, entry in self._pending.items() if entry[0] != db}
+            with self._conn:
+                return self._conn.execute("DELETE FROM blast_cache WHERE db = ?", (db,)).rowcount
+
+    def report(self):
+        """返回命中统计文本"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"BLAST缓存: 命中 {self.hits}，未命中 {self.misses}（命中率 {rate:.1f}%）"
+
+
+###########################################################################
+# 性能计量模块
+###########################################################################
+class StageProfiler:
+    """累计各阶段的耗时和调用次数、计数器以及各过滤条件的淘汰数
+
+    未启用计量时调用方持有None，热点路径只多一次判断。进程池子进程各自计量，
+    结果用merge并入主进程，因此各阶段耗时之和可能超过实际经过时间。
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = Counter()
+        self.rejections = {}
+        self.started = time.perf_counter()
+        self._last = self.started
+
+    def add(self, stage, seconds, calls=1):
+        """累加一个阶段的耗时"""
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    @contextmanager
+    def stage(self, name):
+        """计量with块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def start_laps(self):
+        """开始分段计时，返回lap函数：每次调用把距上一次的耗时记入给定阶段"""
+        self._last = time.perf_counter()
+        return self.lap
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.add(name, now - self._last)
+        self._last = now
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def reject(self, filter_name, amount=1, phase='exact'):
+        """记录被某一过滤条件淘汰的数量，phase区分批量预筛和逐条判定"""
+        if amount:
+            self.rejections.setdefault(phase, Counter())[filter_name] += amount
+
+    def merge(self, report):
+        """并入子进程report()的结果"""
+        for name, entry in report['stages'].items():
+            self.add(name, entry['seconds'], entry['calls'])
+        self.counters.update(report['counters'])
+        for phase, counts in report['rejections'].items():
+            self.rejections.setdefault(phase, Counter()).update(counts)
+
+    def report(self):
+        """返回可序列化为JSON的计量结果，阶段按耗时从大到小排列"""
+        stages = sorted(self.stages.items(), key=lambda item: -item[1][0])
+        return {
+            'wall_seconds': round(time.perf_counter() - self.started, 6),
+            'stages': {name: {'seconds': round(seconds, 6), 'calls': calls} for name, (seconds, calls) in stages},
+            'counters': dict(self.counters),
+            'rejections': {phase: dict(counts) for phase, counts in self.rejections.items()},
+        }
+
+    def format_report(self):
+        """返回多行文本报告，用于写入日志"""
+        report = self.report()
+        lines = [f"性能计量（经过 {report['wall_seconds']:.3f} s）:"]
+        for name, entry in report['stages'].items():
+            per_call = entry['seconds'] / entry['calls'] * 1e6 if entry['calls'] else 0.0
+            lines.append(f"  {name:<24} {entry['seconds']:10.4f} s  {entry['calls']:>9} 次  {per_call:10.2f} µs/次")
+        if report['counters']:
+            lines.append("  计数: " + "，".join(f"{name}={value}" for name, value in report['counters'].items()))
+        for phase, counts in report['rejections'].items():
+            lines.append(f"  淘汰（{phase}）: " + "，".join(f"{name}={value}" for name, value in counts.items()))
+        return "\n".join(lines)
+
+    @staticmethod
+    def sidecar_path(output_file):
+        """计量结果文件路径：与输出文件同名，扩展名为.profile.json"""
+        return os.path.splitext(output_file)[0] + '.profile.json'
+
+    def publish(self, output_file, log_callback=None):
+        """把报告写入日志，并把JSON结果保存在输出文件旁边"""
+        if log_callback:
+            log_callback(self.format_report())
+        path = self.sidecar_path(output_file)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            if log_callback:
+                log_callback(f"无法保存性能计量结果: {e}")
+            return None
+        if log_callback:
+            log_callback(f"性能计量结果已保存到: {path}")
+        return path
+
+
+def profile_stage(profiler, name):
+    """profiler为None时返回空上下文，用于粗粒度阶段"""
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+def profile_iter(profiler, name, iterable):
+    """逐项计量从iterable取值的耗时（如分块读取输入文件）"""
+    if profiler is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with profiler.stage(name):
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+
+###########################################################################
+# 任务控制模块 - 取消、暂停与进度
+###########################################################################
+class JobControl:
+    """设计、分析、反向互补和BLAST共用的任务控制：协作式取消与暂停、限频进度（含吞吐量和剩余时间）
+
+    工作循环在块边界调用checkpoint()：暂停时在此等待继续，已取消时返回False，由调用方按各自约定结束
+    （通常返回None）。update()/advance()记录进度，每progress_interval秒最多回调一次：
+    progress_callback收到整数百分比，status_callback收到含吞吐量和剩余时间的状态文本。
+    register_process()登记的子进程（如blastn）在cancel()时立即终止。
+    """
+    PAUSE_POLL_INTERVAL = 0.2
+
+    def __init__(self, name="任务", unit="条", progress_callback=None, status_callback=None,
+                 pause_flag=None, cancel_flag=None, progress_interval=0.25):
+        self.name = name
+        self.unit = unit
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        # 可以传入调用方已有的Event，与原有的pause_flag/cancel_flag共用同一状态
+        self.pause_flag = pause_flag if pause_flag is not None else threading.Event()
+        self.cancel_flag = cancel_flag if cancel_flag is not None else threading.Event()
+        self.progress_interval = progress_interval
+        self.processes = []
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.start()
+
+    def start(self, total=None, unit=None, name=None, done=0):
+        """开始计量一个阶段：进度和计时清零，不改变暂停和取消状态
+
+        done为断点续跑时已完成的量，计入百分比但不计入吞吐量。
+        """
+        self.total = total
+        if unit is not None:
+            self.unit = unit
+        if name is not None:
+            self.name = name
+        self.done = done
+        self.initial = done
+        self.started = time.perf_counter()
+        self.paused_seconds = 0.0
+        self.last_report = self.started
+        self.last_percent = -1
+        return self
+
+    @property
+    def cancelled(self):
+        return self.cancel_flag.is_set()
+
+    @property
+    def paused(self):
+        return self.pause_flag.is_set()
+
+    def wants_progress(self):
+        """是否有进度回调，没有时调用方可以省去统计总量"""
+        return self.progress_callback is not None or self.status_callback is not None
+
+    def pause(self):
+        self.pause_flag.set()
+
+    def resume(self):
+        self.pause_flag.clear()
+
+    def cancel(self):
+        """请求取消并终止已登记的子进程（只发送终止信号，不在调用线程中等待）"""
+        self.cancel_flag.set()
+        with self.lock:
+            processes = list(self.processes)
+        for process in processes:
+            self.terminate(process)
+
+    def reset(self):
+        """清除暂停和取消状态，供下一个任务复用"""
+        self.pause_flag.clear()
+        self.cancel_flag.clear()
+        with self.lock:
+            self.processes = []
+
+    def checkpoint(self):
+        """在块边界调用：暂停时等待继续或取消，返回是否继续执行"""
+        if self.pause_flag.is_set() and not self.cancel_flag.is_set():
+            # 多个线程（如各BLAST分片的读取线程）同时等待时，暂停时间只计一次，不计入吞吐量和剩余时间
+            with self.lock:
+                if not self.waiting:
+                    self.paused_at = time.perf_counter()
+                self.waiting += 1
+            try:
+                while self.pause_flag.is_set() and not self.cancel_flag.is_set():
+                    time.sleep(self.PAUSE_POLL_INTERVAL)
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+                    if not self.waiting:
+                        self.paused_seconds += time.perf_counter() - self.paused_at
+        return not self.cancel_flag.is_set()
+
+    def register_process(self, process):
+        """登记子进程，取消时终止；登记时已经取消则立即终止"""
+        with self.lock:
+            self.processes.append(process)
+        if self.cancel_flag.is_set():
+            self.terminate(process)
+
+    def unregister_process(self, process):
+        with self.lock:
+            if process in self.processes:
+                self.processes.remove(process)
+
+    @staticmethod
+    def terminate(process):
+        if process.poll() is None:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+
+    def advance(self, amount=1):
+        self.update(self.done + amount)
+
+    def update(self, done):
+        """记录已完成量，距上次回调不足progress_interval秒时只记录不回调"""
+        self.done = done
+        if not self.wants_progress():
+            return
+        now = time.perf_counter()
+        if now - self.last_report < self.progress_interval:
+            return
+        self.last_report = now
+        self.report()
+
+    def finish(self, done=None):
+        """任务完成：进度回调收到最终百分比，状态回调收到汇总文本"""
+        if done is not None:
+            self.done = done
+        snapshot = self.snapshot()
+        if self.progress_callback and snapshot['percent'] is not None:
+            self.progress_callback(int(snapshot['percent']))
+        if self.status_callback:
+            self.status_callback(self.format_summary())
+
+    def snapshot(self):
+        """当前进度：已完成量、总量、百分比、有效耗时（秒）、吞吐量（单位/秒）和剩余时间（秒）"""
+        elapsed = max(time.perf_counter() - self.started - self.paused_seconds, 1e-9)
+        rate = (self.done - self.initial) / elapsed
+        percent = eta = None
+        if self.total:
+            percent = min(self.done / self.total * 100, 100.0)
+            if rate > 0:
+                eta = max(self.total - self.done, 0) / rate
+        return {'done': self.done, 'total': self.total, 'percent': percent, 'elapsed': elapsed,
+                'rate': rate, 'eta': eta}
+
+    def report(self):
+        snapshot = self.snapshot()
+        if self.progress_callback and snapshot['percent'] is not None:
+            percent = int(snapshot['percent'])
+            if percent != self.last_percent:
+                self.progress_callback(percent)
+                self.last_percent = percent
+        if self.status_callback:
+            self.status_callback(self.format_status(snapshot))
+
+    def format_status(self, snapshot=None):
+        """状态文本，如：探针设计: 45% · 1,234 窗口/秒 · 剩余 0:12"""
+        snapshot = snapshot or self.snapshot()
+        parts = [f"{self.name}: "]
+        if snapshot['percent'] is not None:
+            parts.append(f"{snapshot['percent']:.0f}%（{snapshot['done']:,}/{snapshot['total']:,}）")
+        else:
+            parts.append(f"{snapshot['done']:,} {self.unit}")
+        parts.append(f" · {snapshot['rate']:,.0f} {self.unit}/秒")
+        if snapshot['eta'] is not None:
+            parts.append(f" · 剩余 {self.format_duration(snapshot['eta'])}")
+        if self.paused:
+            parts.append(" · 已暂停")
+        return "".join(parts)
+
+    def format_summary(self):
+        """结束时的汇总文本，如：探针设计: 100,000 窗口，用时 1.52 秒（65,789 窗口/秒）"""
+        snapshot = self.snapshot()
+        resumed = f"（其中 {self.initial:,} 来自断点）" if self.initial else ""
+        return (f"{self.name}: {snapshot['done']:,} {self.unit}{resumed}，用时 {snapshot['elapsed']:.2f} 秒"
+                f"（{snapshot['rate']:,.0f} {self.unit}/秒）")
+
+    @staticmethod
+    def format_duration(seconds):
+        seconds = int(round(seconds))
+        hours, rest = divmod(seconds, 3600)
+        minutes, seconds = divmod(rest, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+###########################################################################
+# 断点续跑模块 - 长任务的检查点与恢复
+###########################################################################
+class RunCheckpoint:
+    """长任务的断点目录：manifest.json记录任务种类、指纹和调用方的进度状态，块结果文件与之放在同一目录
+
+    每完成一块后调用save()原子替换manifest，崩溃或取消后最多损失正在计算的一块。
+    resume为True且目录中的种类和指纹（输入文件、数据库和影响结果的参数）与当前任务一致时沿用已保存的状态，
+    不一致时抛出ValueError并保留目录，不替用户丢弃已完成的部分；未要求续跑时清空已有检查点重新开始。
+    任务成功结束后调用clear()删除整个目录。
+    """
+    MANIFEST = 'manifest.json'
+    VERSION = 1
+
+    def __init__(self, work_dir, kind, fingerprint, resume=False):
+        self.work_dir = work_dir
+        self.kind = kind
+        self.fingerprint = fingerprint
+        self.state = {}
+        manifest = self.read_manifest(work_dir)
+        # 指纹经过JSON往返后再比较，避免元组/列表之类的差异
+        fingerprint = json.loads(json.dumps(fingerprint))
+        matches = (manifest is not None and manifest.get('version') == self.VERSION
+                   and manifest.get('kind') == kind and manifest.get('fingerprint') == fingerprint)
+        if resume and matches:
+            self.state = manifest['state']
+        elif resume and manifest is not None:
+            # 要求续跑但检查点属于另一个任务（输入或参数已变化），保留目录由用户决定是否丢弃
+            raise ValueError(f"检查点与当前的输入或参数不一致，未续跑也未删除，确认不再需要后删除该目录: {work_dir}")
+        else:
+            if manifest is not None:
+                shutil.rmtree(work_dir)
+            elif os.path.isdir(work_dir) and os.listdir(work_dir):
+                # 只清理自己创建的目录，不删除用户的其他文件
+                raise ValueError(f"检查点目录不为空且没有有效的manifest，请换一个目录或手动清理: {work_dir}")
+            os.makedirs(work_dir, exist_ok=True)
+        self.resumed = bool(self.state)
+        # 未要求续跑，丢弃了上次中断留下的检查点
+        self.discarded = not resume and manifest is not None
+
+    @staticmethod
+    def default_dir(output_file):
+        """默认检查点目录：输出文件旁的<输出文件>.checkpoint"""
+        return os.path.abspath(output_file) + '.checkpoint'
+
+    @classmethod
+    def read_manifest(cls, work_dir):
+        """读取检查点目录的manifest，不存在或已损坏时返回None"""
+        try:
+            with open(os.path.join(work_dir, cls.MANIFEST), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def exists(cls, work_dir):
+        return cls.read_manifest(work_dir) is not None
+
+    @staticmethod
+    def file_fingerprint(path):
+        """输入文件的指纹：绝对路径、大小和修改时间"""
+        stat = os.stat(path)
+        return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def save(self, description=""):
+        """写入当前状态（先写临时文件再替换，中途崩溃不会留下不完整的manifest）"""
+        manifest = {
+            'version': self.VERSION,
+            'kind': self.kind,
+            'fingerprint': self.fingerprint,
+            'state': self.state,
+            'description': description,
+            'updated': time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        temp_path = self.path(self.MANIFEST + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.path(self.MANIFEST))
+
+    def clear(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+###########################################################################
+# 本地BLAST执行模块
+###########################################################################
+def iter_blast_results(lines):
+    """流式解析BLAST表格输出（outfmt 6/7），每个查询结束时立即产出(查询ID, 命中列表)"""
+    current_query = None
+    hits = []
+    # outfmt 7以"# Query:"行确定查询ID；outfmt 6没有注释行，按第一列分组
+    from_header = False
+
+    for line in lines:
+        line = line.strip()
+
+        if line.startswith('# Query:'):
+            if current_query is not None:
+                yield current_query, hits
+            current_query = line.split()[2]
+            hits = []
+            from_header = True
+
+        elif line.startswith('# BLAST'):
+            # 新报告的首行或"# BLAST processed"结束行，说明上一个查询已经完整
+            if current_query is not None:
+                yield current_query, hits
+            current_query = None
+            hits = []
+
+        elif line.startswith('#') or not line:
+            continue
+
+        else:
+            parts = line.split('\t')
+            if len(parts) < 12:  # 确保有足够的字段
+                continue
+            if not from_header and parts[0] != current_query:
+                if current_query is not None:
+                    yield current_query, hits
+                current_query = parts[0]
+                hits = []
+            hits.append(parse_blast_hit(parts))
+
+    # 最后一个查询
+    if current_query is not None:
+        yield current_query, hits
+
+
+def iter_report_blocks(lines):
+    """把blastn outfmt 7报告按查询切分为原始文本块，产出(查询ID, 文本)；"# BLAST processed"结束行不属于任何块"""
+    query = None
+    block = []
+    for line in lines:
+        if line.startswith('# BLAST'):
+            # 每个查询块都以"# BLASTN"表头开始
+            if block:
+                yield query, ''.join(block)
+            query = None
+            block = []
+            if line.startswith('# BLAST processed'):
+                continue
+        elif line.startswith('# Query:'):
+            query = line.split()[2]
+        block.append(line)
+    if block:
+        yield query, ''.join(block)
+
+
+def parse_blast_hit(parts):
+    """把一行表格输出的字段转换为命中字典，fields保留查询ID之后的原始字段"""
+    return {
+        'subject': parts[1],  # subject acc.ver
+        'identity': float(parts[2]),  # % identity
+        'evalue': float(parts[10]),  # evalue
+        'bitscore': float(parts[11]),  # bit score
+        'fields': parts[1:]
+    }
+
+
+def blast_specificity(hits):
+    """根据BLAST命中计算特异性评级（基于最高identity、evalue和命中数量）"""
+    if not hits:
+        return "无匹配"
+
+    hit_count = len(hits)
+    best_hit = hits[0]
+    identity = best_hit['identity']
+    evalue = best_hit['evalue']
+
+    if identity > 99 and evalue < 1e-5 and hit_count < 5:
+        return "高"
+    elif identity > 95 and evalue < 1e-4 and hit_count < 10:
+        return "中"
+    elif identity > 75 and evalue < 0.01 and hit_count < 20:
+        return "低"
+    return "不建议使用"
+
+
+class BlastRunner:
+    """把查询序列切分为多个分片，并发运行多个blastn进程，再按查询顺序合并结果"""
+
+    def __init__(self, blast_path, db_path, shards=1, num_threads=1, evalue="0.1", max_target_seqs="30",
+                 cache=None, profiler=None):
+        self.blast_path = blast_path
+        self.db_path = db_path
+        self.shards = max(int(shards), 1)
+        self.num_threads = max(int(num_threads), 1)
+        self.evalue = str(evalue)
+        self.max_target_seqs = str(max_target_seqs)
+        self.cache = cache
+        self.profiler = profiler
+
+    def cache_params(self):
+        """影响命中结果的BLAST参数，作为缓存键的一部分"""
+        return f"blastn|outfmt=7|evalue={self.evalue}|max_target_seqs={self.max_target_seqs}"
+
+    def build_command(self, query_file, output_file=None):
+        """构建单个分片的BLAST命令，不指定output_file时结果输出到标准输出"""
+        blast_cmd = [
+            self.blast_path,
+            "-db", self.db_path,
+            "-query", query_file,
+            "-outfmt", "7",
+            "-max_target_seqs", self.max_target_seqs,  # 限制每个查询的最大命中数
+            "-evalue", self.evalue,  # 最低E值参数
+        ]
+        if output_file:
+            blast_cmd += ["-out", output_file]
+        if self.num_threads > 1:
+            blast_cmd += ["-num_threads", str(self.num_threads)]
+        return blast_cmd
+
+    def split_records(self, records):
+        """把(id, sequence)记录按顺序切分为连续的分片，保证合并后仍是输入顺序"""
+        shard_count = min(self.shards, len(records))
+        if shard_count == 0:
+            return []
+        base, extra = divmod(len(records), shard_count)
+        shards = []
+        start = 0
+        for index in range(shard_count):
+            end = start + base + (1 if index < extra else 0)
+            shards.append(records[start:end])
+            start = end
+        return shards
+
+    def run(self, records, output_file, log_callback=None, result_callback=None, job=None, checkpoint_dir=None,
+            resume=False):
+        """运行BLAST并把各分片结果按顺序写入output_file，返回(是否成功, 错误信息)
+
+        每个查询的命中一旦从blastn的标准输出解析完成，就调用result_callback(查询ID, 命中列表)，
+        下游处理无需等待整个搜索结束。设置了cache时，命中缓存的序列直接从缓存取结果，
+        只有未命中的序列交给blastn，正常结束的分片的新结果写回缓存。设置了profiler时计量各阶段并在输出文件旁保存结果。
+        传入job（JobControl）时按查询计量进度；暂停时停止读取标准输出，blastn写满管道后随之阻塞；
+        取消时终止所有blastn进程并返回(False, 取消信息)。
+        指定checkpoint_dir时分片的查询文件和输出保存在该目录（而不是临时目录），失败或取消后保留；
+        resume为True时从已有分片输出中恢复完整的查询，只搜索其余查询。成功完成后删除该目录。
+        检查点目录无法使用（不是检查点目录，或续跑时与当前任务不一致）时返回(False, 原因)，不删除其中的文件。
+        """
+        profiler = self.profiler
+        checkpoint = None
+        if checkpoint_dir:
+            try:
+                checkpoint = RunCheckpoint(checkpoint_dir, 'blast', self.checkpoint_fingerprint(records), resume)
+            except ValueError as e:
+                return False, str(e)
+            work_dir = checkpoint.work_dir
+        else:
+            work_dir = tempfile.mkdtemp(prefix="blast_shards_")
+        processes = []
+        readers = []
+        # 按顺序合并的分片输出：先是从检查点恢复的分片，再是本次运行的分片
+        outputs = []
+        callback_lock = threading.Lock()
+        cached = []
+        sequences = {}
+        total = len(records)
+        # 输入记录的查询ID顺序，合并输出时按此排列（records随续跑和缓存过滤缩减）
+        order = [str(seq_id).split()[0] for seq_id, _ in records]
+        resumed = 0
+        succeeded = False
+
+        if profiler is not None:
+            profiler.count('blast_queries', len(records))
+        if checkpoint is not None:
+            if checkpoint.discarded and log_callback:
+                log_callback(f"未指定续跑，已丢弃上次中断留下的BLAST检查点: {checkpoint_dir}")
+            if checkpoint.resumed:
+                records, resumed = self.resume_shards(checkpoint, records, outputs, result_callback, log_callback)
+        if job is not None:
+            job.start(total, '条序列', done=resumed)
+        if self.cache is not None:
+            fingerprint = BlastHitCache.db_fingerprint(self.db_path)
+            params = self.cache_params()
+            self.cache.reset_stats()
+            with profile_stage(profiler, 'blast.cache_lookup'):
+                found = self.cache.lookup([sequence for _, sequence in records], fingerprint, params)
+            misses = []
+            for seq_id, sequence in records:
+                hits = found.get(sequence.upper().strip())
+                if hits is None:
+                    misses.append((seq_id, sequence))
+                    # blastn以定义行的第一个词作为查询ID
+                    sequences[str(seq_id).split()[0]] = sequence
+                else:
+                    cached.append((str(seq_id).split()[0], hits))
+            records = misses
+            if profiler is not None:
+                profiler.count('blast_cache_hits', len(cached))
+            if log_callback:
+                log_callback(f"BLAST缓存命中 {len(cached)} 条，需要搜索 {len(records)} 条")
+
+        # 每个分片解析出的(序列, 命中)、是否读到"# BLAST processed"结束行、标准输出是否已读完
+        shard_results = {}
+
+        def pump(process, shard_output):
+            # 边读取标准输出边写入分片文件并解析
+            result = shard_results[shard_output] = {'parsed': [], 'finished': False, 'eof': False}
+            with open(shard_output, 'w') as f:
+                def tee():
+                    for line in process.stdout:
+                        if line.startswith('# BLAST processed'):
+                            result['finished'] = True
+                        f.write(line)
+                        yield line
+                    result['eof'] = True
+                for query, hits in iter_blast_results(tee()):
+                    # 只交付其后已出现下一个"# Query"/"# BLAST"行的查询块：读到输出末尾才产出的查询块
+                    # 是进程出错、崩溃或被终止时中断的，命中可能不完整；取消后也不再交付任何结果
+                    if result['eof'] or (job is not None and job.cancelled):
+                        return
+                    if checkpoint is not None:
+                        # 每个查询块写完即落盘，进程被强行终止时最多损失正在输出的查询
+                        f.flush()
+                    if self.cache is not None and query in sequences:
+                        result['parsed'].append((sequences[query], hits))
+                    if result_callback:
+                        with callback_lock:
+                            result_callback(query, hits)
+                    if job is not None:
+                        with callback_lock:
+                            job.advance()
+                        # 以查询为块边界：暂停时不再读取，取消后不再解析剩余输出
+                        if not job.checkpoint():
+                            return
+
+        def cache_finished_shards():
+            # 只缓存返回码为0且输出了结束行的分片：出错、崩溃或被终止的分片末尾的查询可能不完整
+            if self.cache is None:
+                return
+            for process, shard_output, _ in processes:
+                result = shard_results.get(shard_output)
+                if result is not None and result['finished'] and process.poll() == 0:
+                    for sequence, hits in result['parsed']:
+                        self.cache.put(sequence, fingerprint, params, self.db_path, hits)
+
+        search_start = time.perf_counter()
+        try:
+            if result_callback:
+                for query, hits in cached:
+                    result_callback(query, hits)
+            if job is not None:
+                job.advance(len(cached))
+
+            shard_base = len(checkpoint.state.get('shards', [])) if checkpoint is not None else 0
+            for index, shard in enumerate(self.split_records(records), shard_base):
+                if job is not None and job.cancelled:
+                    break
+                query_file = os.path.join(work_dir, f"shard_{index}.fasta")
+                with open(query_file, 'w') as f:
+                    for seq_id, sequence in shard:
+                        f.write(f">{seq_id}\n{sequence}\n")
+
+                shard_output = os.path.join(work_dir, f"shard_{index}.txt")
+                outputs.append(shard_output)
+                if checkpoint is not None:
+                    # 先登记分片再启动进程，中断后续跑时能找到它的输出
+                    checkpoint.state.setdefault('shards', []).append(os.path.basename(shard_output))
+                    checkpoint.save(f"共 {total} 条查询，已启动 {len(checkpoint.state['shards'])} 个分片")
+                blast_cmd = self.build_command(query_file)
+                if log_callback:
+                    log_callback(f"运行BLAST命令（分片 {index + 1}，{len(shard)} 条序列）: {' '.join(blast_cmd)}")
+
+                # stderr写入文件而不是管道，避免并发进程写满管道缓冲区而阻塞
+                stderr_file = open(os.path.join(work_dir, f"shard_{index}.err"), 'w+')
+                try:
+                    process = subprocess.Popen(
+                        blast_cmd,
+                        stdout=subprocess.PIPE,
+                        stderr=stderr_file,
+                        universal_newlines=True
+                    )
+                except Exception:
+                    stderr_file.close()
+                    raise
+                processes.append((process, shard_output, stderr_file))
+                if job is not None:
+                    job.register_process(process)
+
+                reader = threading.Thread(target=pump, args=(process, shard_output))
+                reader.daemon = True
+                reader.start()
+                readers.append(reader)
+
+            # 等待所有分片完成
+            for reader in readers:
+                reader.join()
+            if job is not None and job.cancelled:
+                cache_finished_shards()
+                if log_callback:
+                    log_callback("BLAST被用户取消，已终止blastn进程")
+                return False, "BLAST被用户取消"
+            errors = []
+            for index, (process, _, stderr_file) in enumerate(processes):
+                process.wait()
+                if process.returncode != 0:
+                    stderr_file.seek(0)
+                    errors.append(f"分片 {index + 1}（返回码 {process.returncode}）: {stderr_file.read().strip()}")
+            cache_finished_shards()
+            if profiler is not None:
+                profiler.add('blast.search', time.perf_counter() - search_start)
+            if errors:
+                return False, "\n".join(errors)
+
+            # 缓存命中、从检查点恢复和本次搜索的查询块按输入记录的顺序写出
+            with profile_stage(profiler, 'blast.write_output'):
+                if cached or len(outputs) > 1:
+                    self.write_ordered_output(output_file, order, cached, outputs)
+                elif outputs:
+                    # 只有一个blastn输出时原样复制
+                    shutil.copyfile(outputs[0], output_file)
+                else:
+                    open(output_file, 'w').close()
+            if profiler is not None:
+                profiler.publish(output_file, log_callback)
+            if job is not None:
+                job.finish(job.total)
+            succeeded = True
+            return True, ""
+        finally:
+            for process, _, stderr_file in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                stderr_file.close()
+                if job is not None:
+                    job.unregister_process(process)
+            if checkpoint is None or succeeded:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            elif log_callback:
+                log_callback(f"BLAST进度已保存在检查点 {work_dir}，续跑时跳过已完成的查询")
+            if self.cache is not None:
+                self.cache.flush()
+                if log_callback:
+                    log_callback(self.cache.report())
+
+    def checkpoint_fingerprint(self, records):
+        """断点续跑的任务指纹：BLAST程序、数据库、参数和全部查询记录"""
+        digest = hashlib.sha1()
+        for seq_id, sequence in records:
+            digest.update(f"{seq_id}\t{sequence}\n".encode('utf-8'))
+        return {'program': os.path.abspath(self.blast_path), 'db': BlastHitCache.db_fingerprint(self.db_path),
+                'params': self.cache_params(), 'records': digest.hexdigest(), 'count': len(records)}
+
+    def resume_shards(self, checkpoint, records, outputs, result_callback=None, log_callback=None):
+        """从检查点中的分片输出恢复已完成的查询，分片路径加入outputs，返回(剩余记录, 已完成查询数)"""
+        done = set()
+        for name in checkpoint.state.get('shards', []):
+            path = checkpoint.path(name)
+            if not os.path.exists(path):
+                continue
+            self.truncate_incomplete(path)
+            with open(path, 'r') as f:
+                for query, hits in iter_blast_results(f):
+                    done.add(query)
+                    if result_callback:
+                        result_callback(query, hits)
+            outputs.append(path)
+        remaining = [record for record in records if str(record[0]).split()[0] not in done]
+        if log_callback:
+            log_callback(f"从断点继续BLAST: {len(records) - len(remaining)} 条查询已完成，剩余 {len(remaining)} 条")
+        return remaining, len(records) - len(remaining)
+
+    @staticmethod
+    def truncate_incomplete(path):
+        """截掉中断的分片输出末尾不完整的查询块：其后已出现下一个"# BLAST"行的查询块才是完整的"""
+        complete = 0
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.startswith(b'# BLAST'):
+                    complete = offset
+                offset += len(line)
+                if line.startswith(b'# BLAST processed'):
+                    complete = offset
+        if complete < offset:
+            with open(path, 'r+b') as f:
+                f.truncate(complete)
+
+    def write_ordered_output(self, output_file, order, cached, outputs):
+        """把缓存命中和各分片输出的查询块按输入记录的顺序写入output_file，末尾只写一个结束行
+
+        order是输入记录的查询ID序列；缓存结果和每个分片输出内部都已按记录顺序排列，
+        按记录下标多路归并，每个来源同时只读入一个查询块。
+        """
+        slots = {}
+        for index, query in enumerate(order):
+            slots.setdefault(query, deque()).append(index)
+
+        def keyed(blocks):
+            for query, text in blocks:
+                positions = slots.get(query)
+                # 重复的查询ID依次占用各自的记录位置，不在输入中的查询排在最后
+                yield (positions.popleft() if positions else len(order)), text
+
+        files = [open(path, 'r') for path in outputs]
+        try:
+            sources = [keyed((query, format_outfmt7_block(query, hits, self.db_path, "cached"))
+                             for query, hits in cached)]
+            sources += [keyed(iter_report_blocks(f)) for f in files]
+            count = 0
+            with open(output_file, 'w') as out:
+                for _, text in heapq.merge(*sources, key=lambda item: item[0]):
+                    out.write(text)
+                    count += 1
+                out.write(f"# BLAST processed {count} queries\n")
+        finally:
+            for f in files:
+                f.close()
+
+
+def format_outfmt7_block(query, hits, database, source):
+    """一个查询的outfmt 7文本块，带自己的"# BLASTN"表头，可以与blastn输出的查询块任意拼接"""
+    lines = [f"# BLASTN ({source})", f"# Query: {query}", f"# Database: {database}", f"# {len(hits)} hits found"]
+    lines += ['\t'.join([query] + hit['fields']) for hit in hits]
+    return '\n'.join(lines) + '\n'
+
+
+def write_outfmt7(out, results, database, source):
+    """把[(查询ID, 命中列表)]按blastn outfmt 7格式写出，source标明结果来源（如cached）"""
+    out.write(f"# BLASTN ({source})\n")
+    for query, hits in results:
+        out.write(f"# Query: {query}\n")
+        out.write(f"# Database: {database}\n")
+        out.write(f"# {len(hits)} hits found\n")
+        for hit in hits:
+            out.write('\t'.join([query] + hit['fields']) + '\n')
+    out.write(f"# BLAST processed {len(results)} queries ({source})\n")
+
+
+def apply_specificity(probe, hits):
+    """根据一个查询的命中更新探针特异性，并保存前10个命中的详细信息"""
+    probe['specificity'] = blast_specificity(hits)
+    if hits:
+        probe['blast_hits'] = hits[:10]
+
+
+def merge_blast_results(tm_results_file, blast_results_file, output_file, long_output_file=None):
+    """合并Tm分析结果和BLAST结果（只保留前5个命中的详细信息，并统计命中总数）
+
+    命中先整理为长表（每行一个命中，带排名），再透视为前5个命中的宽表列，
+    通过一次按id的merge合并到Tm结果。指定long_output_file时同时输出全部命中的长表。
+    """
+    # 读取Tm分析结果
+    tm_df = pd.read_csv(tm_results_file)
+
+    # 流式解析BLAST结果文件，宽表只需要每个查询的前5个命中和命中总数
+    top_hits = {}
+    hit_counts = {}  # 存储每个查询的命中总数
+    long_rows = []
+    long_written = False
+
+    with open(blast_results_file, 'r') as f:
+        for query, hits in iter_blast_results(f):
+            if not hits:
+                continue
+            hit_counts[query] = len(hits)
+            # 数值列保留BLAST报告中的原始文本
+            rows = [(query, rank, hit['subject'], hit['fields'][1], hit['fields'][9], hit['fields'][10])
+                    for rank, hit in enumerate(hits, 1)]
+            # 同一查询重复出现时以最后一次为准
+            top_hits[query] = rows[:5]
+            if long_output_file:
+                long_rows.extend(rows)
+            # 长表分批写出，避免全部命中驻留内存
+            if long_output_file and len(long_rows) >= 100000:
+                write_blast_long_table(long_rows, long_output_file, append=long_written)
+                long_rows = []
+                long_written = True
+
+    if long_output_file:
+        write_blast_long_table(long_rows, long_output_file, append=long_written)
+
+    # 长表透视为宽表：每个查询一行，前5个命中各4列
+    hits_df = pd.DataFrame([row for rows in top_hits.values() for row in rows],
+                           columns=['id', 'rank', 'subject', 'identity', 'evalue', 'bitscore'])
+    wide = hits_df.pivot(index='id', columns='rank', values=['subject', 'identity', 'evalue', 'bitscore'])
+    names = {'subject': 'blast_hit', 'identity': 'blast_identity',
+             'evalue': 'blast_evalue', 'bitscore': 'blast_bitscore'}
+    columns = [(field, rank) for rank in range(1, 6) for field in names]
+    wide = wide.reindex(columns=pd.MultiIndex.from_tuples(columns))
+    wide.columns = [f"{names[field]}_{rank}" for field, rank in columns]
+    wide.insert(0, 'blast_hits_count', pd.Series(hit_counts))
+    wide = wide.reset_index()
+
+    # BLAST报告中的查询ID是文本，按文本形式的id合并
+    tm_df['id'] = tm_df['id'].astype(str)
+    merged = tm_df.merge(wide, on='id', how='left')
+    merged['blast_hits_count'] = merged['blast_hits_count'].fillna(0).astype(int)
+
+    # 保存合并后的结果
+    merged.to_csv(output_file, index=False)
+
+
+def write_blast_long_table(rows, output_file, append=False):
+    """写出长格式BLAST命中表（id, rank, subject, identity, evalue, bitscore）"""
+    long_df = pd.DataFrame(rows, columns=['id', 'rank', 'subject', 'identity', 'evalue', 'bitscore'])
+    long_df.to_csv(output_file, mode='a' if append else 'w', header=not append, index=False)
+
+
+def blast_db_exists(db_path):
+    """检查BLAST数据库文件是否存在（数据库路径为文件名前缀）"""
+    db_name = os.path.basename(db_path)
+    db_dir = os.path.dirname(db_path) or '.'
+    if not os.path.isdir(db_dir):
+        return False
+    return any(f.startswith(db_name) for f in os.listdir(db_dir))
+
+
+###########################################################################
+# 打包序列库模块 - 大规模目标序列与参考转录组
+###########################################################################
+class PackedSequenceStore:
+    """2-bit打包的序列库：每个碱基占2位，以内存映射方式打开，A/C/G/T(U)以外的字符记录在N掩码中
+
+    packed.bin按记录顺序连续存放全部碱基（每字节4个碱基，高位在前），nmask.npy逐段记录掩码字符的
+    [起点, 终点, 字符]，records.npy为每条记录的[起点, 长度, 是否为RNA]。RNA记录以U为主字母，
+    同一记录中少数的T（或DNA记录中的U）同样记入掩码，解码结果与写入的（大写）序列逐字一致。
+    """
+
+    VERSION = 1
+    SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+    DNA_BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+    RNA_BASES = np.frombuffer(b'ACGU', dtype=np.uint8)
+    # 每个字节对应的4个碱基文本，短窗口解码时直接查表拼接
+    DNA_BYTE_TEXT = [''.join('ACGT'[(value >> shift) & 3] for shift in (6, 4, 2, 0)) for value in range(256)]
+    RNA_BYTE_TEXT = [text.replace('T', 'U') for text in DNA_BYTE_TEXT]
+    TEXT_TABLE_LIMIT = 4096
+
+    _open_stores = {}
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'store.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != self.VERSION:
+            raise ValueError(f"序列库版本不匹配，请重新构建: {store_dir}")
+        self.total_length = self.meta['total_length']
+        with open(os.path.join(store_dir, 'packed.bin'), 'rb') as f:
+            # 长度为0的文件不能映射
+            size = os.fstat(f.fileno()).st_size
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.packed = np.frombuffer(self._buffer, dtype=np.uint8)
+        self.mask = np.load(os.path.join(store_dir, 'nmask.npy'))
+        self.mask_starts = np.ascontiguousarray(self.mask[:, 0])
+        self.mask_ends = np.ascontiguousarray(self.mask[:, 1])
+        self.mask_chars = self.mask[:, 2].astype(np.uint8)
+        self._mask_bounds = None
+        self.records = np.load(os.path.join(store_dir, 'records.npy'))
+        self.record_starts = np.ascontiguousarray(self.records[:, 0])
+        self.record_ends = self.record_starts + self.records[:, 1]
+        with open(os.path.join(store_dir, 'names.txt'), 'r', encoding='utf-8') as f:
+            self.names = f.read().splitlines()
+        self._name_index = None
+        self.char_codes = WindowScoreEngine.code_lookup()
+
+    @classmethod
+    def open_cached(cls, store_dir):
+        """打开序列库并在本进程内复用，重新写入后自动重新打开"""
+        key = os.path.abspath(store_dir)
+        stamp = os.stat(os.path.join(key, 'store.json')).st_mtime_ns
+        entry = cls._open_stores.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, cls(key))
+            cls._open_stores[key] = entry
+        return entry[1]
+
+    @staticmethod
+    def exists(store_dir):
+        return os.path.exists(os.path.join(store_dir, 'store.json'))
+
+    @staticmethod
+    def base_lookup(alphabet):
+        """主字母表中的字符编码为0-3，其余字符为255（写入掩码）"""
+        lookup = np.full(256, 255, dtype=np.uint8)
+        for code, base in enumerate(alphabet):
+            lookup[ord(base)] = code
+        return lookup
+
+    @classmethod
+    def pack_codes(cls, codes):
+        """把长度为4的倍数的0-3编码打包为字节"""
+        groups = codes.reshape(-1, 4)
+        return (groups[:, 0] << 6) | (groups[:, 1] << 4) | (groups[:, 2] << 2) | groups[:, 3]
+
+    @staticmethod
+    def mask_runs(raw, masked):
+        """把掩码位置合并为连续相同字符的区段，返回[[起点, 终点, 字符]]"""
+        index = np.flatnonzero(masked)
+        if len(index) == 0:
+            return np.zeros((0, 3), dtype=np.int64)
+        new_run = np.ones(len(index), dtype=bool)
+        new_run[1:] = (np.diff(index) != 1) | (raw[index[1:]] != raw[index[:-1]])
+        first = np.flatnonzero(new_run)
+        last = np.append(first[1:] - 1, len(index) - 1)
+        return np.column_stack((index[first], index[last] + 1, raw[index[first]])).astype(np.int64)
+
+    @classmethod
+    def write(cls, store_dir, records, log_callback=None, cancel_flag=None, source=None):
+        """把(名称, 序列)记录流式写入序列库目录，返回记录数；取消时返回None"""
+        os.makedirs(store_dir, exist_ok=True)
+        total = 0
+        carry = np.zeros(0, dtype=np.uint8)
+        entries = []
+        names = []
+        masks = []
+        with open(os.path.join(store_dir, 'packed.bin'), 'wb') as out:
+            for name, sequence in records:
+                if cancel_flag and cancel_flag.is_set():
+                    return None
+                sequence = sequence.upper()
+                rna = sequence.count('U') > sequence.count('T')
+                raw = np.frombuffer(sequence.encode('ascii', errors='replace'), dtype=np.uint8)
+                codes = cls.base_lookup('ACGU' if rna else 'ACGT')[raw]
+                masked = codes > 3
+                codes[masked] = 0
+                runs = cls.mask_runs(raw, masked)
+                runs[:, :2] += total
+                masks.append(runs)
+                entries.append((total, len(raw), int(rna)))
+                names.append(name)
+                total += len(raw)
+
+                # 不足4个碱基的尾部留到下一条记录一起打包，记录之间不留空隙
+                carry = np.concatenate((carry, codes))
+                full = len(carry) - len(carry) % 4
+                out.write(cls.pack_codes(carry[:full]).tobytes())
+                carry = carry[full:]
+                if log_callback and len(names) % 10000 == 0:
+                    log_callback(f"已读取 {len(names)} 条记录，{total} 个碱基")
+            if len(carry):
+                padded = np.concatenate((carry, np.zeros(4 - len(carry), dtype=np.uint8)))
+                out.write(cls.pack_codes(padded).tobytes())
+
+        np.save(os.path.join(store_dir, 'nmask.npy'),
+                np.concatenate(masks) if masks else np.zeros((0, 3), dtype=np.int64))
+        np.save(os.path.join(store_dir, 'records.npy'), np.array(entries, dtype=np.int64).reshape(-1, 3))
+        with open(os.path.join(store_dir, 'names.txt'), 'w', encoding='utf-8') as f:
+            f.write(''.join(name + '\n' for name in names))
+        # store.json最后写入，存在即表示序列库完整
+        meta = {'version': cls.VERSION, 'records': len(names), 'total_length': total}
+        if source is not None:
+            stat = os.stat(source)
+            meta.update(source=os.path.abspath(source), source_size=stat.st_size,
+                        source_mtime_ns=stat.st_mtime_ns)
+        with open(os.path.join(store_dir, 'store.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return len(names)
+
+    @classmethod
+    def from_fasta(cls, fasta_path, store_dir, log_callback=None, cancel_flag=None):
+        """流式读取FASTA（支持gzip）写入序列库，返回记录数；取消时返回None"""
+        count = cls.write(store_dir, iter_fasta(fasta_path), log_callback, cancel_flag, source=fasta_path)
+        if count == 0:
+            raise ValueError(f"FASTA文件中没有序列: {fasta_path}")
+        return count
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        """按顺序产出(记录名, 序列视图)"""
+        for index, name in enumerate(self.names):
+            yield name, self.record(index)
+
+    def record(self, key):
+        """按下标或记录名取得整条记录的视图"""
+        if isinstance(key, str):
+            if self._name_index is None:
+                self._name_index = {name: index for index, name in enumerate(self.names)}
+            key = self._name_index[key]
+        start, length, rna = self.records[key].tolist()
+        return PackedSequence(self, start, length, bool(rna))
+
+    def mask_positions(self, start, end):
+        """返回[start, end)内掩码字符的位置和字符"""
+        low = int(np.searchsorted(self.mask_ends, start, side='right'))
+        high = int(np.searchsorted(self.mask_starts, end, side='left'))
+        if high <= low:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        run_starts = np.maximum(self.mask_starts[low:high], start)
+        lengths = np.minimum(self.mask_ends[low:high], end) - run_starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(run_starts, lengths) + offsets, np.repeat(self.mask_chars[low:high], lengths)
+
+    def decode(self, start, end, base_values, char_values):
+        """解码[start, end)：2-bit碱基查base_values，掩码字符查char_values，只读取覆盖该区间的字节"""
+        first = start >> 2
+        packed = self.packed[first:(end + 3) >> 2]
+        bases = ((packed[:, None] >> self.SHIFTS) & 3).reshape(-1)
+        offset = start - (first << 2)
+        values = base_values[bases[offset:offset + end - start]]
+        positions, chars = self.mask_positions(start, end)
+        values[positions - start] = char_values[chars]
+        return values
+
+    def codes(self, start, end):
+        """[start, end)的碱基编码，与WindowScoreEngine.encode_sequence一致（U与T同码，N为4，其他字符为5）"""
+        return self.decode(start, end, np.arange(4, dtype=np.uint8), self.char_codes)
+
+    def ascii(self, start, end, rna=False):
+        """[start, end)的ASCII字节数组"""
+        return self.decode(start, end, self.RNA_BASES if rna else self.DNA_BASES, np.arange(256, dtype=np.uint8))
+
+    def text(self, start, end, rna=False):
+        """解码[start, end)为字符串；短窗口查表拼接，避免逐窗口的NumPy开销"""
+        if end - start > self.TEXT_TABLE_LIMIT:
+            return self.ascii(start, end, rna).tobytes().decode('ascii')
+        first = start >> 2
+        table = self.RNA_BYTE_TEXT if rna else self.DNA_BYTE_TEXT
+        offset = start - (first << 2)
+        text = ''.join([table[value] for value in self._buffer[first:(end + 3) >> 2]])[offset:offset + end - start]
+        if self._mask_bounds is None:
+            self._mask_bounds = (self.mask_starts.tolist(), self.mask_ends.tolist())
+        mask_starts, mask_ends = self._mask_bounds
+        low = bisect.bisect_right(mask_ends, start)
+        high = bisect.bisect_left(mask_starts, end)
+        if high > low:
+            chars = list(text)
+            for run_start, run_end, char in self.mask[low:high].tolist():
+                for position in range(max(run_start, start), min(run_end, end)):
+                    chars[position - start] = chr(char)
+            text = ''.join(chars)
+        return text
+
+    def gather(self, starts, length):
+        """一次取出多个等长窗口的碱基编码（二维数组），用于批量比对"""
+        positions = starts[:, None] + np.arange(length)
+        codes = ((self.packed[positions >> 2] >> (6 - 2 * (positions & 3))) & 3).astype(np.uint8)
+        run_count = len(self.mask_ends)
+        if run_count == 0:
+            return codes
+        # 只逐碱基核对与掩码区段重叠的窗口
+        run = np.minimum(np.searchsorted(self.mask_ends, starts, side='right'), run_count - 1)
+        rows = np.flatnonzero((self.mask_ends[run] > starts) & (self.mask_starts[run] < starts + length))
+        if len(rows):
+            overlapping = positions[rows]
+            run = np.searchsorted(self.mask_ends, overlapping, side='right')
+            masked = run < run_count
+            masked[masked] = self.mask_starts[run[masked]] <= overlapping[masked]
+            block = codes[rows]
+            block[masked] = self.char_codes[self.mask_chars[run[masked]]]
+            codes[rows] = block
+        return codes
+
+
+class PackedSequence:
+    """序列库中一段序列的只读视图：切片和反向互补只改变坐标与链方向，不复制碱基数据
+
+    str()时才解码为字符串；codes()/ascii()只解码视图覆盖的字节。跨进程传递时只序列化序列库路径和坐标。
+    """
+
+    def __init__(self, store, start, length, rna=False, reverse=False):
+        self.store = store
+        self.start = start
+        self.length = length
+        self.rna = rna
+        self.reverse = reverse
+
+    @classmethod
+    def reopen(cls, store_dir, start, length, rna, reverse):
+        return cls(PackedSequenceStore.open_cached(store_dir), start, length, rna, reverse)
+
+    def __reduce__(self):
+        return (PackedSequence.reopen,
+                (os.path.abspath(self.store.store_dir), self.start, self.length, self.rna, self.reverse))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            begin, stop, step = key.indices(self.length)
+            if step != 1:
+                raise ValueError("序列视图只支持步长为1的切片")
+            stop = max(stop, begin)
+            # 反向互补视图的下标从原序列末端向前数
+            start = self.start + self.length - stop if self.reverse else self.start + begin
+            return PackedSequence(self.store, start, stop - begin, self.rna, self.reverse)
+        index = key + self.length if key < 0 else key
+        if not 0 <= index < self.length:
+            raise IndexError("序列视图下标越界")
+        return str(self[index:index + 1])
+
+    def __str__(self):
+        text = self.store.text(self.start, self.start + self.length, self.rna)
+        if self.reverse:
+            return text.translate(RNA_COMPLEMENT if self.rna else DNA_COMPLEMENT)[::-1]
+        return text
+
+    def __repr__(self):
+        strand = '-' if self.reverse else '+'
+        return f"PackedSequence({self.store.store_dir!r}, {self.start}, {self.length}, {strand})"
+
+    def __eq__(self, other):
+        if not isinstance(other, PackedSequence):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def key(self):
+        return os.path.abspath(self.store.store_dir), self.start, self.length, self.reverse
+
+    def reverse_complement(self):
+        """反向互补视图（RNA记录按RNA互补），不复制数据"""
+        return PackedSequence(self.store, self.start, self.length, self.rna, not self.reverse)
+
+    def codes(self):
+        """碱基编码数组，与对str(self)调用WindowScoreEngine.encode_sequence的结果一致"""
+        codes = self.store.codes(self.start, self.start + self.length)
+        if self.reverse:
+            codes = codes[::-1]
+            codes = np.where(codes < WindowScoreEngine.N_CODE, 3 - codes, codes).astype(np.uint8)
+        return codes
+
+    def ascii(self):
+        """ASCII字节数组，与str(self)逐字一致"""
+        values = self.store.ascii(self.start, self.start + self.length, self.rna)
+        if self.reverse:
+            table = np.arange(256, dtype=np.uint8)
+            for source, target in (RNA_COMPLEMENT if self.rna else DNA_COMPLEMENT).items():
+                table[source] = target
+            values = table[values[::-1]]
+        return values
+
+    def extra_symbols(self):
+        """视图中A/C/G/T(U)主字母以外的字符集合，只查N掩码，不解码碱基"""
+        _, chars = self.store.mask_positions(self.start, self.start + self.length)
+        symbols = {chr(char) for char in np.unique(chars).tolist()}
+        if self.reverse:
+            table = RNA_COMPLEMENT if self.rna else DNA_COMPLEMENT
+            symbols = {symbol.translate(table) for symbol in symbols}
+        return symbols
+
+
+###########################################################################
+# 本地特异性索引模块 - 转录组k-mer脱靶筛查
+###########################################################################
+class KmerOffTargetIndex:
+    """转录组k-mer索引：从FASTA构建一次并保存到目录，之后以内存映射方式打开，毫秒级筛查探针的近完全匹配
+
+    目录本身是一个PackedSequenceStore（2-bit打包的全部记录），positions.npy为按k-mer排序的出现位置，
+    offsets.npy为每个k-mer在positions中的起止下标。查询按鸽巢原理：最多N个错配的探针分成N+1段，
+    至少有一段完全匹配，以每段开头的k-mer为种子取出候选位置，再逐碱基核对错配数。与blastn一样搜索正负两条链。
+    """
+
+    VERSION = 2
+    # 按megablast默认打分（匹配+1，错配-2）的Karlin-Altschul参数估算bit score和E值，使blast_specificity的分级可比
+    LAMBDA = 1.28
+    KAPPA = 0.46
+    BUILD_BLOCK = 1 << 24
+    VERIFY_BLOCK = 1 << 16
+
+    _open_indexes = {}
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != self.VERSION:
+            raise ValueError(f"索引版本不匹配，请重新构建: {index_dir}")
+        self.k = self.meta['k']
+        self.db_length = self.meta['total_length']
+        self.store = PackedSequenceStore(index_dir)
+        self.offsets = np.load(os.path.join(index_dir, 'offsets.npy'), mmap_mode='r')
+        self.positions = np.load(os.path.join(index_dir, 'positions.npy'), mmap_mode='r')
+        self.record_starts = self.store.record_starts
+        self.names = self.store.names
+
+    @classmethod
+    def open_cached(cls, index_dir):
+        """打开索引并在本进程内复用，索引重建后自动重新打开"""
+        key = os.path.abspath(index_dir)
+        stamp = os.stat(os.path.join(key, 'meta.json')).st_mtime_ns
+        entry = cls._open_indexes.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, cls(key))
+            cls._open_indexes[key] = entry
+        return entry[1]
+
+    @staticmethod
+    def exists(index_dir):
+        return os.path.exists(os.path.join(index_dir, 'meta.json'))
+
+    @classmethod
+    def encode(cls, sequence):
+        """编码为0-3的碱基码，N和其他字符统一为4（也接受序列库视图）"""
+        if not isinstance(sequence, PackedSequence):
+            sequence = sequence.upper()
+        codes = WindowScoreEngine.encode_sequence(sequence)
+        codes[codes > WindowScoreEngine.N_CODE] = WindowScoreEngine.N_CODE
+        return codes
+
+    @staticmethod
+    def block_kmers(store, start, end, k):
+        """返回起点在[start, end)内、不含N且不跨越记录边界的k-mer编码及起点"""
+        chunk = store.codes(start, min(end + k - 1, store.total_length))
+        count = len(chunk) - k + 1
+        if count <= 0:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+        values = np.zeros(count, dtype=np.uint32)
+        invalid = np.zeros(count, dtype=bool)
+        for offset in range(k):
+            part = chunk[offset:offset + count]
+            invalid |= part > 3
+            values = (values << 2) | part.astype(np.uint32)
+        starts = np.arange(start, start + count, dtype=np.int64)
+        record = np.searchsorted(store.record_starts, starts, side='right') - 1
+        invalid |= starts + k > store.record_ends[record]
+        keep = ~invalid
+        return values[keep], starts[keep]
+
+    @classmethod
+    def build(cls, fasta_path, index_dir, k=10, progress_callback=None, log_callback=None, cancel_flag=None):
+        """流式读取转录组FASTA（支持gzip）构建索引，返回记录数；取消时返回None
+
+        序列先写入2-bit序列库，k-mer表再用两遍计数排序写入内存映射文件，
+        除输出文件外内存占用只与4^k和分块大小有关。
+        """
+        if not 4 <= k <= 13:
+            raise ValueError("k-mer长度需在4到13之间")
+        if log_callback:
+            log_callback(f"构建特异性索引: {fasta_path}（k={k}）")
+        # 旧索引的meta.json先删除，构建中断时不会被当作完整索引打开
+        if cls.exists(index_dir):
+            os.remove(os.path.join(index_dir, 'meta.json'))
+        record_count = PackedSequenceStore.from_fasta(fasta_path, index_dir, log_callback, cancel_flag)
+        if record_count is None:
+            return None
+
+        store = PackedSequenceStore(index_dir)
+        total = store.total_length
+        bucket_count = 4 ** k
+        blocks = range(0, total, cls.BUILD_BLOCK)
+
+        # 第一遍：统计每个k-mer的出现次数
+        counts = np.zeros(bucket_count, dtype=np.int64)
+        for block_start in blocks:
+            if cancel_flag and cancel_flag.is_set():
+                return None
+            values, _ = cls.block_kmers(store, block_start, block_start + cls.BUILD_BLOCK, k)
+            counts += np.bincount(values, minlength=bucket_count)
+        offsets = np.zeros(bucket_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        del counts
+
+        # 第二遍：按k-mer把起点写入各自的区段，块内稳定排序保证区段内起点递增
+        position_dtype = np.uint32 if total < 2 ** 32 else np.uint64
+        kmer_total = int(offsets[-1])
+        positions_path = os.path.join(index_dir, 'positions.npy')
+        if kmer_total == 0:
+            np.save(positions_path, np.zeros(0, dtype=position_dtype))
+        else:
+            positions = np.lib.format.open_memmap(positions_path, mode='w+', dtype=position_dtype,
+                                                  shape=(kmer_total,))
+            fill = offsets[:-1].copy()
+            for block_number, block_start in enumerate(blocks):
+                if cancel_flag and cancel_flag.is_set():
+                    del positions
+                    return None
+                values, block_positions = cls.block_kmers(store, block_start, block_start + cls.BUILD_BLOCK, k)
+                order = np.argsort(values, kind='stable')
+                values = values[order]
+                rank = np.arange(len(values)) - np.searchsorted(values, values, side='left')
+                positions[fill[values] + rank] = block_positions[order]
+                fill += np.bincount(values, minlength=bucket_count)
+                if progress_callback:
+                    progress_callback(int((block_number + 1) / len(blocks) * 100))
+            positions.flush()
+            del positions
+
+        np.save(os.path.join(index_dir, 'offsets.npy'), offsets)
+        source = os.stat(fasta_path)
+        # meta.json最后写入，存在即表示索引完整
+        with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': cls.VERSION,
+                'k': k,
+                'records': record_count,
+                'total_length': total,
+                'kmers': kmer_total,
+                'source': os.path.abspath(fasta_path),
+                'source_size': source.st_size,
+                'source_mtime_ns': source.st_mtime_ns,
+            }, f, ensure_ascii=False, indent=2)
+        if log_callback:
+            log_callback(f"✅ 索引构建完成: {record_count} 条记录，{total} 个碱基，保存在: {index_dir}")
+        return record_count
+
+    def max_mismatches_for(self, length):
+        """长度为length的探针在本索引上能保证找全的最大错配数"""
+        return max(length // self.k - 1, 0)
+
+    def search(self, sequence, max_mismatches=1, max_hits=30):
+        """返回探针的命中列表（结构与parse_blast_hit相同），按错配数和记录位置排序，最多max_hits个"""
+        query = self.encode(sequence)
+        length = len(query)
+        if length < self.k or (query > 3).any():
+            return []
+        segment = length // (max_mismatches + 1)
+        if segment < self.k:
+            raise ValueError(f"{length} nt探针在k={self.k}的索引上最多允许 {self.max_mismatches_for(length)} 个错配")
+
+        found = []
+        for strand, pattern in (('plus', query), ('minus', (3 - query[::-1]).astype(np.uint8))):
+            candidates = []
+            for part in range(max_mismatches + 1):
+                offset = part * segment
+                value = 0
+                for code in pattern[offset:offset + self.k]:
+                    value = (value << 2) | int(code)
+                low, high = int(self.offsets[value]), int(self.offsets[value + 1])
+                if high > low:
+                    candidates.append(self.positions[low:high].astype(np.int64) - offset)
+            if not candidates:
+                continue
+            starts = np.unique(np.concatenate(candidates))
+            starts = starts[(starts >= 0) & (starts + length <= self.db_length)]
+            for block_start in range(0, len(starts), self.VERIFY_BLOCK):
+                block = starts[block_start:block_start + self.VERIFY_BLOCK]
+                # 直接从打包序列中取出候选窗口，命中不能跨越记录边界
+                windows = self.store.gather(block, length)
+                mismatches = (windows != pattern).sum(axis=1)
+                record = np.searchsorted(self.record_starts, block, side='right') - 1
+                keep = (mismatches <= max_mismatches) & (block + length <= self.store.record_ends[record])
+                found.extend(zip(mismatches[keep].tolist(), block[keep].tolist(), [strand] * int(keep.sum())))
+
+        found.sort(key=lambda hit: (hit[0], hit[1]))
+        return [self.make_hit(start, mismatches, strand, length) for mismatches, start, strand in found[:max_hits]]
+
+    def make_hit(self, start, mismatches, strand, length):
+        """把一个命中位置转换为outfmt 6字段（无空位比对），E值和bit score按megablast打分估算"""
+        record = int(np.searchsorted(self.record_starts, start, side='right')) - 1
+        offset = start - int(self.record_starts[record])
+        subject_start, subject_end = offset + 1, offset + length
+        if strand == 'minus':
+            subject_start, subject_end = subject_end, subject_start
+        raw_score = (length - mismatches) - 2 * mismatches
+        bitscore = (self.LAMBDA * raw_score - np.log(self.KAPPA)) / np.log(2)
+        evalue = length * self.db_length * 2.0 ** -bitscore
+        identity = (length - mismatches) / length * 100
+        fields = [self.names[record], f"{identity:.3f}", str(length), str(mismatches), '0', '1', str(length),
+                  str(subject_start), str(subject_end), f"{evalue:.2g}", f"{bitscore:.1f}"]
+        return parse_blast_hit([''] + fields)
+
+    def screen(self, records, max_mismatches=1, max_hits=30):
+        """逐条筛查(id, sequence)记录，产出(查询ID, 命中列表)"""
+        for seq_id, sequence in records:
+            yield str(seq_id).split()[0], self.search(sequence, max_mismatches, max_hits)
+
+    def write_report(self, results, output_file):
+        """把筛查结果写成outfmt 7报告，可直接交给merge_blast_results合并"""
+        with open(output_file, 'w') as out:
+            write_outfmt7(out, results, self.index_dir, "k-mer index")
+
+
+###########################################################################
+# RNA探针设计器类 - 新增功能模块
+###########################################################################
+class RNAProbeDesigner:
+    # 使用动态规划的放置策略（greedy为原有的贪心放置）
+    OPTIMAL_PLACEMENTS = ('max_count', 'tm_uniform')
+    # 放置循环每隔多少个候选窗口检查一次暂停/取消并更新进度
+    CHECKPOINT_INTERVAL = 256
+
+    def __init__(self, cache=None, profiler=None):
+        self.results = []
+        self._repeat_index = None
+        self.cache = cache
+        self.profiler = profiler
+    
+    def calculate_gc(self, sequence):
+        """计算序列的GC含量百分比"""
+        gc_count = sequence.count('G') + sequence.count('C')
+        return (gc_count / len(sequence)) * 100 if len(sequence) > 0 else 0
+
+    def calculate_tm(self, sequence, method='santalucia'):
+        """使用Bio.SeqUtils.MeltingTemp计算熔解温度"""
+        if not sequence or not isinstance(sequence, str):
+            return None
+            
+        sequence = sequence.upper().strip()
+        
+        # 替换U为T，因为MeltingTemp模块处理的是DNA序列
+        sequence = sequence.replace('U', 'T')
+        
+        if not self.check_sequence_validity(sequence):
+            return None
+
+        # 优先使用持久化缓存
+        if self.cache is not None:
+            cached = self.cache.get(sequence, method)
+            if cached is not None:
+                return cached[0]
+            
+        try:
+            if method == 'santalucia':
+                tm = mt.Tm_NN(bio_seq.Seq(sequence), nn_table=mt.DNA_NN1)
+            elif method == 'wallace':
+                tm = mt.Tm_Wallace(bio_seq.Seq(sequence))
+            elif method == 'gc':
+                tm = mt.Tm_GC(bio_seq.Seq(sequence))
+            elif method == 'nn':
+                tm = mt.Tm_NN(bio_seq.Seq(sequence))
+            else:
+                tm = mt.Tm_NN(bio_seq.Seq(sequence))
+            tm = round(tm, 2)
+        except Exception as e:
+            tm = None
+
+        if self.cache is not None:
+            self.cache.put(sequence, method, tm)
+        return tm
+    
+    def check_sequence_validity(self, sequence):
+        """检查序列有效性"""
+        if not sequence:
+            return False
+            
+        sequence = sequence.upper().strip()
+        # 替换U为T，因为MeltingTemp模块处理的是DNA序列
+        sequence = sequence.replace('U', 'T')
+        valid_chars = set('ATCGN')
+        return all(char in valid_chars for char in sequence) and len(sequence) > 0
+    
+    def calculate_complexity(self, sequence):
+        """计算序列复杂度（基于序列熵）"""
+        if len(sequence) <= 1:
+            return 0
+            
+        # 计算碱基频率
+        base_counts = Counter(sequence)
+        total = len(sequence)
+        
+        # 计算熵
+        entropy = 0
+        for count in base_counts.values():
+            p = count / total
+            entropy -= p * np.log2(p)
+            
+        # 标准化到0-2范围（最大熵为2，当4种碱基各占25%时）
+        return entropy / 2
+    
+    def has_repeats(self, sequence, target_sequence, min_repeat_length=6):
+        """检查序列是否在目标序列中有重复出现"""
+        # 检查序列自身是否有重复
+        for i in range(len(sequence) - min_repeat_length + 1):
+            substring = sequence[i:i+min_repeat_length]
+            if sequence.count(substring) > 1:
+                return True
+                
+        # 检查序列是否在目标序列的其他位置出现（除了它本身的位置）
+        occurrences = []
+        start_idx = 0
+        while True:
+            idx = target_sequence.find(sequence, start_idx)
+            if idx == -1:
+                break
+            occurrences.append(idx)
+            start_idx = idx + 1
+            
+        # 如果有多个出现位置，则认为是重复
+        return len(occurrences) > 1
+
+    def get_repeat_index(self, target_sequence, min_repeat_length=6):
+        """获取目标序列的重复索引，同一序列重复设计（如参数扫描）时复用已构建的索引"""
+        index = self._repeat_index
+        if index is None or index.k != min_repeat_length or index.sequence != target_sequence:
+            index = RepeatIndex(target_sequence, k=min_repeat_length)
+            self._repeat_index = index
+        return index
+
+    def has_homopolymer(self, sequence, max_homopolymer_length):
+        """检查序列中是否存在超过指定长度的连续相同碱基"""
+        for base in 'ATCG':
+            if base * (max_homopolymer_length + 1) in sequence:
+                return True
+        return False
+
+    def design_probes(self, target_sequence, parameters, progress_callback=None, log_callback=None,
+                      probe_callback=None, job=None):
+        """设计RNA FISH探针的核心算法（probe_callback在每个探针确定后立即收到该探针，用于增量显示）
+
+        传入job（JobControl）时按扫描过的窗口计量进度，每CHECKPOINT_INTERVAL个候选窗口检查一次暂停和取消，
+        取消时返回None。
+        """
+        probes = []
+        # 序列库视图已是大写，按需解码窗口，不复制整条序列
+        seq = target_sequence if isinstance(target_sequence, PackedSequence) else target_sequence.upper()
+        profiler = self.profiler
+        design_start = time.perf_counter()
+        if self.cache is not None:
+            self.cache.reset_stats()
+        seq_length = len(seq)
+
+        # 获取参数
+        probe_length = parameters['probe_length']
+        if job is not None:
+            job.start(max(seq_length - probe_length, 0), '窗口')
+        min_gc = parameters['min_gc']
+        max_gc = parameters['max_gc']
+        spacing = parameters['spacing']
+        min_complexity = parameters['min_complexity']
+        max_homopolymer_length = parameters.get('max_homopolymer_length', 3)  # 新增参数，默认值为3
+
+        # 一次性批量评分所有窗口，只有通过预筛的窗口才进入逐窗口精确计算
+        with profile_stage(profiler, 'design.window_scoring'):
+            engine = WindowScoreEngine(seq, probe_length)
+            candidate_mask = engine.prefilter_mask(min_gc, max_gc, min_complexity, max_homopolymer_length)
+
+        # 重复序列由k-mer索引一次性判定，直接并入预筛掩码
+        repeat_index = None
+        repeat_mask = None
+        if parameters['filter_repeats']:
+            with profile_stage(profiler, 'design.repeat_index'):
+                repeat_index = self.get_repeat_index(seq)
+                repeat_mask = repeat_index.repeat_mask(probe_length)
+            candidate_mask &= ~repeat_mask
+        if job is not None and not job.checkpoint():
+            return self.design_cancelled(log_callback)
+
+        # santalucia/nn方法使用前缀和增量计算所有窗口的Tm，其余方法仍逐窗口调用Biopython
+        tm_values = None
+        tm_calculator = None
+        with profile_stage(profiler, 'design.tm_array'):
+            if parameters.get('native_tm', True):
+                tm_calculator = NearestNeighborTm.for_method(seq, parameters.get('tm_method', 'santalucia'))
+            if tm_calculator is not None:
+                tm_values = tm_calculator.window_tm_array(probe_length)
+        # 与原逐位扫描的循环条件 position < seq_length - probe_length 保持一致
+        scan_end = max(seq_length - probe_length, 0)
+        candidates = np.flatnonzero(candidate_mask[:scan_end])
+        if profiler is not None:
+            self.record_prefilter(profiler, engine, repeat_mask, scan_end, parameters)
+            profiler.count('windows_prefiltered', len(candidates))
+        if job is not None and not job.checkpoint():
+            return self.design_cancelled(log_callback)
+
+        # 探针起点之间的最小距离（接受一个窗口后跳过 探针长度+间距-1）
+        min_gap = probe_length + spacing - 1
+        placement = parameters.get('placement', 'greedy')
+        pipeline = WindowFilterPipeline(self, seq, probe_length, parameters, tm_values, repeat_index,
+                                        profiler=profiler)
+        if placement in self.OPTIMAL_PLACEMENTS:
+            chosen = self.place_optimal(seq, candidates, min_gap, pipeline, placement, progress_callback, job)
+        else:
+            chosen = self.place_greedy(seq, candidates, min_gap, pipeline, progress_callback, job)
+
+        for probe_id, (window_start, window) in enumerate(chosen, 1):
+            rna_fragment, candidate, gc_content, tm, complexity = window
+            if log_callback:
+                log_callback(
+                    f"找到探针 {probe_id}: {candidate} (GC: {gc_content:.2f}%, Tm: {tm:.2f}°C, 复杂度: {complexity:.3f})")
+
+            # 添加到探针列表
+            probes.append({
+                'id': probe_id,
+                'sequence': candidate,  # 存储DNA探针序列
+                'rna_fragment': rna_fragment,  # 存储对应的RNA片段
+                'start': window_start + 1,
+                'end': window_start + probe_length,
+                'gc_content': gc_content,
+                'tm': tm,
+                'complexity': complexity,
+                'specificity': '未检查'
+            })
+            if probe_callback:
+                probe_callback(probes[-1])
+        if job is not None and job.cancelled:
+            return self.design_cancelled(log_callback)
+
+        # 参数中指定了本地特异性索引时，直接用索引筛查脱靶
+        if parameters.get('specificity_index') and parameters.get('check_specificity', True):
+            with profile_stage(profiler, 'design.specificity'):
+                self.screen_probes(probes, parameters, log_callback)
+
+        if log_callback:
+            log_callback(pipeline.format_stats())
+        if self.cache is not None:
+            self.cache.flush()
+            if log_callback:
+                log_callback(self.cache.report())
+
+        if profiler is not None:
+            profiler.add('design.total', time.perf_counter() - design_start)
+            profiler.count('probes', len(probes))
+            for name, evaluated, _ in pipeline.stats():
+                profiler.count(f'evaluated_{name}', evaluated)
+        if job is not None:
+            job.finish(scan_end)
+        return probes
+
+    def design_cancelled(self, log_callback=None):
+        if log_callback:
+            log_callback("探针设计被用户取消")
+        if self.cache is not None:
+            self.cache.flush()
+        return None
+
+    def sweep_parameters(self, target_sequence, base_parameters, grid, progress_callback=None, log_callback=None,
+                         cancel_flag=None):
+        """参数扫描：grid为{参数名或参数名元组: 取值列表}，各组合与base_parameters合并后评估，
+        返回每组参数的探针数和平均Tm/GC（DataFrame），窗口指标只计算一次"""
+        sweep = ParameterSweep(self, target_sequence)
+        parameter_sets = ParameterSweep.expand_grid(base_parameters, grid)
+        if log_callback:
+            log_callback(f"参数扫描: {len(parameter_sets)} 组参数，目标序列 {len(sweep.seq)} bp")
+        return sweep.run(parameter_sets, progress_callback, log_callback, cancel_flag)
+
+    def screen_probes(self, probes, parameters, log_callback=None):
+        """用本地k-mer索引筛查探针脱靶，填写与BLAST结果相同的specificity和blast_hits字段"""
+        index = KmerOffTargetIndex.open_cached(parameters['specificity_index'])
+        max_mismatches = parameters.get('max_mismatches', 1)
+        max_hits = parameters.get('max_hits', 30)
+        for probe in probes:
+            apply_specificity(probe, index.search(probe['sequence'], max_mismatches, max_hits))
+        if log_callback and probes:
+            ratings = Counter(probe['specificity'] for probe in probes)
+            log_callback("本地特异性筛查: " + "，".join(f"{rating} {count} 个" for rating, count in ratings.items()))
+
+    @staticmethod
+    def record_prefilter(profiler, engine, repeat_mask, scan_end, parameters):
+        """统计批量预筛淘汰的窗口数，每个窗口只计入第一个未通过的条件（字符、GC、复杂度、重复、同聚物）"""
+        remaining = np.ones(scan_end, dtype=bool)
+        gc_content = engine.gc_content[:scan_end]
+        checks = [
+            ('invalid', engine.valid[:scan_end]),
+            ('gc', (gc_content >= parameters['min_gc']) & (gc_content <= parameters['max_gc'])),
+            ('complexity', engine.complexity[:scan_end] >= parameters['min_complexity'] - 1e-9),
+        ]
+        if repeat_mask is not None:
+            checks.append(('repeat', ~repeat_mask[:scan_end]))
+        checks.append(('homopolymer',
+                       engine.max_homopolymer[:scan_end] <= parameters.get('max_homopolymer_length', 3)))
+        profiler.count('windows_total', scan_end)
+        for name, passed in checks:
+            profiler.reject(name, int(np.count_nonzero(remaining & ~passed)), phase='prefilter')
+            remaining &= passed
+
+    def place_greedy(self, seq, candidates, min_gap, pipeline, progress_callback=None, job=None):
+        """贪心放置：沿序列接受第一个合格窗口，逐个产出(起点, 窗口结果)；job取消时提前结束"""
+        position = 0
+        last_progress = -1
+        seq_length = len(seq)
+
+        for index, window_start in enumerate(candidates):
+            window_start = int(window_start)
+            if job is not None and not index % self.CHECKPOINT_INTERVAL:
+                if not job.checkpoint():
+                    return
+                job.update(window_start)
+            if window_start < position:
+                continue
+
+            # 更新进度（每1%更新一次）
+            if progress_callback:
+                current_progress = int((window_start / seq_length) * 100)
+                if current_progress != last_progress:
+                    progress_callback(current_progress)
+                    last_progress = current_progress
+
+            window = pipeline.evaluate(window_start)
+            if window is None:
+                continue
+            yield window_start, window
+            position = window_start + min_gap
+
+    def place_optimal(self, seq, candidates, min_gap, pipeline, placement='max_count', progress_callback=None,
+                      job=None):
+        """最优放置：先判定所有候选窗口，再用动态规划选择互不冲突的窗口集合，返回[(起点, 窗口结果)]；job取消时返回[]"""
+        starts = []
+        windows = []
+        last_progress = -1
+        seq_length = len(seq)
+        for index, window_start in enumerate(candidates):
+            window_start = int(window_start)
+            if job is not None and not index % self.CHECKPOINT_INTERVAL:
+                if not job.checkpoint():
+                    return []
+                job.update(window_start)
+            if progress_callback:
+                current_progress = int((window_start / seq_length) * 100)
+                if current_progress != last_progress:
+                    progress_callback(current_progress)
+                    last_progress = current_progress
+            window = pipeline.evaluate(window_start)
+            if window is not None:
+                starts.append(window_start)
+                windows.append(window)
+
+        parameters = pipeline.parameters
+        target_tm = parameters.get('target_tm', (parameters['min_tm'] + parameters['max_tm']) / 2)
+        tm_tolerance = parameters['max_tm'] - parameters['min_tm']
+        with profile_stage(self.profiler, 'design.select_windows'):
+            selected = self.select_windows(np.array(starts, dtype=np.int64), [window[3] for window in windows],
+                                           min_gap, placement, target_tm, tm_tolerance)
+        return [(starts[index], windows[index]) for index in selected]
+
+    @staticmethod
+    def select_windows(starts, tms, min_gap, objective='max_count', target_tm=60.0, tm_tolerance=15.0):
+        """带权区间调度：在起点间距不小于min_gap的约束下选择窗口，返回按起点排序的下标
+
+        max_count: 探针数最多，数量相同时Tm与目标Tm的总偏差最小；
+        tm_uniform: 每个探针的得分为 1 - |Tm-目标Tm|/Tm范围，最大化总得分，可能以少量探针换取Tm更一致。
+        先用searchsorted求出每个窗口之后第一个不冲突的窗口，再从后向前递推，总复杂度O(K log K)。
+        """
+        count = len(starts)
+        if count == 0:
+            return []
+        next_index = np.searchsorted(starts, starts + min_gap).tolist()
+        deviation = [abs(tm - target_tm) for tm in tms]
+        take = [False] * count
+
+        if objective == 'tm_uniform':
+            tolerance = tm_tolerance if tm_tolerance > 0 else 1.0
+            gain = [1.0 - dev / tolerance for dev in deviation]
+            best = [0.0] * (count + 1)
+            for index in range(count - 1, -1, -1):
+                taken = gain[index] + best[next_index[index]]
+                take[index] = taken >= best[index + 1]
+                best[index] = taken if take[index] else best[index + 1]
+        else:
+            # (探针数, Tm总偏差)按字典序比较：数量优先，其次偏差小者优先；相同时取更靠前的窗口
+            best_count = [0] * (count + 1)
+            best_cost = [0.0] * (count + 1)
+            for index in range(count - 1, -1, -1):
+                following = next_index[index]
+                taken_count = best_count[following] + 1
+                taken_cost = best_cost[following] + deviation[index]
+                take[index] = (taken_count > best_count[index + 1] or
+                               (taken_count == best_count[index + 1] and taken_cost <= best_cost[index + 1]))
+                if take[index]:
+                    best_count[index] = taken_count
+                    best_cost[index] = taken_cost
+                else:
+                    best_count[index] = best_count[index + 1]
+                    best_cost[index] = best_cost[index + 1]
+
+        selected = []
+        index = 0
+        while index < count:
+            if take[index]:
+                selected.append(index)
+                index = next_index[index]
+            else:
+                index += 1
+        return selected
+
+    def evaluate_window(self, seq, position, probe_length, parameters, tm_values=None, repeat_index=None):
+        """逐窗口精确计算并判定，合格时返回(RNA片段, DNA探针, GC, Tm, 复杂度)，否则返回None"""
+        pipeline = WindowFilterPipeline(self, seq, probe_length, parameters, tm_values, repeat_index,
+                                        order='cost', profiler=self.profiler)
+        return pipeline.evaluate(position)
+
+    def design_batch(self, fasta_path, output_file, parameters, workers=1, progress_callback=None,
+                     log_callback=None, cancel_flag=None, job=None):
+        """批量设计：流式读取多记录FASTA，每条记录在进程池中独立设计，结果按记录顺序写入一个文件
+
+        fasta_path也可以是PackedSequenceStore目录，此时各记录以视图传给子进程（只传坐标，碱基由内存映射共享）。
+        输出文件每行一个探针，以target_id列标明所属记录。返回统计字典，取消时返回None。
+        设置了profiler时子进程各自计量并汇总，完成后在输出文件旁保存计量结果。
+        传入job（JobControl）时按记录计量进度，暂停期间不再派发新记录；未传入时由progress_callback和cancel_flag构造。
+        """
+        profiler = self.profiler
+        workers = max(int(workers or 1), 1)
+        if job is None:
+            job = JobControl("批量设计", progress_callback=progress_callback, cancel_flag=cancel_flag)
+        store = PackedSequenceStore.open_cached(fasta_path) if PackedSequenceStore.exists(fasta_path) else None
+        total = None
+        if job.wants_progress():
+            total = len(store) if store is not None else count_fasta_records(fasta_path)
+        job.start(total, '条记录')
+        summary = {'records': 0, 'designed': 0, 'skipped': 0, 'probes': 0}
+        valid_chars = set('ATCGU')
+        state = {'header_written': False}
+
+        def write_record(record_id, probes):
+            summary['records'] += 1
+            if probes:
+                with profile_stage(profiler, 'batch.write_results'):
+                    df = design_results_frame(probes)
+                    df.insert(0, 'target_id', record_id)
+                    df.to_csv(output_file, mode='a' if state['header_written'] else 'w',
+                              header=not state['header_written'], index=False)
+                state['header_written'] = True
+                summary['designed'] += 1
+                summary['probes'] += len(probes)
+            if log_callback and summary['records'] % 100 == 0:
+                log_callback(f"已完成 {summary['records']} 条记录，共 {summary['probes']} 个探针")
+            job.update(summary['records'])
+
+        def is_valid(sequence):
+            if isinstance(sequence, PackedSequence):
+                return len(sequence) > 0 and sequence.extra_symbols() <= valid_chars
+            return bool(sequence) and all(char in valid_chars for char in sequence)
+
+        def valid_records():
+            records = iter(store) if store is not None else iter_fasta(fasta_path)
+            for record_id, sequence in profile_iter(profiler, 'batch.read_fasta', records):
+                if not is_valid(sequence):
+                    summary['skipped'] += 1
+                    if log_callback:
+                        log_callback(f"跳过 {record_id}: 序列为空或包含A,T,C,G,U以外的字符")
+                    continue
+                yield record_id, sequence
+
+        if log_callback:
+            log_callback(f"批量设计: {fasta_path}，{workers} 个进程")
+
+        if workers == 1:
+            for record_id, sequence in valid_records():
+                if not job.checkpoint():
+                    if log_callback:
+                        log_callback("批量设计被用户取消")
+                    return None
+                write_record(record_id, self.design_probes(sequence, parameters))
+        else:
+            executor = futures.ProcessPoolExecutor(max_workers=workers)
+            records = valid_records()
+            pending = {}
+            finished = {}
+            next_index = 0
+            next_write = 0
+            exhausted = False
+            try:
+                while not exhausted or pending:
+                    if job.cancelled:
+                        for future in pending:
+                            future.cancel()
+                        if log_callback:
+                            log_callback("批量设计被用户取消")
+                        return None
+
+                    # 每个进程最多排队两条记录，FASTA只按需读取，内存占用与文件大小无关；暂停期间不派发新记录
+                    while not job.paused and not exhausted and len(pending) < workers * 2:
+                        record = next(records, None)
+                        if record is None:
+                            exhausted = True
+                            break
+                        future = executor.submit(_design_record, record[1], parameters, profiler is not None)
+                        pending[future] = (next_index, record[0])
+                        next_index += 1
+
+                    if not pending:
+                        job.checkpoint()
+                        continue
+                    done, _ = futures.wait(list(pending), timeout=0.5, return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        index, record_id = pending.pop(future)
+                        probes = future.result()
+                        if profiler is not None:
+                            probes, report = probes
+                            profiler.merge(report)
+                        finished[index] = (record_id, probes)
+
+                    # 按输入顺序写出已完成的记录
+                    while next_write in finished:
+                        write_record(*finished.pop(next_write))
+                        next_write += 1
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        if not state['header_written']:
+            # 没有任何探针时也生成输出文件，避免残留上一次的结果
+            open(output_file, 'w').close()
+        job.finish(summary['records'])
+        if log_callback:
+            log_callback(f"✅ 批量设计完成: {summary['records']} 条记录，{summary['designed']} 条设计出探针，"
+                         f"共 {summary['probes']} 个探针，跳过 {summary['skipped']} 条")
+        if profiler is not None:
+            profiler.count('records', summary['records'])
+            profiler.publish(output_file, log_callback)
+        return summary
+
+
+###########################################################################
+# 参数扫描模块 - 窗口指标只计算一次，多组过滤参数复用
+###########################################################################
+class ParameterSweep:
+    """参数扫描：目标序列的窗口指标（GC、Tm、复杂度、重复标记、最长同聚物）按探针长度只计算一次，
+    每组参数只做一次掩码运算和放置。探针数、平均Tm/GC与对同一组参数调用design_probes的结果一致（不含特异性筛查）。
+    """
+
+    # 结果表中列出的设计参数
+    SWEEP_FIELDS = ('probe_length', 'min_gc', 'max_gc', 'min_tm', 'max_tm', 'min_complexity',
+                    'max_homopolymer_length', 'spacing', 'filter_repeats', 'tm_method', 'placement')
+    # 批量复杂度与逐窗口公式的求和顺序不同，阈值附近的窗口按逐窗口公式判定
+    COMPLEXITY_TOLERANCE = 1e-9
+
+    def __init__(self, designer, target_sequence):
+        self.designer = designer
+        self.seq = target_sequence if isinstance(target_sequence, PackedSequence) else target_sequence.upper()
+        self._engines = {}
+        self._tms = {}
+        self._complexity = {}
+
+    @staticmethod
+    def expand_grid(base_parameters, grid):
+        """把{参数名: 取值列表}展开为参数组合列表（笛卡尔积）
+
+        键可以是参数名元组，对应的取值为成组变化的元组，例如{('min_gc', 'max_gc'): [(35, 55), (40, 60)]}。
+        """
+        keys = list(grid)
+        combinations = []
+        for values in itertools.product(*(grid[key] for key in keys)):
+            parameters = dict(base_parameters)
+            for key, value in zip(keys, values):
+                if isinstance(key, tuple):
+                    parameters.update(zip(key, value))
+                else:
+                    parameters[key] = value
+            combinations.append(parameters)
+        return combinations
+
+    def window_engine(self, probe_length):
+        """按探针长度缓存的批量窗口评分"""
+        if probe_length not in self._engines:
+            with profile_stage(self.designer.profiler, 'sweep.window_scoring'):
+                self._engines[probe_length] = WindowScoreEngine(self.seq, probe_length)
+        return self._engines[probe_length]
+
+    def candidate(self, position, probe_length):
+        """窗口对应的DNA探针序列"""
+        return reverse_complement(str(self.seq[position:position + probe_length]))
+
+    def exact_complexity(self, position, probe_length):
+        key = (position, probe_length)
+        if key not in self._complexity:
+            self._complexity[key] = self.designer.calculate_complexity(self.candidate(position, probe_length))
+        return self._complexity[key]
+
+    def window_tm(self, parameters, mask):
+        """返回窗口Tm数组，保证mask中的窗口已经计算（与WindowFilterPipeline.check_tm相同的取值，无法计算时为NaN）"""
+        probe_length = parameters['probe_length']
+        tm_method = parameters.get('tm_method', 'santalucia')
+        native_tm = parameters.get('native_tm', True)
+        key = (probe_length, tm_method, native_tm)
+        if key not in self._tms:
+            window_count = self.window_engine(probe_length).window_count
+            raw = None
+            with profile_stage(self.designer.profiler, 'sweep.tm_array'):
+                calculator = NearestNeighborTm.for_method(self.seq, tm_method) if native_tm else None
+                if calculator is not None:
+                    raw = calculator.window_tm_array(probe_length)
+            self._tms[key] = (raw, np.full(window_count, np.nan), np.zeros(window_count, dtype=bool))
+        raw, tm, ready = self._tms[key]
+
+        # 只为本组参数实际需要的窗口取整或回退到逐窗口计算，已算过的窗口在各组参数之间复用
+        missing = np.flatnonzero(mask & ~ready[:len(mask)])
+        with profile_stage(self.designer.profiler, 'sweep.tm_windows'):
+            for position in missing.tolist():
+                if raw is not None and not np.isnan(raw[position]):
+                    tm[position] = round(float(raw[position]), 2)
+                else:
+                    value = self.designer.calculate_tm(self.candidate(position, probe_length), method=tm_method)
+                    tm[position] = np.nan if value is None else value
+        ready[missing] = True
+        return tm
+
+    def window_mask(self, parameters):
+        """返回(通过全部过滤条件的窗口掩码, 窗口Tm数组)，只含design_probes扫描范围内的窗口"""
+        probe_length = parameters['probe_length']
+        engine = self.window_engine(probe_length)
+        scan_end = max(len(self.seq) - probe_length, 0)
+        gc_content = engine.gc_content[:scan_end]
+        complexity = engine.complexity[:scan_end]
+        min_complexity = parameters['min_complexity']
+        mask = (engine.valid[:scan_end] &
+                (gc_content >= parameters['min_gc']) & (gc_content <= parameters['max_gc']) &
+                (engine.max_homopolymer[:scan_end] <= parameters.get('max_homopolymer_length', 3)) &
+                (complexity >= min_complexity - self.COMPLEXITY_TOLERANCE))
+        if parameters['filter_repeats']:
+            with profile_stage(self.designer.profiler, 'sweep.repeat_index'):
+                repeat_mask = self.designer.get_repeat_index(self.seq).repeat_mask(probe_length)
+            mask &= ~repeat_mask[:scan_end]
+
+        borderline = np.flatnonzero(mask & (complexity < min_complexity + self.COMPLEXITY_TOLERANCE))
+        for position in borderline.tolist():
+            if self.exact_complexity(position, probe_length) < min_complexity:
+                mask[position] = False
+
+        tm = self.window_tm(parameters, mask)
+        with np.errstate(invalid='ignore'):
+            mask &= (tm[:scan_end] >= parameters['min_tm']) & (tm[:scan_end] <= parameters['max_tm'])
+        return mask, tm
+
+    def place(self, parameters, mask, tm):
+        """按放置策略从合格窗口中选出探针起点（与design_probes的放置结果相同）"""
+        starts = np.flatnonzero(mask)
+        min_gap = parameters['probe_length'] + parameters['spacing'] - 1
+        placement = parameters.get('placement', 'greedy')
+        if placement in RNAProbeDesigner.OPTIMAL_PLACEMENTS:
+            target_tm = parameters.get('target_tm', (parameters['min_tm'] + parameters['max_tm']) / 2)
+            tm_tolerance = parameters['max_tm'] - parameters['min_tm']
+            selected = RNAProbeDesigner.select_windows(starts, tm[starts].tolist(), min_gap, placement,
+                                                       target_tm, tm_tolerance)
+            return starts[np.array(selected, dtype=np.int64)]
+        chosen = []
+        position = 0
+        for start in starts.tolist():
+            if start >= position:
+                chosen.append(start)
+                position = start + min_gap
+        return np.array(chosen, dtype=np.int64)
+
+    def summarize(self, parameters):
+        """对一组参数做掩码和放置，返回结果表的一行"""
+        mask, tm = self.window_mask(parameters)
+        with profile_stage(self.designer.profiler, 'sweep.placement'):
+            starts = self.place(parameters, mask, tm)
+        row = {field: parameters.get(field) for field in self.SWEEP_FIELDS}
+        row['windows'] = int(np.count_nonzero(mask))
+        row['probes'] = len(starts)
+        if len(starts):
+            gc_content = self.window_engine(parameters['probe_length']).gc_content[starts]
+            row['mean_tm'] = float(tm[starts].mean())
+            row['mean_gc'] = float(gc_content.mean())
+            row['min_probe_tm'] = float(tm[starts].min())
+            row['max_probe_tm'] = float(tm[starts].max())
+        else:
+            row['mean_tm'] = row['mean_gc'] = row['min_probe_tm'] = row['max_probe_tm'] = np.nan
+        return row
+
+    def run(self, parameter_sets, progress_callback=None, log_callback=None, cancel_flag=None):
+        """依次评估各组参数，返回每组一行的DataFrame；取消时返回None"""
+        start = time.perf_counter()
+        rows = []
+        last_progress = -1
+        for index, parameters in enumerate(parameter_sets, 1):
+            if cancel_flag and cancel_flag.is_set():
+                if log_callback:
+                    log_callback("参数扫描被用户取消")
+                return None
+            rows.append(self.summarize(parameters))
+            if progress_callback:
+                current_progress = int(index / len(parameter_sets) * 100)
+                if current_progress != last_progress:
+                    progress_callback(current_progress)
+                    last_progress = current_progress
+        if log_callback:
+            log_callback(f"参数扫描完成: {len(rows)} 组参数，用时 {time.perf_counter() - start:.2f} 秒")
+        if self.designer.profiler is not None:
+            self.designer.profiler.count('sweep_combinations', len(rows))
+        return pd.DataFrame(rows)
+
+
+###########################################################################
+# DNA探针分析器类 - 核心功能模块
+###########################################################################
+class DNAProbeAnalyzer:
+    # 结果文件的列顺序
+    RESULT_COLUMNS = ['id', 'sequence', 'valid_sequence', 'tm', 'gc_content']
+
+    def __init__(self, cache=None, profiler=None):
+        self.results = []
+        self.summary = self.new_summary()
+        self.cache = cache
+        self.profiler = profiler
+    
+    #######################################################################
+    # 序列分析模块
+    #######################################################################
+    def calculate_tm(self, sequence, method='santalucia'):
+        """计算DNA序列的Tm值"""
+        if not sequence or not isinstance(sequence, str):
+            return None
+            
+        sequence = sequence.upper().strip()
+        
+        if not self.check_sequence_validity(sequence):
+            return None
+            
+        try:
+            if method == 'santalucia':
+                tm = mt.Tm_NN(bio_seq.Seq(sequence), nn_table=mt.DNA_NN1)
+            elif method == 'wallace':
+                tm = mt.Tm_Wallace(bio_seq.Seq(sequence))
+            elif method == 'gc':
+                tm = mt.Tm_GC(bio_seq.Seq(sequence))
+            elif method == 'nn':
+                tm = mt.Tm_NN(bio_seq.Seq(sequence))
+            else:
+                tm = mt.Tm_NN(bio_seq.Seq(sequence))
+            return round(tm, 2)
+        except Exception as e:
+            return None
+    
+    def calculate_gc_content(self, sequence):
+        """计算GC含量"""
+        if not sequence or not isinstance(sequence, str):
+            return None
+            
+        sequence = sequence.upper().strip()
+        
+        if not self.check_sequence_validity(sequence):
+            return None
+            
+        try:
+            gc_count = sequence.count('G') + sequence.count('C')
+            total_bases = len(sequence)
+            
+            if total_bases == 0:
+                return 0.0
+                
+            gc_content = (gc_count / total_bases) * 100
+            return round(gc_content, 2)
+        except Exception as e:
+            return None
+    
+    def check_sequence_validity(self, sequence):
+        """检查序列有效性"""
+        if not sequence:
+            return False
+            
+        sequence = sequence.upper().strip()
+        valid_chars = set('ATCGN')
+        return all(char in valid_chars for char in sequence) and len(sequence) > 0
+    
+    def analyze_record(self, probe_id, sequence, tm_method):
+        """分析单条序列，返回结果字典"""
+        # 检查序列有效性
+        lap = self.profiler.start_laps() if self.profiler is not None else None
+        valid = self.check_sequence_validity(sequence)
+        if lap:
+            lap('analyze.validity')
+            if not valid:
+                self.profiler.reject('invalid', phase='analyze')
+        if not valid:
+            return {
+                'id': probe_id,
+                'sequence': sequence,
+                'valid_sequence': False,
+                'tm': None,
+                'gc_content': None,
+            }
+
+        return self.make_valid_record(probe_id, sequence, tm_method)
+
+    def make_valid_record(self, probe_id, sequence, tm_method):
+        """计算有效序列的Tm和GC含量，优先使用持久化缓存"""
+        lap = self.profiler.start_laps() if self.profiler is not None else None
+        cached = self.cache.get(sequence, tm_method) if self.cache is not None else None
+        if lap:
+            lap('analyze.cache_lookup')
+        if cached is None:
+            tm = self.calculate_tm(sequence, method=tm_method)
+            if lap:
+                lap('analyze.tm')
+            gc_content = self.calculate_gc_content(sequence)
+            if lap:
+                lap('analyze.gc')
+            if self.cache is not None:
+                self.cache.put(sequence, tm_method, tm, gc_content)
+        else:
+            tm, gc_content = cached
+            if lap:
+                self.profiler.count('cache_hits')
+            # 设计器写入的条目只含Tm
+            if gc_content is None:
+                gc_content = self.calculate_gc_content(sequence)
+
+        return {
+            'id': probe_id,
+            'sequence': sequence,
+            'valid_sequence': True,
+            'tm': tm,
+            'gc_content': gc_content,
+        }
+
+    #######################################################################
+    # 主分析模块
+    #######################################################################
+    def analyze_probes(self, config, pause_flag=None, cancel_flag=None, progress_callback=None, 
+                      log_callback=None, total_rows=None, job=None):
+        """主分析函数（传入job时由其控制暂停、取消和进度，否则由pause_flag、cancel_flag和progress_callback构造）"""
+        if job is None:
+            job = JobControl("探针分析", '条序列', progress_callback=progress_callback,
+                             pause_flag=pause_flag, cancel_flag=cancel_flag)
+        input_file = config['input_file']
+        if not os.path.exists(input_file):
+            if log_callback:
+                log_callback(f"错误：输入文件 {input_file} 不存在")
+            return False
+
+        self.summary = self.new_summary()
+        if self.cache is not None:
+            self.cache.reset_stats()
+
+        # 流式模式：分块读取、分块追加写出，内存占用与文件大小无关
+        chunksize = config.get('stream_chunksize')
+        if chunksize and os.path.splitext(config['output_file'])[1].lower() == '.xlsx':
+            if log_callback:
+                log_callback("Excel输出不支持流式追加写入，改为一次性读取")
+            chunksize = None
+        if not chunksize and config.get('resume') and log_callback:
+            log_callback("断点续跑只支持流式分析，本次从头开始")
+
+        try:
+            if chunksize:
+                success = self.analyze_streaming(config, int(chunksize), job, log_callback, total_rows)
+            else:
+                success = self.analyze_in_memory(config, job, log_callback, total_rows)
+            if success and self.profiler is not None:
+                self.profiler.count('rows', self.summary['total'])
+                self.profiler.count('valid', self.summary['valid'])
+                self.profiler.publish(config['output_file'], log_callback)
+            return success
+        finally:
+            if self.cache is not None:
+                self.cache.flush()
+                if log_callback:
+                    log_callback(self.cache.report())
+
+    def analyze_in_memory(self, config, job, log_callback=None, total_rows=None):
+        """一次性读取整个输入文件并分析"""
+        input_file = config['input_file']
+        try:
+            # 尝试不同的分隔符
+            with profile_stage(self.profiler, 'analyze.read_input'):
+                try:
+                    df = pd.read_csv(input_file)
+                except:
+                    df = pd.read_csv(input_file, sep='\t')
+                
+            if log_callback:
+                log_callback(f"成功读取文件，共 {len(df)} 条序列")
+        except Exception as e:
+            if log_callback:
+                log_callback(f"读取CSV文件错误: {e}")
+            return False
+        
+        # 检查必要的列
+        if not self.check_required_columns(df, log_callback):
+            return False
+
+        job.start(total_rows or len(df))
+        results = self.score_frame(df, config, job, log_callback, total_rows)
+        if results is None:
+            return False
+        job.finish(len(results))
+        self.update_summary(self.summary, results)
+
+        # 保存结果
+        try:
+            with profile_stage(self.profiler, 'analyze.write_results'):
+                self.write_results(results, config['output_file'])
+            
+            if log_callback:
+                log_callback(f"✅ 分析完成！结果已保存到: {config['output_file']}")
+            
+            return True
+            
+        except Exception as e:
+            if log_callback:
+                log_callback(f"❌ 保存结果错误: {e}")
+            return False
+
+    def analyze_streaming(self, config, chunksize, job, log_callback=None, total_rows=None):
+        """流式分析：按chunksize分块读取输入，每块结果立即追加到输出文件
+
+        指定config['checkpoint_dir']时每写完一块在该检查点目录（默认不记录检查点）
+        记录已完成的块数、输出文件长度和累计统计；config['resume']为True时跳过已完成的块，
+        输出文件截断到最后一个检查点后继续追加。成功完成后删除检查点目录。
+        """
+        input_file = config['input_file']
+        output_file = config['output_file']
+        workers = int(config.get('workers', 1) or 1)
+        if total_rows is None:
+            total_rows = self.count_data_rows(input_file)
+
+        executor = None
+        checkpoint = None
+        chunks_done = 0
+        rows_done = 0
+        succeeded = False
+        try:
+            if config.get('checkpoint_dir'):
+                checkpoint = self.open_checkpoint(config, chunksize, log_callback)
+                if checkpoint.resumed:
+                    chunks_done, rows_done = self.restore_checkpoint(checkpoint, output_file, log_callback)
+
+            if log_callback:
+                log_callback(f"流式分析: 每块 {chunksize} 条，共约 {total_rows} 条序列")
+            job.start(total_rows, done=rows_done)
+
+            executor = futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+            reader = pd.read_csv(input_file, sep=self.detect_separator(input_file), chunksize=chunksize)
+            for chunk_number, df in enumerate(profile_iter(self.profiler, 'analyze.read_input', reader)):
+                if chunk_number == 0 and not self.check_required_columns(df, log_callback):
+                    return False
+                # 已完成的块只读取不计算，保证行号和默认ID与不中断时一致
+                if chunk_number < chunks_done:
+                    continue
+
+                results = self.score_frame(df, config, job, log_callback, total_rows, rows_done, executor)
+                if results is None:
+                    if log_callback and rows_done:
+                        log_callback(f"已写入的前 {rows_done} 条结果保留在: {output_file}")
+                    return False
+
+                with profile_stage(self.profiler, 'analyze.write_results'):
+                    self.write_results(results, output_file, append=chunk_number > 0)
+                self.update_summary(self.summary, results)
+                rows_done += len(results)
+                job.update(rows_done)
+                if checkpoint is not None:
+                    checkpoint.state = {'chunks': chunk_number + 1, 'rows': rows_done,
+                                        'output_bytes': os.path.getsize(output_file), 'summary': self.summary}
+                    checkpoint.save(f"已完成 {rows_done} 条序列")
+
+            if rows_done == 0:
+                # 空输入也输出只有表头的结果文件，与一次性模式一致
+                self.write_results([], output_file)
+            succeeded = True
+        except Exception as e:
+            if log_callback:
+                log_callback(f"❌ 流式分析错误: {e}")
+            return False
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if not succeeded and checkpoint is not None and checkpoint.state and log_callback:
+                log_callback(f"进度已保存在检查点 {checkpoint.work_dir}，续跑时从第 {checkpoint.state['rows'] + 1} 条继续")
+
+        job.finish(rows_done)
+        if checkpoint is not None:
+            checkpoint.clear()
+        if log_callback:
+            log_callback(f"✅ 分析完成！结果已保存到: {output_file}")
+        return True
+
+    def open_checkpoint(self, config, chunksize, log_callback=None):
+        """打开流式分析的检查点，指纹包括输入文件、输出文件、Tm方法和分块大小"""
+        work_dir = config['checkpoint_dir']
+        fingerprint = {
+            'input': RunCheckpoint.file_fingerprint(config['input_file']),
+            'output': os.path.abspath(config['output_file']),
+            'tm_method': config['tm_method'],
+            'chunksize': int(chunksize),
+        }
+        checkpoint = RunCheckpoint(work_dir, 'analyze', fingerprint, resume=config.get('resume', False))
+        if checkpoint.discarded and log_callback:
+            log_callback(f"未指定续跑，已丢弃上次中断留下的检查点: {work_dir}")
+        return checkpoint
+
+    def restore_checkpoint(self, checkpoint, output_file, log_callback=None):
+        """恢复累计统计，把输出文件截断到最后一个检查点，返回(已完成块数, 已完成行数)"""
+        state = checkpoint.state
+        if not os.path.exists(output_file) or os.path.getsize(output_file) < state['output_bytes']:
+            if log_callback:
+                log_callback("输出文件比检查点记录的短，无法续跑，从头开始分析")
+            checkpoint.state = {}
+            return 0, 0
+        with open(output_file, 'r+b') as f:
+            f.truncate(state['output_bytes'])
+        self.summary = dict(state['summary'])
+        if log_callback:
+            log_callback(f"从断点继续: 已完成 {state['chunks']} 块共 {state['rows']} 条序列")
+        return state['chunks'], state['rows']
+
+    def score_frame(self, df, config, job, log_callback=None, total_rows=None, rows_done=0, executor=None):
+        """分析一个DataFrame中的全部序列（每条序列是一个暂停/取消检查点），取消时返回None"""
+        workers = int(config.get('workers', 1) or 1)
+        if workers > 1:
+            return self.analyze_parallel(df, config, workers, job, log_callback, total_rows, rows_done, executor)
+
+        results = []
+        total = total_rows or len(df)
+        prefetch_size = 10000
+
+        for position, (index, row) in enumerate(df.iterrows()):
+            # 批量预取缓存，避免逐条查询数据库
+            if self.cache is not None and position % prefetch_size == 0:
+                block = df['sequence'].iloc[position:position + prefetch_size]
+                self.cache.prefetch([str(value).strip() for value in block], config['tm_method'])
+
+            # 检查是否暂停或取消
+            if job.paused and log_callback:
+                log_callback("分析暂停中...")
+            if not job.checkpoint():
+                if log_callback:
+                    log_callback("分析被用户取消")
+                return None
+
+            sequence = str(row['sequence']).strip()
+            probe_id = row.get('id', f"probe_{index+1}")
+
+            if log_callback:
+                if index % 10 == 0:  # 每10条序列记录一次日志
+                    log_callback(f"处理探针 {probe_id} ({index+1}/{total})")
+
+            job.update(rows_done + position)
+
+            result = self.analyze_record(probe_id, sequence, config['tm_method'])
+
+            if log_callback and index % 10 == 0:  # 减少日志输出
+                if not result['valid_sequence']:
+                    log_callback(f"探针 {probe_id}: 序列包含无效字符，跳过")
+                else:
+                    log_callback(f"探针 {probe_id}: Tm={result['tm']}°C, GC={result['gc_content']}%")
+
+            results.append(result)
+
+        return results
+
+    def analyze_parallel(self, df, config, workers, job, log_callback=None, total_rows=None,
+                         rows_done=0, executor=None):
+        """将序列分块后交给进程池并行计算，按输入顺序合并结果；取消时返回None"""
+        chunk_size = max(int(config.get('chunk_size', 5000) or 5000), 1)
+        if 'id' in df.columns:
+            probe_ids = df['id'].tolist()
+        else:
+            probe_ids = [f"probe_{index+1}" for index in df.index]
+        sequences = [str(value).strip() for value in df['sequence'].tolist()]
+        chunks = [list(zip(probe_ids[start:start + chunk_size], sequences[start:start + chunk_size]))
+                  for start in range(0, len(sequences), chunk_size)]
+        total = total_rows or len(sequences)
+
+        if log_callback:
+            log_callback(f"并行分析: {workers} 个进程，{len(chunks)} 个数据块（每块 {chunk_size} 条）")
+
+        # 流式模式下由调用方传入共享的进程池，避免每块重新启动进程
+        own_executor = executor is None
+        if own_executor:
+            executor = futures.ProcessPoolExecutor(max_workers=workers)
+        pending = {}
+        chunk_results = {}
+        next_chunk = 0
+        done_rows = rows_done
+        paused_logged = False
+        try:
+            while next_chunk < len(chunks) or pending:
+                # 检查是否取消：撤销未开始的数据块，已在运行的数据块结果直接丢弃
+                if job.cancelled:
+                    for future in pending:
+                        future.cancel()
+                    if log_callback:
+                        log_callback("分析被用户取消")
+                    return None
+
+                # 检查是否暂停：暂停期间不再派发新数据块，正在计算的数据块照常收回
+                paused = job.paused
+                if paused and not paused_logged and log_callback:
+                    log_callback("分析暂停中...")
+                paused_logged = paused
+
+                # 每个进程最多排队两个数据块，保证暂停和取消能及时生效
+                while not paused and next_chunk < len(chunks) and len(pending) < workers * 2:
+                    # 缓存命中的序列在主进程直接取结果，只把未命中的序列交给进程池
+                    cached, misses = self.split_cached(chunks[next_chunk], config['tm_method'])
+                    future = executor.submit(_analyze_chunk, misses, config['tm_method'],
+                                             self.profiler is not None)
+                    pending[future] = (next_chunk, cached)
+                    next_chunk += 1
+
+                if not pending:
+                    # 暂停且正在计算的数据块都已收回时在检查点等待，暂停时间不计入吞吐量
+                    job.checkpoint()
+                    continue
+
+                done, _ = futures.wait(list(pending), timeout=0.5, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    chunk_index, cached = pending.pop(future)
+                    computed = future.result()
+                    if self.profiler is not None:
+                        computed, report = computed
+                        self.profiler.merge(report)
+                    computed = iter(computed)
+                    chunk_result = []
+                    for position in range(len(chunks[chunk_index])):
+                        if position in cached:
+                            chunk_result.append(cached[position])
+                            continue
+                        result = next(computed)
+                        if self.cache is not None and result['valid_sequence']:
+                            self.cache.put(result['sequence'], config['tm_method'], result['tm'], result['gc_content'])
+                        chunk_result.append(result)
+                    chunk_results[chunk_index] = chunk_result
+                    done_rows += len(chunk_result)
+
+                    if log_callback:
+                        log_callback(f"已完成 {done_rows}/{total} 条序列")
+                    job.update(done_rows)
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        return [result for chunk_index in range(len(chunks)) for result in chunk_results[chunk_index]]
+
+    def split_cached(self, records, tm_method):
+        """把(id, sequence)记录分为缓存命中的结果（按位置索引）和需要计算的记录"""
+        if self.cache is None:
+            return {}, records
+        self.cache.prefetch([sequence for _, sequence in records], tm_method)
+        cached = {}
+        misses = []
+        for position, (probe_id, sequence) in enumerate(records):
+            entry = None
+            if self.check_sequence_validity(sequence):
+                entry = self.cache.get(sequence, tm_method)
+            if entry is not None and entry[1] is not None:
+                cached[position] = {
+                    'id': probe_id,
+                    'sequence': sequence,
+                    'valid_sequence': True,
+                    'tm': entry[0],
+                    'gc_content': entry[1],
+                }
+            else:
+                misses.append((probe_id, sequence))
+        if self.profiler is not None:
+            self.profiler.count('cache_hits', len(cached))
+        return cached, misses
+
+    #######################################################################
+    # 输入输出模块
+    #######################################################################
+    @staticmethod
+    def count_data_rows(file_path):
+        """按块统计换行符得到数据行数（不含表头），无需解析整个文件"""
+        line_count = 0
+        last_byte = b'\n'
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(1 << 20)
+                if not block:
+                    break
+                line_count += block.count(b'\n')
+                last_byte = block[-1:]
+        if last_byte != b'\n':
+            line_count += 1
+        return max(line_count - 1, 0)
+
+    @staticmethod
+    def detect_separator(file_path):
+        """根据表头判断分隔符：优先逗号，表头中找不到sequence列时再尝试制表符"""
+        with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            header = f.readline().rstrip('\r\n')
+        if 'sequence' not in header.split(',') and 'sequence' in header.split('\t'):
+            return '\t'
+        return ','
+
+    def check_required_columns(self, df, log_callback=None):
+        """检查必要的列"""
+        required_columns = ['sequence']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            if log_callback:
+                log_callback(f"CSV文件中缺少必要的列: {missing_columns}")
+                log_callback(f"文件列名: {list(df.columns)}")
+            return False
+        return True
+
+    def write_results(self, results, output_file, append=False):
+        """写出结果，append为True时追加到已有CSV/TSV文件末尾（不重复写表头）"""
+        results_df = pd.DataFrame(results, columns=self.RESULT_COLUMNS)
+
+        # 确保输出目录存在
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        # 根据文件扩展名选择保存格式
+        output_ext = os.path.splitext(output_file)[1].lower()
+        mode = 'a' if append else 'w'
+        if output_ext == '.tsv':
+            results_df.to_csv(output_file, sep='\t', index=False, mode=mode, header=not append)
+        elif output_ext == '.xlsx':
+            results_df.to_excel(output_file, index=False)
+        else:
+            # 默认保存为CSV
+            results_df.to_csv(output_file, index=False, mode=mode, header=not append)
+
+    @staticmethod
+    def new_summary():
+        """创建空的统计信息"""
+        return {'total': 0, 'valid': 0, 'tm_sum': 0.0, 'tm_count': 0, 'gc_sum': 0.0, 'gc_count': 0}
+
+    @staticmethod
+    def update_summary(summary, results):
+        """累加一批结果的统计信息，流式模式下无需重新读取输出文件"""
+        for result in results:
+            summary['total'] += 1
+            if result['valid_sequence']:
+                summary['valid'] += 1
+            if result['tm'] is not None:
+                summary['tm_sum'] += result['tm']
+                summary['tm_count'] += 1
+            if result['gc_content'] is not None:
+                summary['gc_sum'] += result['gc_content']
+                summary['gc_count'] += 1
+        return summary
+
+
+def _analyze_chunk(records, tm_method, profile=False):
+    """进程池工作函数：分析一个数据块的(id, sequence)记录，profile为True时同时返回计量结果"""
+    analyzer = DNAProbeAnalyzer(profiler=StageProfiler() if profile else None)
+    results = [analyzer.analyze_record(probe_id, sequence, tm_method) for probe_id, sequence in records]
+    if not profile:
+        return results
+    return results, analyzer.profiler.report()
+
+
+def _design_record(sequence, parameters, profile=False):
+    """进程池工作函数：为一条目标序列设计探针，profile为True时同时返回计量结果"""
+    if not profile:
+        return RNAProbeDesigner().design_probes(sequence, parameters)
+    profiler = StageProfiler()
+    probes = RNAProbeDesigner(profiler=profiler).design_probes(sequence, parameters)
+    return probes, profiler.report()
+
+
+###########################################################################
+# 序列工具模块
+###########################################################################
+# 互补碱基表（含IUPAC简并碱基），与Bio.Seq.reverse_complement结果一致：U按DNA互补为A，其他字符保持不变
+DNA_COMPLEMENT = str.maketrans("ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", "TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn")
+# 输出RNA时A互补为U
+RNA_COMPLEMENT = str.maketrans("ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", "UGCAAKYWSRMBDHVNugcaakywsrmbdhvn")
+REVCOMP_COLUMN = '反向互补序列'
+
+
+def reverse_complement(dna_sequence, rna=False):
+    """计算反向互补序列，非文本值原样返回；rna为True时输出RNA（A配对为U）"""
+    if not isinstance(dna_sequence, str):
+        return dna_sequence
+    return dna_sequence.translate(RNA_COMPLEMENT if rna else DNA_COMPLEMENT)[::-1]
+
+
+def reverse_complement_series(series, rna=False):
+    """对整列序列批量计算反向互补（str.translate查表），非文本值原样保留"""
+    table = RNA_COMPLEMENT if rna else DNA_COMPLEMENT
+    return pd.Series([value.translate(table)[::-1] if isinstance(value, str) else value for value in series],
+                     index=series.index, dtype=object)
+
+
+def reverse_complement_file(input_file, output_file, column, chunksize=100000, rna=False,
+                            progress_callback=None, cancel_flag=None, job=None):
+    """流式处理表格文件：按块读取、计算指定列的反向互补并追加写出，内存占用与文件大小无关
+
+    返回处理的行数，取消时返回None。传入job（JobControl）时每块是一个暂停/取消检查点。
+    """
+    if job is None:
+        job = JobControl("反向互补", progress_callback=progress_callback, cancel_flag=cancel_flag)
+    job.start(DNAProbeAnalyzer.count_data_rows(input_file) if job.wants_progress() else None, '行')
+    processed = 0
+    for index, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize)):
+        if not job.checkpoint():
+            return None
+        if column not in chunk.columns:
+            raise KeyError(f"文件中没有列: {column}")
+        chunk[REVCOMP_COLUMN] = reverse_complement_series(chunk[column], rna=rna)
+        # 只有第一块写入BOM和表头
+        if index == 0:
+            chunk.to_csv(output_file, index=False, encoding='utf-8-sig')
+        else:
+            chunk.to_csv(output_file, index=False, mode='a', header=False, encoding='utf-8')
+        processed += len(chunk)
+        job.update(processed)
+    job.finish(processed)
+    return processed
+
+
+def open_text(path):
+    """以文本方式打开文件，gzip压缩文件（按文件头识别）透明解压"""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(path, 'rt')
+    return open(path, 'r')
+
+
+def iter_fasta(path):
+    """逐条流式读取FASTA文件（支持gzip），产出(记录ID, 序列)"""
+    record_id = None
+    chunks = []
+    with open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if record_id is not None:
+                    yield record_id, ''.join(chunks).upper()
+                record_id = line[1:].split()[0] if len(line) > 1 else ''
+                chunks = []
+            elif line:
+                if record_id is None:
+                    # 没有标题行的纯序列文件视为一条记录
+                    record_id = os.path.splitext(os.path.basename(path))[0]
+                chunks.append(line)
+    if record_id is not None:
+        yield record_id, ''.join(chunks).upper()
+
+
+def count_fasta_records(path):
+    """统计FASTA文件中的记录数（只数标题行），用于批量设计的进度显示"""
+    with open_text(path) as f:
+        return sum(1 for line in f if line.startswith('>'))
+
+
+def design_results_frame(probes):
+    """把设计结果转换为导出用的DataFrame，BLAST命中列表展开为文本"""
+    df = pd.DataFrame(probes)
+    # 处理blast_hits列（如果是列表）
+    if 'blast_hits' in df.columns:
+        df['blast_hits'] = df['blast_hits'].apply(
+            lambda x: '; '.join([f"{h['subject']}({h['identity']}%)" for h in x]) if isinstance(x, list) else '')
+    return df
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""测试用的blastn替身：按BlastRunner传入的参数读取查询FASTA，输出确定的outfmt 7报告
+
+命中由查询序列本身决定，同一查询无论落在哪个分片都得到相同的文本块。
+环境变量:
+    FAKE_BLASTN_LOG           每次调用追加一行JSON（查询文件名、-num_threads和查询ID列表）
+    FAKE_BLASTN_THREADS       期望的-num_threads值，不一致时以返回码3退出
+    FAKE_BLASTN_FAIL_QUERY    该查询的块只输出一半（表头和前一半命中）后写stderr并以返回码2退出
+    FAKE_BLASTN_HANG_QUERY    该查询的块只输出一半后停住（等待被终止），模拟搜索中途被取消
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+
+def read_fasta(path):
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                records.append([line[1:].split()[0], ''])
+            elif line and records:
+                records[-1][1] += line
+    return records
+
+
+def fake_hits(query, sequence, max_target_seqs):
+    """由序列散列生成0~4个命中，字段与真实outfmt 7一致"""
+    digest = hashlib.sha1(sequence.encode('ascii')).digest()
+    length = len(sequence)
+    hits = []
+    for rank in range(min(digest[0] % 5, max_target_seqs)):
+        mismatches = digest[rank + 1] % 3
+        identity = 100.0 * (length - mismatches) / length
+        evalue = 1e-6 * (rank + 1) * (mismatches + 1)
+        bitscore = 2.0 * (length - mismatches) - rank
+        subject = f"NM_{digest[rank + 5] * 7 % 1000:03d}.{rank + 1}"
+        start = digest[rank + 10] * 20 + 1
+        hits.append(f"{query}\t{subject}\t{identity:.3f}\t{length}\t{mismatches}\t0\t1\t{length}\t"
+                    f"{start}\t{start + length - 1}\t{evalue:.2e}\t{bitscore:.1f}")
+    return hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='blastn')
+    parser.add_argument('-db', required=True)
+    parser.add_argument('-query', required=True)
+    parser.add_argument('-outfmt', required=True)
+    parser.add_argument('-max_target_seqs', type=int, default=500)
+    parser.add_argument('-evalue', default='10')
+    parser.add_argument('-out')
+    parser.add_argument('-num_threads', type=int)
+    args = parser.parse_args(argv)
+
+    if args.outfmt != '7':
+        sys.stderr.write(f"fake blastn只支持-outfmt 7，收到: {args.outfmt}\n")
+        return 1
+    if args.num_threads is not None and args.num_threads < 1:
+        sys.stderr.write(f"-num_threads必须为正整数: {args.num_threads}\n")
+        return 1
+    expected_threads = os.environ.get('FAKE_BLASTN_THREADS')
+    if expected_threads is not None and (args.num_threads or 1) != int(expected_threads):
+        sys.stderr.write(f"期望-num_threads {expected_threads}，收到: {args.num_threads}\n")
+        return 3
+
+    records = read_fasta(args.query)
+    log_path = os.environ.get('FAKE_BLASTN_LOG')
+    if log_path:
+        with open(log_path, 'a') as f:
+            f.write(json.dumps({'query_file': os.path.basename(args.query), 'num_threads': args.num_threads,
+                                'queries': [query for query, _ in records]}) + '\n')
+
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        for query, sequence in records:
+            hits = fake_hits(query, sequence, args.max_target_seqs)
+            block = ["# BLASTN 2.17.0+", f"# Query: {query}", f"# Database: {args.db}"]
+            if hits:
+                block.append("# Fields: query acc.ver, subject acc.ver, % identity, alignment length, mismatches, "
+                             "gap opens, q. start, q. end, s. start, s. end, evalue, bit score")
+            block.append(f"# {len(hits)} hits found")
+            if query == os.environ.get('FAKE_BLASTN_FAIL_QUERY'):
+                # 模拟blastn在查询块中途出错退出
+                out.write('\n'.join(block + hits[:(len(hits) + 1) // 2]) + '\n')
+                out.flush()
+                sys.stderr.write(f"BLAST query/options error: 查询 {query} 出错\n")
+                return 2
+            if query == os.environ.get('FAKE_BLASTN_HANG_QUERY'):
+                out.write('\n'.join(block + hits[:(len(hits) + 1) // 2]) + '\n')
+                out.flush()
+                time.sleep(60)
+                return 4
+            out.write('\n'.join(block + hits) + '\n')
+        out.write(f"# BLAST processed {len(records)} queries\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""BlastRunner分片运行的测试：用tests/fake_blastn.py代替真实的blastn
+
+运行: python -m pytest tests
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fish_engine import BlastRunner, BlastHitCache, JobControl, iter_blast_results
+import fake_blastn
+
+
+FAKE_BLASTN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_blastn.py')
+
+
+def make_records(count, seed=7):
+    rng = random.Random(seed)
+    return [(f"probe_{index + 1}", ''.join(rng.choice('ACGT') for _ in range(rng.randint(18, 30))))
+            for index in range(count)]
+
+
+def read_text(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def parse_report(path):
+    with open(path, 'r') as f:
+        return list(iter_blast_results(f))
+
+
+@unittest.skipIf(os.name == 'nt', "fake blastn依赖shebang直接执行")
+class BlastRunnerShardTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="test_blast_runner_")
+        self.log_path = os.path.join(self.work_dir, 'calls.jsonl')
+        self.env = mock.patch.dict(os.environ, {'FAKE_BLASTN_LOG': self.log_path})
+        self.env.start()
+        self.records = make_records(23)
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run_blast(self, name, **options):
+        output_file = os.path.join(self.work_dir, name)
+        runner = BlastRunner(FAKE_BLASTN, 'fake_db', **options)
+        results = {}
+        success, error = runner.run(self.records, output_file,
+                                    result_callback=lambda query, hits: results.__setitem__(query, hits))
+        self.assertTrue(success, error)
+        return output_file, results
+
+    def calls(self):
+        """各分片的blastn调用记录，按分片编号（查询文件shard_N.fasta）排序"""
+        with open(self.log_path, 'r') as f:
+            calls = [json.loads(line) for line in f]
+        return sorted(calls, key=lambda call: int(call['query_file'].split('_')[1].split('.')[0]))
+
+    def test_default_is_single_call_without_threads(self):
+        """默认1个分片、1个线程，与原来的单次blastn调用相同"""
+        output_file, results = self.run_blast('single.txt')
+        calls = self.calls()
+        self.assertEqual(len(calls), 1)
+        self.assertIsNone(calls[0]['num_threads'])
+        self.assertEqual(calls[0]['queries'], [seq_id for seq_id, _ in self.records])
+        with open(output_file, 'r') as f:
+            self.assertEqual([query for query, _ in iter_blast_results(f)], calls[0]['queries'])
+        self.assertEqual(set(results), set(calls[0]['queries']))
+
+    def test_shards_merge_to_single_shard_report(self):
+        """多个分片合并后的报告与单分片报告完全相同（只有一个结束行），且保持查询顺序"""
+        single_file, single_results = self.run_blast('single.txt')
+        os.remove(self.log_path)
+        with mock.patch.dict(os.environ, {'FAKE_BLASTN_THREADS': '2'}):
+            sharded_file, sharded_results = self.run_blast('sharded.txt', shards=4, num_threads=2)
+
+        calls = self.calls()
+        self.assertEqual(len(calls), 4)
+        self.assertTrue(all(call['num_threads'] == 2 for call in calls))
+        # 分片是输入的连续切片，依次拼接即为原顺序
+        self.assertEqual([query for call in calls for query in call['queries']],
+                         [seq_id for seq_id, _ in self.records])
+        self.assertEqual(read_text(sharded_file), read_text(single_file))
+        with open(sharded_file, 'r') as f:
+            self.assertEqual([query for query, _ in iter_blast_results(f)], [seq_id for seq_id, _ in self.records])
+        self.assertEqual(sharded_results, single_results)
+
+    def test_cached_results_keep_record_order(self):
+        """部分查询命中缓存时，缓存结果与搜索结果按输入顺序交错写出，解析结果与不用缓存时相同"""
+        single_file, _ = self.run_blast('single.txt')
+        cache = BlastHitCache(os.path.join(self.work_dir, 'blast_cache.sqlite'))
+        all_records = self.records
+        # 先只搜索每隔两条的记录，使缓存命中分散在输入中间
+        self.records = all_records[1::3]
+        self.run_blast('partial.txt', cache=cache)
+        self.records = all_records
+        os.remove(self.log_path)
+        for shards in (1, 3):
+            with self.subTest(shards=shards):
+                output_file, _ = self.run_blast(f'cached_{shards}.txt', shards=shards, cache=cache)
+                self.assertEqual(parse_report(output_file), parse_report(single_file))
+                self.assertTrue(read_text(output_file).endswith(f"# BLAST processed {len(all_records)} queries\n"))
+        searched = {query for call in self.calls() for query in call['queries']}
+        self.assertEqual(searched, {seq_id for seq_id, _ in all_records} - {seq_id for seq_id, _ in all_records[1::3]})
+
+    def test_more_shards_than_records(self):
+        """分片数多于查询数时每个分片一条查询"""
+        self.records = self.records[:3]
+        self.run_blast('few.txt', shards=8)
+        self.assertEqual([len(call['queries']) for call in self.calls()], [1, 1, 1])
+
+    def test_failed_shard_is_reported(self):
+        """某个分片的blastn失败时返回失败，错误信息指明分片、返回码和stderr"""
+        output_file = os.path.join(self.work_dir, 'failed.txt')
+        runner = BlastRunner(FAKE_BLASTN, 'fake_db', shards=3)
+        with mock.patch.dict(os.environ, {'FAKE_BLASTN_FAIL_QUERY': self.records[10][0]}):
+            success, error = runner.run(self.records, output_file)
+        self.assertFalse(success)
+        self.assertIn("分片 2", error)
+        self.assertIn("返回码 2", error)
+        self.assertIn(self.records[10][0], error)
+        self.assertNotIn("分片 1", error)
+        self.assertFalse(os.path.exists(output_file))
+
+    def test_failed_shard_is_not_cached(self):
+        """分片在查询块中途失败时，该分片的结果都不写入缓存，下次运行重新搜索"""
+        cache = BlastHitCache(os.path.join(self.work_dir, 'blast_cache.sqlite'))
+        db_path = os.path.join(self.work_dir, 'fake_db')
+        runner = BlastRunner(FAKE_BLASTN, db_path, shards=3, cache=cache)
+        fingerprint = BlastHitCache.db_fingerprint(db_path)
+        params = runner.cache_params()
+        # 第2个分片（第9~16条）中选一条至少有2个命中的查询，使中断时只输出了部分命中
+        failed_id, failed_sequence = next(
+            (seq_id, sequence) for seq_id, sequence in self.records[8:16]
+            if len(fake_blastn.fake_hits(seq_id, sequence, 30)) >= 2)
+        with mock.patch.dict(os.environ, {'FAKE_BLASTN_FAIL_QUERY': failed_id}):
+            success, error = runner.run(self.records, os.path.join(self.work_dir, 'failed.txt'))
+        self.assertFalse(success)
+        self.assertIn(failed_id, error)
+
+        cached = cache.lookup([sequence for _, sequence in self.records], fingerprint, params)
+        self.assertNotIn(failed_sequence, cached)
+        # 失败分片中已完整输出的查询也不缓存，正常结束的分片全部缓存
+        self.assertEqual(set(cached), {sequence for _, sequence in self.records[:8] + self.records[16:]})
+
+        os.remove(self.log_path)
+        success, error = runner.run(self.records, os.path.join(self.work_dir, 'retry.txt'))
+        self.assertTrue(success, error)
+        searched = [query for call in self.calls() for query in call['queries']]
+        self.assertEqual(searched, [seq_id for seq_id, _ in self.records[8:16]])
+        hits = cache.lookup([failed_sequence], fingerprint, params)[failed_sequence]
+        self.assertEqual(len(hits), len(fake_blastn.fake_hits(failed_id, failed_sequence, 30)))
+
+    def interrupted_query(self, records):
+        """records中第一个之后、至少有2个命中的查询下标，中断时只输出了它的部分命中"""
+        return next(index for index, (seq_id, sequence) in enumerate(records)
+                    if index > 0 and len(fake_blastn.fake_hits(seq_id, sequence, 30)) >= 2)
+
+    def test_crashed_shard_does_not_deliver_partial_query(self):
+        """blastn在查询块中途退出时，读到输出末尾的不完整查询块不交给result_callback"""
+        failed = self.interrupted_query(self.records)
+        results = {}
+        runner = BlastRunner(FAKE_BLASTN, 'fake_db')
+        with mock.patch.dict(os.environ, {'FAKE_BLASTN_FAIL_QUERY': self.records[failed][0]}):
+            success, _ = runner.run(self.records, os.path.join(self.work_dir, 'failed.txt'),
+                                    result_callback=lambda query, hits: results.__setitem__(query, hits))
+        self.assertFalse(success)
+        self.assertEqual(list(results), [seq_id for seq_id, _ in self.records[:failed]])
+
+    def test_cancel_does_not_deliver_interrupted_query(self):
+        """取消时被终止的分片中正在输出的查询既不交给result_callback也不写入缓存"""
+        cache = BlastHitCache(os.path.join(self.work_dir, 'blast_cache.sqlite'))
+        db_path = os.path.join(self.work_dir, 'fake_db')
+        runner = BlastRunner(FAKE_BLASTN, db_path, shards=2, cache=cache)
+        # 第1个分片为前12条
+        hang = self.interrupted_query(self.records[:12])
+        hang_id = self.records[hang][0]
+        job = JobControl("BLAST")
+        timer = threading.Timer(0.3, job.cancel)
+        self.addCleanup(timer.cancel)
+        results = {}
+
+        def on_result(query, hits):
+            results[query] = hits
+            # 上一条查询交付时fake blastn已输出了挂起查询的部分命中，稍后取消
+            if query == self.records[hang - 1][0]:
+                timer.start()
+
+        with mock.patch.dict(os.environ, {'FAKE_BLASTN_HANG_QUERY': hang_id}):
+            success, error = runner.run(self.records, os.path.join(self.work_dir, 'cancelled.txt'),
+                                        result_callback=on_result, job=job)
+        self.assertFalse(success)
+        self.assertIn("取消", error)
+        self.assertNotIn(hang_id, results)
+        self.assertTrue(all(seq_id in results for seq_id, _ in self.records[:hang]))
+        cached = cache.lookup([sequence for _, sequence in self.records[:12]],
+                              BlastHitCache.db_fingerprint(db_path), runner.cache_params())
+        self.assertEqual(cached, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
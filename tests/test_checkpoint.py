@@ -0,0 +1,218 @@
+"""断点续跑的测试：中断后续跑的输出与不中断时完全相同，参数不一致的检查点拒绝续跑且保留
+
+运行: python -m pytest tests
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from fish_engine import BlastRunner, DNAProbeAnalyzer, JobControl, RunCheckpoint
+import fake_blastn
+
+
+FAKE_BLASTN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_blastn.py')
+
+
+class InterruptingJob(JobControl):
+    """经过stop_after个检查点后取消，模拟用户在分析中途点击取消"""
+
+    def __init__(self, stop_after):
+        super().__init__("探针分析", '条序列')
+        self.stop_after = stop_after
+        self.calls = 0
+
+    def checkpoint(self):
+        self.calls += 1
+        if self.calls > self.stop_after:
+            self.cancel()
+        return super().checkpoint()
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class StreamingResumeTest(unittest.TestCase):
+    CHUNKSIZE = 10
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="test_checkpoint_")
+        rng = random.Random(21)
+        sequences = [''.join(rng.choice('ACGT') for _ in range(rng.randint(15, 30))) for _ in range(37)]
+        # 混入无效序列，统计中的无效计数也要正确续上
+        sequences[4] = 'ACGTXXACGT'
+        sequences[23] = ''
+        self.input_file = os.path.join(self.work_dir, 'probes.csv')
+        pd.DataFrame({'id': [f"p{index}" for index in range(len(sequences))],
+                      'sequence': sequences}).to_csv(self.input_file, index=False)
+        self.output_file = os.path.join(self.work_dir, 'results.csv')
+        self.checkpoint_dir = RunCheckpoint.default_dir(self.output_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def config(self, output_file, **overrides):
+        config = {'input_file': self.input_file, 'output_file': output_file, 'tm_method': 'santalucia',
+                  'stream_chunksize': self.CHUNKSIZE, 'workers': 1}
+        config.update(overrides)
+        return config
+
+    def reference(self):
+        """不中断、不记录检查点的输出和统计"""
+        analyzer = DNAProbeAnalyzer()
+        reference_file = os.path.join(self.work_dir, 'reference.csv')
+        self.assertTrue(analyzer.analyze_probes(self.config(reference_file)))
+        return read_bytes(reference_file), analyzer.summary
+
+    def interrupt(self, stop_after):
+        """带检查点运行并在第stop_after条序列之后取消"""
+        success = DNAProbeAnalyzer().analyze_probes(
+            self.config(self.output_file, checkpoint_dir=self.checkpoint_dir), job=InterruptingJob(stop_after))
+        self.assertFalse(success)
+        self.assertTrue(RunCheckpoint.exists(self.checkpoint_dir))
+
+    def test_resume_matches_uninterrupted_run(self):
+        """在第2块和第4块中途各中断一次，续跑后的输出文件和统计与不中断时相同"""
+        expected, expected_summary = self.reference()
+        self.interrupt(stop_after=self.CHUNKSIZE + 3)
+        self.assertEqual(RunCheckpoint.read_manifest(self.checkpoint_dir)['state']['rows'], self.CHUNKSIZE)
+        # 续跑时又一次中断：已完成1块，再完成2块后在第4块中途取消
+        success = DNAProbeAnalyzer().analyze_probes(
+            self.config(self.output_file, checkpoint_dir=self.checkpoint_dir, resume=True),
+            job=InterruptingJob(2 * self.CHUNKSIZE + 5))
+        self.assertFalse(success)
+        self.assertEqual(RunCheckpoint.read_manifest(self.checkpoint_dir)['state']['rows'], 3 * self.CHUNKSIZE)
+
+        analyzer = DNAProbeAnalyzer()
+        self.assertTrue(analyzer.analyze_probes(
+            self.config(self.output_file, checkpoint_dir=self.checkpoint_dir, resume=True)))
+        self.assertEqual(read_bytes(self.output_file), expected)
+        self.assertEqual(analyzer.summary, expected_summary)
+        self.assertFalse(os.path.exists(self.checkpoint_dir))
+
+    def test_mismatched_parameters_are_refused(self):
+        """Tm方法或分块大小与检查点不一致时拒绝续跑，检查点和已写出的结果保持不变"""
+        self.interrupt(stop_after=self.CHUNKSIZE + 3)
+        manifest = RunCheckpoint.read_manifest(self.checkpoint_dir)
+        partial = read_bytes(self.output_file)
+        for overrides in ({'tm_method': 'wallace'}, {'stream_chunksize': self.CHUNKSIZE + 1}):
+            logs = []
+            success = DNAProbeAnalyzer().analyze_probes(
+                self.config(self.output_file, checkpoint_dir=self.checkpoint_dir, resume=True, **overrides),
+                log_callback=logs.append)
+            with self.subTest(overrides=overrides):
+                self.assertFalse(success)
+                self.assertTrue(any("不一致" in message for message in logs))
+                self.assertEqual(RunCheckpoint.read_manifest(self.checkpoint_dir), manifest)
+                self.assertEqual(read_bytes(self.output_file), partial)
+
+        # 参数一致时仍可以续跑
+        expected, _ = self.reference()
+        self.assertTrue(DNAProbeAnalyzer().analyze_probes(
+            self.config(self.output_file, checkpoint_dir=self.checkpoint_dir, resume=True)))
+        self.assertEqual(read_bytes(self.output_file), expected)
+
+
+@unittest.skipIf(os.name == 'nt', "fake blastn依赖shebang直接执行")
+class BlastResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="test_checkpoint_blast_")
+        self.log_path = os.path.join(self.work_dir, 'calls.jsonl')
+        self.env = mock.patch.dict(os.environ, {'FAKE_BLASTN_LOG': self.log_path})
+        self.env.start()
+        rng = random.Random(8)
+        self.records = [(f"probe_{index + 1}", ''.join(rng.choice('ACGT') for _ in range(rng.randint(18, 30))))
+                        for index in range(30)]
+        self.db_path = os.path.join(self.work_dir, 'fake_db')
+        self.output_file = os.path.join(self.work_dir, 'blast.txt')
+        self.checkpoint_dir = RunCheckpoint.default_dir(self.output_file)
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def searched(self):
+        """本次测试中交给fake blastn的全部查询ID（读取后清空调用记录）"""
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path, 'r') as f:
+            queries = [query for line in f for query in json.loads(line)['queries']]
+        os.remove(self.log_path)
+        return queries
+
+    def reference(self):
+        reference_file = os.path.join(self.work_dir, 'reference.txt')
+        success, error = BlastRunner(FAKE_BLASTN, self.db_path).run(self.records, reference_file)
+        self.assertTrue(success, error)
+        self.searched()
+        return read_bytes(reference_file)
+
+    def interrupt(self, runner):
+        """在第一个分片的某条查询中途挂起时取消，返回挂起的查询在records中的下标"""
+        hang = next(index for index, (seq_id, sequence) in enumerate(self.records[:10])
+                    if index > 2 and len(fake_blastn.fake_hits(seq_id, sequence, 30)) >= 2)
+        job = JobControl("BLAST")
+        timer = threading.Timer(0.3, job.cancel)
+        self.addCleanup(timer.cancel)
+
+        def on_result(query, hits):
+            if query == self.records[hang - 1][0]:
+                timer.start()
+
+        with mock.patch.dict(os.environ, {'FAKE_BLASTN_HANG_QUERY': self.records[hang][0]}):
+            success, error = runner.run(self.records, self.output_file, result_callback=on_result, job=job,
+                                        checkpoint_dir=self.checkpoint_dir)
+        self.assertFalse(success)
+        self.assertIn("取消", error)
+        self.assertTrue(RunCheckpoint.exists(self.checkpoint_dir))
+        self.searched()
+        return hang
+
+    def test_resume_matches_uninterrupted_run(self):
+        """分片运行中途取消后续跑，只搜索未完成的查询，合并输出与不中断的单次运行逐字节相同"""
+        expected = self.reference()
+        runner = BlastRunner(FAKE_BLASTN, self.db_path, shards=3)
+        hang = self.interrupt(runner)
+
+        results = {}
+        success, error = runner.run(self.records, self.output_file,
+                                    result_callback=lambda query, hits: results.__setitem__(query, hits),
+                                    checkpoint_dir=self.checkpoint_dir, resume=True)
+        self.assertTrue(success, error)
+        self.assertEqual(read_bytes(self.output_file), expected)
+        self.assertEqual(set(results), {seq_id for seq_id, _ in self.records})
+        # 挂起查询之前的查询已在第一个分片的输出中完成，续跑时不再搜索
+        searched = self.searched()
+        self.assertIn(self.records[hang][0], searched)
+        self.assertFalse(set(searched) & {seq_id for seq_id, _ in self.records[:hang]})
+        self.assertFalse(os.path.exists(self.checkpoint_dir))
+
+    def test_mismatched_parameters_are_refused(self):
+        """BLAST参数与检查点不一致时返回失败，检查点目录保持不变"""
+        self.interrupt(BlastRunner(FAKE_BLASTN, self.db_path, shards=3))
+        manifest = RunCheckpoint.read_manifest(self.checkpoint_dir)
+        files = sorted(os.listdir(self.checkpoint_dir))
+        for runner, records in ((BlastRunner(FAKE_BLASTN, self.db_path, shards=3, evalue="0.01"), self.records),
+                                (BlastRunner(FAKE_BLASTN, self.db_path, shards=3), self.records[1:])):
+            success, error = runner.run(records, self.output_file, checkpoint_dir=self.checkpoint_dir, resume=True)
+            with self.subTest(evalue=runner.evalue, records=len(records)):
+                self.assertFalse(success)
+                self.assertIn("不一致", error)
+                self.assertEqual(RunCheckpoint.read_manifest(self.checkpoint_dir), manifest)
+                self.assertEqual(sorted(os.listdir(self.checkpoint_dir)), files)
+        self.assertEqual(self.searched(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""命令行入口的测试
+
+运行: python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fish_cli
+from fish_engine import BlastHitCache, parse_blast_hit
+
+
+def make_hits(query, count):
+    return [parse_blast_hit([query, f"NM_{rank:03d}.1", "100.000", "20", "0", "0", "1", "20", "1", "20",
+                             "1.00e-05", "40.1"]) for rank in range(count)]
+
+
+class BlastCacheCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="test_fish_cli_")
+        # 缓存目录跟随XDG_CACHE_HOME（Windows为LOCALAPPDATA），指向临时目录以免动到用户缓存
+        self.env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.work_dir, 'LOCALAPPDATA': self.work_dir})
+        self.env.start()
+        self.db_a = os.path.join(self.work_dir, 'db_a')
+        self.db_b = os.path.join(self.work_dir, 'db_b')
+        cache = BlastHitCache()
+        for db_path, sequences in ((self.db_a, ['ACGTACGTAC', 'GGGCCCAATT']), (self.db_b, ['TTTTGGGGAA'])):
+            fingerprint = BlastHitCache.db_fingerprint(db_path)
+            for index, sequence in enumerate(sequences):
+                cache.put(sequence, fingerprint, 'params', db_path, make_hits(f"q{index}", index + 1))
+        cache.flush()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def cached(self, db_path, sequences):
+        return set(BlastHitCache().lookup(sequences, BlastHitCache.db_fingerprint(db_path), 'params'))
+
+    def test_invalidate_one_database(self):
+        """--db只删除该数据库的条目"""
+        self.assertEqual(fish_cli.main(['blast-cache', 'invalidate', '--db', self.db_a]), 0)
+        self.assertEqual(self.cached(self.db_a, ['ACGTACGTAC', 'GGGCCCAATT']), set())
+        self.assertEqual(self.cached(self.db_b, ['TTTTGGGGAA']), {'TTTTGGGGAA'})
+
+    def test_invalidate_all(self):
+        """不指定--db时清空全部"""
+        self.assertEqual(fish_cli.main(['blast-cache', 'invalidate']), 0)
+        self.assertEqual(self.cached(self.db_a, ['ACGTACGTAC', 'GGGCCCAATT']), set())
+        self.assertEqual(self.cached(self.db_b, ['TTTTGGGGAA']), set())
+
+    def test_reports_removed_count(self):
+        with mock.patch.object(fish_cli, 'log') as log:
+            fish_cli.main(['blast-cache', 'invalidate', '--db', self.db_a])
+        self.assertIn("2 条", log.call_args[0][0])
+
+    def test_requires_action(self):
+        with self.assertRaises(SystemExit), mock.patch('sys.stderr'):
+            fish_cli.main(['blast-cache'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""BLAST结果合并的测试：向量化的merge_blast_results与原iterrows逐行填充的输出完全相同
+
+运行: python -m pytest tests
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from fish_engine import merge_blast_results
+
+
+def baseline_merge(tm_results_file, blast_results_file, output_file):
+    """原实现：逐行解析BLAST报告（保留原始文本），按iterrows逐个单元格填充前5个命中"""
+    tm_df = pd.read_csv(tm_results_file)
+    blast_data = {}
+    current_query = None
+    current_hits = []
+    hit_counts = {}
+    with open(blast_results_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('# Query:'):
+                if current_query and current_hits:
+                    blast_data[current_query] = current_hits[:5]
+                    hit_counts[current_query] = len(current_hits)
+                current_query = line.split()[2]
+                current_hits = []
+            elif line.startswith('#') or not line:
+                continue
+            else:
+                parts = line.split('\t')
+                if len(parts) >= 12:
+                    current_hits.append({'subject': parts[1], 'identity': parts[2],
+                                         'evalue': parts[10], 'bitscore': parts[11]})
+        if current_query and current_hits:
+            blast_data[current_query] = current_hits[:5]
+            hit_counts[current_query] = len(current_hits)
+
+    tm_df['blast_hits_count'] = tm_df['id'].map(lambda x: hit_counts.get(x, 0))
+    for i in range(1, 6):
+        tm_df[f'blast_hit_{i}'] = ''
+        tm_df[f'blast_identity_{i}'] = ''
+        tm_df[f'blast_evalue_{i}'] = ''
+        tm_df[f'blast_bitscore_{i}'] = ''
+    for idx, row in tm_df.iterrows():
+        query_id = row['id']
+        if query_id in blast_data:
+            for i, hit in enumerate(blast_data[query_id]):
+                if i < 5:
+                    tm_df.at[idx, f'blast_hit_{i+1}'] = hit['subject']
+                    tm_df.at[idx, f'blast_identity_{i+1}'] = hit['identity']
+                    tm_df.at[idx, f'blast_evalue_{i+1}'] = hit['evalue']
+                    tm_df.at[idx, f'blast_bitscore_{i+1}'] = hit['bitscore']
+    tm_df.to_csv(output_file, index=False)
+
+
+def hit_line(query, rng, rank):
+    """一行outfmt 7命中，数值列使用BLAST风格的文本（如100.000、1.23e-05、0.0）"""
+    evalue = rng.choice(['0.0', f"{rng.uniform(1, 9):.2f}e-{rng.randint(3, 12):02d}", '0.051'])
+    return '\t'.join([query, f"NM_{rng.randint(1, 99999):06d}.{rank}", f"{rng.uniform(75, 100):.3f}", '20', '0',
+                      '0', '1', '20', str(rng.randint(1, 5000)), str(rng.randint(1, 5000)), evalue,
+                      f"{rng.uniform(20, 45):.1f}"])
+
+
+def report_text(hit_numbers, rng):
+    """{查询ID: 命中数}对应的outfmt 7报告"""
+    lines = []
+    for query, count in hit_numbers.items():
+        lines += ["# BLASTN 2.17.0+", f"# Query: {query}", "# Database: fake_db"]
+        if count:
+            lines += ["# Fields: query acc.ver, subject acc.ver, % identity", f"# {count} hits found"]
+        else:
+            lines.append("# 0 hits found")
+        lines += [hit_line(query, rng, rank) for rank in range(1, count + 1)]
+    lines.append(f"# BLAST processed {len(hit_numbers)} queries")
+    return '\n'.join(lines) + '\n'
+
+
+class MergeBlastResultsTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="test_merge_blast_")
+        self.rng = random.Random(9)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def assert_same_as_baseline(self, ids, hit_numbers):
+        """两种实现对同一Tm结果和BLAST报告写出的CSV逐字节相同，返回合并结果"""
+        pd.DataFrame({'id': ids, 'sequence': ['ACGT' * 5] * len(ids),
+                      'tm': [round(self.rng.uniform(50, 70), 2) for _ in ids]}).to_csv(self.path('tm.csv'), index=False)
+        with open(self.path('blast.txt'), 'w') as f:
+            f.write(report_text(hit_numbers, self.rng))
+        merge_blast_results(self.path('tm.csv'), self.path('blast.txt'), self.path('merged.csv'))
+        baseline_merge(self.path('tm.csv'), self.path('blast.txt'), self.path('baseline.csv'))
+        with open(self.path('merged.csv'), 'rb') as f:
+            merged = f.read()
+        with open(self.path('baseline.csv'), 'rb') as f:
+            self.assertEqual(merged, f.read())
+        return pd.read_csv(self.path('merged.csv'), dtype=str, keep_default_na=False)
+
+    def test_mixed_hit_counts(self):
+        """0个、少于5个、恰好5个、多于5个命中，以及报告中没有的查询"""
+        ids = [f"probe_{index}" for index in range(1, 9)]
+        hit_numbers = {'probe_1': 0, 'probe_2': 1, 'probe_3': 3, 'probe_4': 5, 'probe_5': 12, 'probe_7': 2,
+                       'probe_8': 0}
+        merged = self.assert_same_as_baseline(ids, hit_numbers)
+        self.assertEqual(merged['blast_hits_count'].tolist(), ['0', '1', '3', '5', '12', '0', '2', '0'])
+        self.assertEqual(merged.loc[2, 'blast_hit_4'], '')
+        self.assertNotEqual(merged.loc[4, 'blast_bitscore_5'], '')
+
+    def test_column_order(self):
+        """Tm结果的列在前，随后是命中总数和前5个命中各4列（按命中分组）"""
+        merged = self.assert_same_as_baseline(['probe_1', 'probe_2'], {'probe_2': 7})
+        expected = ['id', 'sequence', 'tm', 'blast_hits_count']
+        for i in range(1, 6):
+            expected += [f'blast_hit_{i}', f'blast_identity_{i}', f'blast_evalue_{i}', f'blast_bitscore_{i}']
+        self.assertEqual(merged.columns.tolist(), expected)
+
+    def test_no_hits(self):
+        """报告中所有查询都没有命中，或报告为空"""
+        ids = ['probe_1', 'probe_2', 'probe_3']
+        self.assert_same_as_baseline(ids, {'probe_1': 0, 'probe_2': 0})
+        merged = self.assert_same_as_baseline(ids, {})
+        self.assertEqual(merged['blast_hits_count'].tolist(), ['0', '0', '0'])
+
+    def test_partial_hits_random(self):
+        """随机的命中数和部分缺失的查询"""
+        for trial in range(5):
+            ids = [f"seq{trial}_{index}" for index in range(40)]
+            hit_numbers = {query: self.rng.choice([0, 1, 2, 4, 5, 6, 30]) for query in ids
+                           if self.rng.random() < 0.8}
+            with self.subTest(trial=trial):
+                self.assert_same_as_baseline(ids, hit_numbers)
+
+
+if __name__ == "__main__":
+    unittest.main()
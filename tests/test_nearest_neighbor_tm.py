@@ -0,0 +1,78 @@
+"""前缀和最近邻Tm的测试：每个窗口的结果与Bio.SeqUtils.MeltingTemp.Tm_NN在容差内一致
+
+运行: python -m pytest tests
+"""
+import math
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Bio.Seq import Seq
+from Bio.SeqUtils import MeltingTemp as mt
+
+from fish_engine import NearestNeighborTm
+
+
+# 与Tm_NN逐窗口计算的最大允许偏差（°C）；两者只有浮点求和顺序不同
+TOLERANCE = 1e-6
+# (tm_method, Tm_NN使用的参数表)
+METHODS = [('santalucia', mt.DNA_NN1), ('nn', mt.DNA_NN3)]
+
+
+def probe_of(fragment):
+    """RNA/DNA片段对应的DNA探针（反向互补）"""
+    return str(Seq(fragment.replace('U', 'T')).reverse_complement())
+
+
+class NearestNeighborTmTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(5)
+
+    def random_sequence(self, length, alphabet='ACGTU'):
+        return ''.join(self.rng.choice(alphabet) for _ in range(length))
+
+    def test_matches_tm_nn(self):
+        """santalucia（DNA_NN1）和nn（DNA_NN3）下所有窗口的Tm与Tm_NN一致"""
+        targets = [self.random_sequence(300), self.random_sequence(300, 'AT'), self.random_sequence(300, 'GC'),
+                   'A' * 40 + 'T' * 40, 'ACGU' * 30]
+        for method, table in METHODS:
+            for target in targets:
+                calculator = NearestNeighborTm.for_method(target, method)
+                for length in (2, 5, 18, 20, 25, 40):
+                    tms = calculator.window_tm_array(length)
+                    self.assertEqual(len(tms), len(target) - length + 1)
+                    for position, tm in enumerate(tms):
+                        expected = mt.Tm_NN(Seq(probe_of(target[position:position + length])), nn_table=table)
+                        with self.subTest(method=method, length=length, position=position):
+                            self.assertLess(abs(tm - expected), TOLERANCE)
+
+    def test_non_acgt_windows_are_nan(self):
+        """含N的窗口为NaN（交由Biopython逐窗口处理），其余窗口不受影响"""
+        target = self.random_sequence(60) + 'N' + self.random_sequence(60)
+        for method, table in METHODS:
+            tms = NearestNeighborTm.for_method(target, method).window_tm_array(20)
+            for position, tm in enumerate(tms):
+                with self.subTest(method=method, position=position):
+                    if 41 <= position <= 60:
+                        self.assertTrue(math.isnan(tm))
+                    else:
+                        expected = mt.Tm_NN(Seq(probe_of(target[position:position + 20])), nn_table=table)
+                        self.assertLess(abs(tm - expected), TOLERANCE)
+
+    def test_short_targets(self):
+        """目标序列短于窗口或窗口长度小于2时返回空数组或NaN"""
+        calculator = NearestNeighborTm.for_method('ACGTACGT', 'santalucia')
+        self.assertEqual(len(calculator.window_tm_array(9)), 0)
+        self.assertTrue(all(math.isnan(tm) for tm in calculator.window_tm_array(1)))
+
+    def test_unsupported_methods(self):
+        """wallace和gc方法没有增量实现"""
+        for method in ('wallace', 'gc'):
+            self.assertIsNone(NearestNeighborTm.for_method('ACGT' * 10, method))
+
+
+if __name__ == "__main__":
+    unittest.main()
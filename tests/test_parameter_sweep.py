@@ -0,0 +1,90 @@
+"""参数扫描的测试：ParameterSweep.run每一行与对同一组参数直接调用design_probes的结果一致
+
+运行: python -m pytest tests
+"""
+import math
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fish_engine import ParameterSweep, RNAProbeDesigner
+
+
+def random_target(rng, length):
+    """随机RNA目标序列，夹杂同聚物、复制片段和少量N"""
+    bases = []
+    while len(bases) < length:
+        roll = rng.random()
+        if roll < 0.01:
+            bases.append('N')
+        elif roll < 0.03:
+            bases.extend(rng.choice('ACGU') * rng.randint(3, 6))
+        elif roll < 0.04 and len(bases) > 30:
+            start = rng.randrange(len(bases) - 25)
+            bases.extend(bases[start:start + rng.randint(8, 25)])
+        else:
+            bases.append(rng.choice('ACGU'))
+    return ''.join(bases[:length])
+
+
+class ParameterSweepTest(unittest.TestCase):
+    BASE = {
+        'probe_length': 20, 'min_gc': 35.0, 'max_gc': 65.0, 'min_tm': 50.0, 'max_tm': 75.0, 'spacing': 3,
+        'min_complexity': 0.8, 'filter_repeats': True, 'check_specificity': False, 'tm_method': 'santalucia',
+        'max_homopolymer_length': 3, 'placement': 'greedy',
+    }
+
+    def setUp(self):
+        self.designer = RNAProbeDesigner()
+        self.target = random_target(random.Random(17), 1500)
+
+    def assert_rows_match_design(self, parameter_sets):
+        table = ParameterSweep(self.designer, self.target).run(parameter_sets)
+        self.assertEqual(len(table), len(parameter_sets))
+        for parameters, (_, row) in zip(parameter_sets, table.iterrows()):
+            probes = self.designer.design_probes(self.target, dict(parameters))
+            with self.subTest(**{key: parameters[key] for key in ParameterSweep.SWEEP_FIELDS}):
+                self.assertEqual(row['probes'], len(probes))
+                for field in ParameterSweep.SWEEP_FIELDS:
+                    self.assertEqual(row[field], parameters[field])
+                if not probes:
+                    self.assertTrue(math.isnan(row['mean_tm']))
+                    continue
+                tms = [probe['tm'] for probe in probes]
+                self.assertAlmostEqual(row['mean_tm'], sum(tms) / len(tms), places=9)
+                self.assertAlmostEqual(row['mean_gc'], sum(probe['gc_content'] for probe in probes) / len(probes),
+                                       places=9)
+                self.assertAlmostEqual(row['min_probe_tm'], min(tms), places=9)
+                self.assertAlmostEqual(row['max_probe_tm'], max(tms), places=9)
+
+    def test_grid_matches_design_probes(self):
+        """探针长度、GC/Tm范围、间距、重复过滤、Tm方法和放置策略的组合"""
+        parameter_sets = ParameterSweep.expand_grid(self.BASE, {
+            'probe_length': [18, 25],
+            ('min_gc', 'max_gc'): [(35.0, 65.0), (45.0, 55.0)],
+            ('min_tm', 'max_tm'): [(50.0, 75.0), (58.0, 64.0)],
+            'spacing': [0, 4],
+            'filter_repeats': [True, False],
+            'placement': ['greedy', 'max_count', 'tm_uniform'],
+        })
+        self.assert_rows_match_design(parameter_sets)
+
+    def test_other_tm_methods(self):
+        """wallace、nn和逐窗口调用Biopython（native_tm关闭）"""
+        parameter_sets = ParameterSweep.expand_grid(self.BASE, {
+            'tm_method': ['wallace', 'nn', 'santalucia'],
+            'placement': ['greedy', 'max_count'],
+        })
+        parameter_sets += [dict(self.BASE, native_tm=False), dict(self.BASE, min_complexity=0.9, spacing=10)]
+        self.assert_rows_match_design(parameter_sets)
+
+    def test_no_probes(self):
+        """没有合格窗口时探针数为0，平均值为NaN"""
+        self.assert_rows_match_design([dict(self.BASE, min_tm=90.0, max_tm=95.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
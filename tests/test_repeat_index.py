@@ -0,0 +1,82 @@
+"""k-mer重复索引的测试：RepeatIndex与原str.count/str.find重复判定逐窗口一致
+
+运行: python -m pytest tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fish_engine import RNAProbeDesigner, RepeatIndex
+
+
+class RepeatIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.designer = RNAProbeDesigner()
+
+    def assert_matches_baseline(self, target, length, k=6):
+        """所有窗口（包括序列末尾的最后一个窗口）的索引判定与原has_repeats相同"""
+        index = RepeatIndex(target, k=k)
+        mask = index.repeat_mask(length)
+        self.assertEqual(len(mask), max(len(target) - length + 1, 0))
+        for start in range(len(target) - length + 1):
+            expected = self.designer.has_repeats(target[start:start + length], target, min_repeat_length=k)
+            with self.subTest(target=target if len(target) < 60 else len(target), length=length, start=start):
+                self.assertEqual(bool(mask[start]), expected)
+                self.assertEqual(index.has_repeats(start, length), expected)
+
+    def test_random_targets(self):
+        """低复杂度字母表下重复很多，覆盖内部重复和其他位置重复两种情况"""
+        rng = random.Random(3)
+        for alphabet in ('AC', 'ACG', 'ACGT', 'ACGU'):
+            for target_length in (30, 200):
+                target = ''.join(rng.choice(alphabet) for _ in range(target_length))
+                for length in (4, 6, 7, 12, 20):
+                    for k in (4, 6):
+                        self.assert_matches_baseline(target, length, k)
+
+    def test_overlapping_kmers_inside_window(self):
+        """窗口内k-mer重叠出现不算重复，不重叠地出现两次才算（str.count的语义）"""
+        target = 'GC' + 'A' * 11 + 'GCTG'
+        index = RepeatIndex(target, k=6)
+        # 'A'*11中'AAAAAA'只能不重叠地数到1次
+        self.assertFalse(index.has_internal_repeat(2, 11))
+        self.assertFalse(self.designer.has_repeats('A' * 11, target))
+        # 'A'*12中可数到2次
+        longer = 'GC' + 'A' * 12 + 'GCTG'
+        self.assertTrue(RepeatIndex(longer, k=6).has_internal_repeat(2, 12))
+        self.assertTrue(self.designer.has_repeats('A' * 12, longer))
+        for length in (7, 11, 12, 13):
+            self.assert_matches_baseline(longer, length)
+
+    def test_overlapping_occurrences_elsewhere(self):
+        """窗口在目标序列中重叠地再次出现（str.find从下一位置继续查找）也算重复"""
+        target = 'GGACACACTT'
+        index = RepeatIndex(target, k=6)
+        # 'ACAC'出现在位置2和4，两次出现相互重叠
+        self.assertTrue(index.has_repeats(2, 4))
+        self.assertTrue(index.has_repeats(4, 4))
+        self.assertFalse(index.has_repeats(0, 4))
+        self.assert_matches_baseline(target, 4)
+
+    def test_last_window(self):
+        """序列末尾的窗口与前面的片段相同时判定为重复"""
+        window = 'ACGTTGCA'
+        target = 'TT' + window + 'GGGCCC' + window
+        index = RepeatIndex(target, k=6)
+        last = len(target) - len(window)
+        self.assertTrue(index.repeat_mask(len(window))[last])
+        self.assertTrue(index.has_repeats(last, len(window)))
+        self.assert_matches_baseline(target, len(window))
+
+    def test_window_longer_than_target(self):
+        """窗口比目标序列长时没有窗口"""
+        index = RepeatIndex('ACGTAC', k=6)
+        self.assertEqual(len(index.repeat_mask(10)), 0)
+        self.assertFalse(index.has_repeats(0, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""最优探针布局的测试：select_windows的间距约束、最优探针数/得分和并列时的取舍
+
+运行: python -m pytest tests
+"""
+import itertools
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from fish_engine import RNAProbeDesigner
+
+
+def select(starts, tms, min_gap, **options):
+    return RNAProbeDesigner.select_windows(np.array(starts), tms, min_gap, **options)
+
+
+def feasible(starts, chosen, min_gap):
+    return all(starts[b] - starts[a] >= min_gap for a, b in zip(chosen, chosen[1:]))
+
+
+def brute_force(starts, tms, min_gap, objective, target_tm, tm_tolerance):
+    """枚举所有满足间距约束的子集，返回最优目标值：max_count为(探针数, -总偏差)，tm_uniform为总得分"""
+    best = None
+    for size in range(len(starts) + 1):
+        for chosen in itertools.combinations(range(len(starts)), size):
+            if not feasible(starts, chosen, min_gap):
+                continue
+            deviations = [abs(tms[index] - target_tm) for index in chosen]
+            if objective == 'max_count':
+                value = (len(chosen), -sum(deviations))
+            else:
+                value = sum(1.0 - dev / tm_tolerance for dev in deviations)
+            if best is None or value > best:
+                best = value
+    return best
+
+
+class SelectWindowsTest(unittest.TestCase):
+    def test_spacing(self):
+        """起点间距小于min_gap的窗口不能同时入选"""
+        self.assertEqual(select([0, 3, 6], [60, 60, 60], 5), [0, 2])
+        self.assertEqual(select([0, 3, 6], [60, 60, 60], 7), [0])
+
+    def test_gap_boundary(self):
+        """间距恰好等于min_gap时不冲突"""
+        self.assertEqual(select([0, 4, 5], [60, 60, 60], 5), [0, 2])
+        self.assertEqual(select([0, 5, 10], [60, 60, 60], 5), [0, 1, 2])
+
+    def test_max_count_then_smallest_deviation(self):
+        """先保证探针数最多，在同样多的布局中选Tm总偏差最小的（不一定从第一个窗口开始）"""
+        self.assertEqual(select([0, 2, 6, 8], [70, 60, 70, 60], 6, target_tm=60.0), [1, 3])
+        self.assertEqual(select([0, 4, 8], [70, 60, 70], 5, target_tm=60.0), [0, 2])
+
+    def test_count_tie_prefers_smaller_deviation(self):
+        """探针数相同时取Tm总偏差小的，偏差也相同时取更靠前的窗口"""
+        self.assertEqual(select([0, 1], [62, 58], 5, target_tm=60.0), [0])
+        self.assertEqual(select([0, 1], [65, 60], 5, target_tm=60.0), [1])
+        self.assertEqual(select([0, 1], [60, 65], 5, target_tm=60.0), [0])
+
+    def test_tm_uniform_trades_count_for_uniformity(self):
+        """tm_uniform可以用一个Tm正合适的探针代替两个Tm偏离较大的探针"""
+        starts, tms = [0, 3, 6], [75, 60, 75]
+        self.assertEqual(select(starts, tms, 5, objective='max_count', target_tm=60.0), [0, 2])
+        self.assertEqual(select(starts, tms, 5, objective='tm_uniform', target_tm=60.0, tm_tolerance=15.0), [1])
+
+    def test_tm_uniform_skips_negative_gain(self):
+        """偏差超过tm_tolerance的窗口得分为负，不选；得分为0时保留"""
+        options = {'objective': 'tm_uniform', 'target_tm': 60.0, 'tm_tolerance': 15.0}
+        self.assertEqual(select([0], [90], 5, **options), [])
+        self.assertEqual(select([0, 10], [90, 62], 5, **options), [1])
+        self.assertEqual(select([0], [75], 5, **options), [0])
+
+    def test_empty(self):
+        self.assertEqual(select([], [], 5), [])
+        self.assertEqual(select([], [], 5, objective='tm_uniform'), [])
+
+    def test_matches_brute_force(self):
+        """小规模随机实例上达到穷举的最优值，且满足间距约束"""
+        rng = random.Random(13)
+        for trial in range(300):
+            count = rng.randint(1, 9)
+            starts = sorted(rng.sample(range(30), count))
+            tms = [rng.choice([52, 55, 58, 60, 61, 63, 66, 70, 78]) for _ in range(count)]
+            min_gap = rng.randint(1, 8)
+            for objective in ('max_count', 'tm_uniform'):
+                chosen = select(starts, tms, min_gap, objective=objective, target_tm=60.0, tm_tolerance=10.0)
+                with self.subTest(trial=trial, objective=objective, starts=starts, tms=tms, min_gap=min_gap):
+                    self.assertEqual(chosen, sorted(chosen))
+                    self.assertTrue(feasible(starts, chosen, min_gap))
+                    expected = brute_force(starts, tms, min_gap, objective, 60.0, 10.0)
+                    deviations = [abs(tms[index] - 60.0) for index in chosen]
+                    if objective == 'max_count':
+                        self.assertEqual(len(chosen), expected[0])
+                        self.assertAlmostEqual(-sum(deviations), expected[1])
+                    else:
+                        self.assertAlmostEqual(sum(1.0 - dev / 10.0 for dev in deviations), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
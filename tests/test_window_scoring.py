@@ -0,0 +1,131 @@
+"""批量窗口评分的测试：WindowScoreEngine与逐窗口的GC、复杂度、同聚物计算一致，设计结果与原逐位扫描相同
+
+运行: python -m pytest tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Bio.Seq import Seq
+
+from fish_engine import RNAProbeDesigner, WindowScoreEngine
+
+
+def random_target(rng, length, alphabet='ACGTU', n_rate=0.03):
+    """随机目标序列，按n_rate混入N；偶尔插入同聚物和重复片段，让各过滤条件都有窗口被淘汰"""
+    bases = []
+    while len(bases) < length:
+        roll = rng.random()
+        if roll < n_rate:
+            bases.append('N')
+        elif roll < n_rate + 0.02:
+            bases.extend(rng.choice(alphabet) * rng.randint(3, 6))
+        elif roll < n_rate + 0.03 and len(bases) > 30:
+            start = rng.randrange(len(bases) - 25)
+            bases.extend(bases[start:start + rng.randint(8, 25)])
+        else:
+            bases.append(rng.choice(alphabet))
+    return ''.join(bases[:length])
+
+
+def baseline_design(designer, target_sequence, parameters):
+    """原逐位扫描的设计循环：每个窗口依次计算GC、Tm、复杂度、重复和同聚物"""
+    probes = []
+    seq = target_sequence.upper()
+    probe_length = parameters['probe_length']
+    max_homopolymer_length = parameters.get('max_homopolymer_length', 3)
+    position = 0
+    while position < len(seq) - probe_length:
+        rna_fragment = seq[position:position + probe_length]
+        candidate = str(Seq(rna_fragment.replace('U', 'T')).reverse_complement())
+        gc_content = designer.calculate_gc(candidate)
+        tm = designer.calculate_tm(candidate, method=parameters['tm_method'])
+        complexity = designer.calculate_complexity(candidate)
+        has_repeats = designer.has_repeats(rna_fragment, seq) if parameters['filter_repeats'] else False
+        has_homopolymer = designer.has_homopolymer(candidate, max_homopolymer_length)
+        if (tm is not None and
+                parameters['min_gc'] <= gc_content <= parameters['max_gc'] and
+                parameters['min_tm'] <= tm <= parameters['max_tm'] and
+                complexity >= parameters['min_complexity'] and
+                not has_repeats and not has_homopolymer):
+            probes.append((position + 1, candidate, rna_fragment, gc_content, tm, complexity))
+            position += probe_length + parameters['spacing'] - 1
+        else:
+            position += 1
+    return probes
+
+
+class WindowScoreEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.designer = RNAProbeDesigner()
+        self.rng = random.Random(11)
+
+    def test_window_scores_match_scalar_path(self):
+        """每个窗口的GC、复杂度、最长同聚物与对DNA探针逐个计算的结果一致（含U、T混用和N）"""
+        for length in (1, 2, 7, 20, 31):
+            for trial in range(4):
+                seq = random_target(self.rng, self.rng.randint(length, 400), n_rate=0.05 * trial)
+                engine = WindowScoreEngine(seq, length)
+                self.assertEqual(engine.window_count, len(seq) - length + 1)
+                for position in range(engine.window_count):
+                    candidate = str(Seq(seq[position:position + length].replace('U', 'T')).reverse_complement())
+                    with self.subTest(length=length, position=position, candidate=candidate):
+                        self.assertTrue(engine.valid[position])
+                        self.assertEqual(engine.gc_content[position], self.designer.calculate_gc(candidate))
+                        self.assertAlmostEqual(engine.complexity[position],
+                                               self.designer.calculate_complexity(candidate), places=12)
+                        for limit in range(1, 6):
+                            self.assertEqual(engine.max_homopolymer[position] > limit,
+                                             self.designer.has_homopolymer(candidate, limit))
+
+    def test_prefilter_keeps_every_scalar_pass(self):
+        """预筛掩码不会淘汰逐窗口计算会接受的窗口（复杂度恰在阈值上时也保留）"""
+        seq = random_target(self.rng, 3000)
+        engine = WindowScoreEngine(seq, 20)
+        for min_complexity in (0.7, 0.8, 0.9):
+            mask = engine.prefilter_mask(40.0, 60.0, min_complexity, 3)
+            for position in range(engine.window_count):
+                candidate = str(Seq(seq[position:position + 20].replace('U', 'T')).reverse_complement())
+                passes = (40.0 <= self.designer.calculate_gc(candidate) <= 60.0 and
+                          self.designer.calculate_complexity(candidate) >= min_complexity and
+                          not self.designer.has_homopolymer(candidate, 3))
+                if passes:
+                    self.assertTrue(mask[position], (min_complexity, position, candidate))
+
+    def test_other_characters_are_invalid(self):
+        """ACGTUN以外的字符使窗口无效"""
+        engine = WindowScoreEngine('ACGTXACGTA', 4)
+        self.assertEqual(engine.valid.tolist(), [True, False, False, False, False, True, True])
+
+    def test_design_matches_per_window_baseline(self):
+        """批量评分后的设计结果与原逐位扫描逐个探针相同"""
+        base = {
+            'probe_length': 20, 'min_gc': 35.0, 'max_gc': 65.0, 'min_tm': 50.0, 'max_tm': 75.0,
+            'spacing': 3, 'min_complexity': 0.8, 'check_specificity': True, 'tm_method': 'santalucia',
+            'max_homopolymer_length': 3, 'placement': 'greedy',
+            # 只比较批量评分，Tm按原方式逐窗口调用Biopython（增量Tm另有测试）
+            'native_tm': False,
+        }
+        cases = [
+            (random_target(self.rng, 1500, alphabet='ACGU'), {'filter_repeats': True}),
+            (random_target(self.rng, 1500, alphabet='ACGT', n_rate=0.01), {'filter_repeats': False}),
+            (random_target(self.rng, 800).lower(), {'filter_repeats': True, 'probe_length': 25, 'spacing': 0}),
+            (random_target(self.rng, 800), {'filter_repeats': True, 'tm_method': 'wallace',
+                                             'min_tm': 55.0, 'max_tm': 66.0, 'max_homopolymer_length': 4}),
+        ]
+        for seq, overrides in cases:
+            parameters = dict(base, **overrides)
+            expected = baseline_design(self.designer, seq, parameters)
+            probes = self.designer.design_probes(seq, parameters)
+            actual = [(probe['start'], probe['sequence'], probe['rna_fragment'], probe['gc_content'],
+                       probe['tm'], probe['complexity']) for probe in probes]
+            with self.subTest(overrides=overrides):
+                self.assertGreater(len(expected), 0)
+                self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()